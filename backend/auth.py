@@ -0,0 +1,180 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from functools import wraps
+
+from flask import g, jsonify, request
+
+# Every token uses the same header, so it is compared as a constant string.
+_HEADER = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b'=').decode()
+
+
+def _b64(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+# Revoked-token rows for a whole user rather than one token
+_USER_PREFIX = 'user:'
+
+
+class TokenError(Exception):
+    """Missing, malformed, expired or revoked token."""
+
+
+def load_secret(app):
+    """SECRET_KEY from the environment, else one generated once and kept in
+    the instance folder so every worker process signs with the same key."""
+    if os.environ.get('SECRET_KEY'):
+        return os.environ['SECRET_KEY']
+    path = os.path.join(app.instance_path, 'secret_key')
+    try:
+        if not os.path.exists(path):
+            os.makedirs(app.instance_path, exist_ok=True)
+            tmp = f'{path}.{os.getpid()}'
+            with open(tmp, 'w') as f:
+                f.write(secrets.token_hex(32))
+            os.chmod(tmp, 0o600)
+            try:
+                os.link(tmp, path)  # atomic; the first worker to get here wins
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(tmp)
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        app.logger.warning("SECRET_KEY is not set and the instance folder is not writable; "
+                           "tokens will only be accepted by the process that issued them")
+        return secrets.token_hex(32)
+
+
+class TokenAuth:
+    """Stateless HS256 JWTs carrying the user id and role.
+
+    `required(*roles)` checks the signature, expiry and role in process,
+    with no database access. Revocation (logout) is a short table of token
+    ids that each worker re-reads at most once per `AUTH_REVOCATION_TTL`
+    seconds, so a revoked token can be accepted by other workers for up
+    to that long. Deleting a user or changing their role revokes every
+    token issued to them before then the same way (`revoke_user`), so the
+    role claim can be trusted.
+    """
+
+    def __init__(self, app=None, db=None, model=None):
+        self.app = None
+        self.db = None
+        self.model = None
+        self._mac = None
+        self._revoked = frozenset()
+        self._revoked_users = {}
+        self._revoked_at = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db, model)
+
+    def init_app(self, app, db, model):
+        self.app = app
+        self.db = db
+        self.model = model
+        if not app.config.get('SECRET_KEY'):  # Flask's default is None
+            app.config['SECRET_KEY'] = load_secret(app)
+        app.config.setdefault('AUTH_TOKEN_TTL', int(os.environ.get('AUTH_TOKEN_TTL', 12 * 3600)))
+        app.config.setdefault('AUTH_REVOCATION', os.environ.get('AUTH_REVOCATION', '1') not in ('0', 'false', 'False'))
+        app.config.setdefault('AUTH_REVOCATION_TTL', float(os.environ.get('AUTH_REVOCATION_TTL', 5.0)))
+        self._mac = hmac.new(app.config['SECRET_KEY'].encode(), digestmod=hashlib.sha256)
+
+    def _sign(self, signing_input):
+        mac = self._mac.copy()
+        mac.update(signing_input.encode())
+        return mac.digest()
+
+    def issue(self, user_id, role):
+        # iat keeps its fraction: a user whose role just changed logs in
+        # again within the same second, and revoke_user() compares to it.
+        now = time.time()
+        claims = {"sub": str(user_id), "role": role, "iat": now,
+                  "exp": int(now) + self.app.config['AUTH_TOKEN_TTL'], "jti": secrets.token_hex(8)}
+        signing_input = _HEADER + '.' + _b64(json.dumps(claims, separators=(',', ':')).encode())
+        return signing_input + '.' + _b64(self._sign(signing_input))
+
+    def verify(self, token):
+        """Return the claims of a valid token or raise TokenError."""
+        try:
+            header, payload, signature = token.split('.')
+            if header != _HEADER or not hmac.compare_digest(self._sign(header + '.' + payload), _unb64(signature)):
+                raise TokenError("Invalid token")
+            claims = json.loads(_unb64(payload))
+            expires = claims['exp']
+        except (ValueError, KeyError, TypeError):
+            raise TokenError("Invalid token")
+        if expires <= time.time():
+            raise TokenError("Token has expired")
+        if self.app.config['AUTH_REVOCATION']:
+            revoked, revoked_users = self._revocations()
+            # A deleted user's id can be reused, so only tokens issued
+            # before the delete are refused.
+            if claims.get('jti') in revoked or claims.get('iat', 0) <= revoked_users.get(claims.get('sub'), -1):
+                raise TokenError("Token has been revoked")
+        return claims
+
+    def _revocations(self):
+        now = time.monotonic()
+        if self._revoked_at is None or now - self._revoked_at >= self.app.config['AUTH_REVOCATION_TTL']:
+            rows = self.db.session.query(self.model.jti, self.model.expires_at).filter(
+                self.model.expires_at > time.time()).all()
+            self._revoked = frozenset(jti for jti, _ in rows if not jti.startswith(_USER_PREFIX))
+            # Entries for users expire a token lifetime after the delete
+            ttl = self.app.config['AUTH_TOKEN_TTL']
+            self._revoked_users = {jti[len(_USER_PREFIX):]: expires_at - ttl
+                                   for jti, expires_at in rows if jti.startswith(_USER_PREFIX)}
+            self._revoked_at = now
+        return self._revoked, self._revoked_users
+
+    def revoke(self, claims):
+        """Revoke one token; the caller commits. Expired entries are purged."""
+        self.model.query.filter(self.model.expires_at <= time.time()).delete(synchronize_session=False)
+        if not self.db.session.get(self.model, claims['jti']):
+            self.db.session.add(self.model(jti=claims['jti'], expires_at=claims['exp']))
+        with self._lock:
+            self._revoked = self._revoked | {claims['jti']}
+
+    def revoke_user(self, user_id):
+        """Revoke every token issued to a user so far; the caller commits."""
+        now = time.time()
+        jti = _USER_PREFIX + str(user_id)
+        entry = self.db.session.get(self.model, jti)
+        if entry is None:
+            self.db.session.add(self.model(jti=jti, expires_at=now + self.app.config['AUTH_TOKEN_TTL']))
+        else:
+            entry.expires_at = now + self.app.config['AUTH_TOKEN_TTL']
+        with self._lock:
+            self._revoked_users = dict(self._revoked_users, **{str(user_id): now})
+
+    def required(self, *roles):
+        """Require `Authorization: Bearer <token>`, optionally with one of
+        `roles`. The claims are available as `g.auth` in the view."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+                if scheme.lower() != 'bearer' or not token:
+                    return jsonify({"message": "Authentication required"}), 401, {"WWW-Authenticate": "Bearer"}
+                try:
+                    claims = self.verify(token.strip())
+                except TokenError as e:
+                    return jsonify({"message": str(e)}), 401, {"WWW-Authenticate": 'Bearer error="invalid_token"'}
+                if roles and claims.get('role') not in roles:
+                    return jsonify({"message": "You do not have permission to do this"}), 403
+                g.auth = claims
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
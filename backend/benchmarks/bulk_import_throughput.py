@@ -0,0 +1,86 @@
+"""Bulk import throughput against one-request-per-row enrollment.
+
+    python benchmarks/bulk_import_throughput.py --rows 10000
+
+Imports `--rows` students into the seeded catalog through POST
+/api/bulk/students as a JSON array, NDJSON and CSV (a fresh database each),
+then times `--baseline` individual POST /api/enroll calls for comparison.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COURSES = ["Advanced System Design", "React Native Mastery", "Cloud Computing with AWS", "Data Science with Python"]
+
+
+def student_rows(count, prefix):
+    return [{"name": f"Student {i}", "email": f"{prefix}{i}@example.com", "course_title": COURSES[i % len(COURSES)]}
+            for i in range(count)]
+
+
+def encode(rows, fmt):
+    if fmt == "json":
+        return json.dumps(rows), "application/json"
+    if fmt == "ndjson":
+        return "".join(json.dumps(r) + "\n" for r in rows), "application/x-ndjson"
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    return buf.getvalue(), "text/csv"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--baseline", type=int, default=500, help="individual /api/enroll calls to time")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    from app import app, db, init_db, Course, Enrollment, InstructorStats, GLOBAL_STATS
+    init_db()
+    client = app.test_client()
+    report = {"rows": args.rows}
+
+    for fmt in ("json", "ndjson", "csv"):
+        body, content_type = encode(student_rows(args.rows, fmt), fmt)
+        t0 = time.perf_counter()
+        resp = client.post("/api/bulk/students", data=body, content_type=content_type)
+        elapsed = time.perf_counter() - t0
+        result = resp.get_json()
+        assert resp.status_code == 200 and result["inserted"] == args.rows, result["errors"][:5]
+        report[f"bulk_{fmt}_s"] = round(elapsed, 3)
+
+    # Re-sending the same rows must be rejected row by row, not re-inserted.
+    body, content_type = encode(student_rows(args.rows, "csv"), "csv")
+    t0 = time.perf_counter()
+    result = client.post("/api/bulk/students", data=body, content_type=content_type).get_json()
+    report["bulk_duplicates_s"] = round(time.perf_counter() - t0, 3)
+    assert result["inserted"] == 0 and result["failed"] == args.rows, result["inserted"]
+
+    t0 = time.perf_counter()
+    for row in student_rows(args.baseline, "single"):
+        assert client.post("/api/enroll", json=row).status_code == 201
+    per_row = (time.perf_counter() - t0) / args.baseline
+    report["enroll_per_row_ms"] = round(per_row * 1000, 2)
+    report["enroll_extrapolated_s"] = round(per_row * args.rows, 2)
+
+    with app.app_context():
+        enrollments = db.session.query(db.func.count(Enrollment.id)).scalar()
+        total = db.session.get(InstructorStats, GLOBAL_STATS).student_count
+        seeded = db.session.query(db.func.sum(Course.students)).scalar()
+        report["enrollments"] = enrollments
+        report["aggregates_consistent"] = total == seeded
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
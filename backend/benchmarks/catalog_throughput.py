@@ -0,0 +1,63 @@
+"""Requests/sec for the course catalog under gunicorn, cache off vs on.
+
+    python benchmarks/catalog_throughput.py --courses 500 --workers 4 --duration 5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import drive, gunicorn
+
+
+def seed(db_url, courses):
+    os.environ["DATABASE_URL"] = db_url
+    from app import app, db, init_db, Course
+    init_db()
+    with app.app_context():
+        db.session.execute(Course.__table__.insert(), [{
+            "title": f"Benchmark Course {i}",
+            "instructor": f"Instructor {i % 40}",
+            "duration": "8 weeks",
+            "rating": "4.8",
+            "students": "1.2k",
+            "image": "https://images.unsplash.com/photo-1518770660439-4636190af475?auto=format&fit=crop&q=80&w=600",
+            "tags": json.dumps(["Architecture", "Backend"]),
+            "video_url": "https://www.youtube.com/watch?v=i53Gi_K397I",
+        } for i in range(courses)])
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    db_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    seed(db_url, args.courses)
+
+    results = {}
+    for label, enabled in (("uncached", "0"), ("cached", "1")):
+        env = {"DATABASE_URL": db_url, "CATALOG_CACHE_ENABLED": enabled, "MAIL_WORKER": "external"}
+        with gunicorn(env, workers=args.workers) as port:
+            run = {
+                "list": drive(port, "/api/courses", args.concurrency, args.duration),
+                "detail": drive(port, "/api/courses/1", args.concurrency, args.duration),
+            }
+            etag = urllib.request.urlopen(f"http://127.0.0.1:{port}/api/courses").headers.get("ETag")
+            if etag:
+                run["list_if_none_match"] = drive(port, "/api/courses", args.concurrency, args.duration,
+                                                  headers={"If-None-Match": etag})
+            results[label] = run
+    print(json.dumps({"courses": args.courses, "workers": args.workers, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Cold start: time from spawning a fresh process to its first response.
+
+    python benchmarks/cold_start.py --repeat 5
+    python benchmarks/cold_start.py --backend /path/to/other/checkout/backend
+
+Each run is a new interpreter that imports the app, runs init_db() as the
+server hook does and answers GET /api/courses through the test client.
+`empty` starts from a missing database file, `existing` from one that is
+already migrated and seeded (the usual restart), and `snapshot` from a
+`flask snapshot-db` file opened read-only in place (skipped for backends
+without DATABASE_SNAPSHOT). Reports the median of `--repeat` runs.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import BACKEND_DIR
+
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+from app import app, init_db
+t1 = time.perf_counter()
+init_db()
+t2 = time.perf_counter()
+resp = app.test_client().get("/api/courses")
+t3 = time.perf_counter()
+assert resp.status_code == 200, resp.status_code
+print("COLD_START " + json.dumps({"import_ms": (t1 - t0) * 1000, "init_db_ms": (t2 - t1) * 1000,
+                                   "first_request_ms": (t3 - t2) * 1000}), flush=True)
+"""
+
+
+def spawn(backend, env):
+    """One cold start; its phases plus the wall time seen from outside."""
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", CHILD], cwd=backend, env={**os.environ, **env},
+                            stdout=subprocess.PIPE, text=True)
+    for line in proc.stdout:  # the app prints too, e.g. applied migrations
+        if line.startswith("COLD_START "):
+            break
+    else:
+        line = None
+    total = (time.perf_counter() - started) * 1000
+    proc.stdout.read()
+    if proc.wait() != 0 or not line:
+        raise RuntimeError(f"cold start failed in {backend}")
+    return dict(json.loads(line[len("COLD_START "):]), total_ms=total)
+
+
+def median_of(runs):
+    return {key: round(statistics.median(run[key] for run in runs), 1) for key in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", default=BACKEND_DIR, help="backend directory to start")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    backend = os.path.abspath(args.backend)
+    tmpdir = tempfile.mkdtemp()
+    base_env = {"MAIL_WORKER": "external", "METRICS_ENABLED": "0", "DATABASE_URL": "", "DATABASE_SNAPSHOT": ""}
+
+    def database(name):
+        return {**base_env, "DATABASE_URL": "sqlite:///" + os.path.join(tmpdir, name)}
+
+    results = {"backend": backend, "repeat": args.repeat}
+    results["empty"] = median_of([spawn(backend, database(f"empty-{i}.db")) for i in range(args.repeat)])
+    spawn(backend, database("existing.db"))
+    results["existing"] = median_of([spawn(backend, database("existing.db")) for _ in range(args.repeat)])
+
+    with open(os.path.join(backend, "app.py"), encoding="utf-8") as f:
+        has_snapshots = "DATABASE_SNAPSHOT" in f.read()
+    if has_snapshots:
+        snapshot = os.path.join(tmpdir, "snapshot.db")
+        subprocess.run([sys.executable, "-m", "flask", "--app", "app", "snapshot-db", snapshot], cwd=backend,
+                       env={**os.environ, **database("existing.db")}, check=True, stdout=subprocess.DEVNULL)
+        env = {**base_env, "DATABASE_SNAPSHOT": snapshot}
+        results["snapshot"] = median_of([spawn(backend, env) for _ in range(args.repeat)])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Concurrent edits with and without If-Match, and PUT against PATCH.
+
+    python benchmarks/concurrent_edits.py --editors 4 --rounds 50
+
+Runs in process on a copy of the 1k seed. In each round `--editors`
+admins read the same faculty member, then each appends a word to its bio
+and saves. `put_lost` counts the words missing at the end when they save
+with a plain PUT; with PATCH and If-Match the stale saves get 412 and
+retry from a fresh read, so `patch_lost` should be 0 and `patch_retries`
+shows how often that happened.
+
+`put_ms`, `patch_ms` and `batch_ms` set the progress of `--updates`
+registry entries with one PUT each, one PATCH each, and one batch PATCH
+to /api/students.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import BACKEND_DIR
+from seed import SCALES, scratch_copy, template
+
+
+def lost_words(client, headers, faculty_id, editors, rounds, conditional):
+    written, retries = [], 0
+    for r in range(rounds):
+        reads = [client.get(f"/api/faculty/{faculty_id}") for _ in range(editors)]
+        for e, resp in enumerate(reads):
+            word = f"r{r}e{e}"
+            written.append(word)
+            while True:
+                record = resp.get_json()
+                bio = f"{record['bio']} {word}".strip()
+                if not conditional:
+                    client.put(f"/api/faculty/{faculty_id}", json={"bio": bio}, headers=headers)
+                    break
+                saved = client.patch(f"/api/faculty/{faculty_id}", json={"bio": bio},
+                                     headers={**headers, "If-Match": resp.headers["ETag"]})
+                if saved.status_code != 412:
+                    assert saved.status_code == 200, saved.status_code
+                    break
+                retries += 1
+                resp = client.get(f"/api/faculty/{faculty_id}")
+    final = set(client.get(f"/api/faculty/{faculty_id}").get_json()["bio"].split())
+    return sum(word not in final for word in written), retries
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return round((time.perf_counter() - t0) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--editors", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--updates", type=int, default=500)
+    args = parser.parse_args()
+
+    seeded = template(SCALES["1k"]["students"], SCALES["1k"]["messages"], BACKEND_DIR)
+    os.environ.update({"DATABASE_URL": "sqlite:///" + scratch_copy(seeded), "MAIL_WORKER": "external",
+                       "METRICS_ENABLED": "0"})
+    from app import app, db, token_auth, Enrollment, FacultyMember
+    rng = random.Random(1)
+    client = app.test_client()
+    with app.app_context():
+        headers = {"Authorization": "Bearer " + token_auth.issue(1, "admin")}
+        faculty = FacultyMember.query.order_by(FacultyMember.id).limit(2).all()
+        ids = [i for (i,) in db.session.query(Enrollment.id).order_by(Enrollment.id).limit(args.updates)]
+
+    result = {"editors": args.editors, "rounds": args.rounds, "updates": len(ids)}
+    for faculty_member, name, conditional in ((faculty[0], "put", False), (faculty[1], "patch", True)):
+        client.put(f"/api/faculty/{faculty_member.id}", json={"bio": ""}, headers=headers)
+        result[f"{name}_lost"], retries = lost_words(client, headers, faculty_member.id, args.editors,
+                                                     args.rounds, conditional)
+        if conditional:
+            result[f"{name}_retries"] = retries
+
+    def one_by_one(method):
+        for i in ids:
+            resp = client.open(f"/api/students/{i}", method=method, json={"progress": rng.randint(0, 100)},
+                               headers=headers)
+            assert resp.status_code == 200, resp.status_code
+
+    def batch():
+        resp = client.patch("/api/students", json=[{"id": i, "progress": rng.randint(0, 100)} for i in ids],
+                            headers=headers)
+        assert resp.get_json()["updated"] == len(ids)
+
+    result["put_ms"] = timed(lambda: one_by_one("PUT"))
+    result["patch_ms"] = timed(lambda: one_by_one("PATCH"))
+    result["batch_ms"] = timed(batch)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
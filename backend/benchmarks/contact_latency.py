@@ -0,0 +1,70 @@
+"""POST /api/contact against a local SMTP stand-in with and without delay.
+
+    python benchmarks/contact_latency.py --requests 50 --smtp-delay 2
+
+Request latency should be the same for both runs; only the time for the
+outbox to drain grows with the SMTP delay.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import percentile
+from smtp_standin import SMTPStandIn
+
+
+def run(app, mail_queue, delay, requests):
+    with SMTPStandIn(delay=delay) as smtp:
+        app.config.update(MAIL_SERVER="127.0.0.1", MAIL_PORT=smtp.port, MAIL_USE_TLS=False,
+                          MAIL_USERNAME="", MAIL_PASSWORD="", MAIL_REQUIRE_AUTH=False,
+                          MAIL_SENDER="portal@localhost", MAIL_RECIPIENT="admin@localhost")
+        client = app.test_client()
+        latencies = []
+        started = time.perf_counter()
+        for i in range(requests):
+            t0 = time.perf_counter()
+            resp = client.post("/api/contact", json={
+                "name": f"Bench {i}", "email": f"bench{i}@example.com", "message": "Hello from the benchmark",
+            })
+            latencies.append((time.perf_counter() - t0) * 1000)
+            assert resp.status_code == 201, resp.data
+        while mail_queue.pending_count():
+            time.sleep(0.05)
+        drained = time.perf_counter() - started
+        mail_queue.stop(timeout=5)
+        return {
+            "smtp_delay_s": delay,
+            "requests": requests,
+            "request_p50_ms": round(percentile(latencies, 50), 2),
+            "request_p95_ms": round(percentile(latencies, 95), 2),
+            "request_max_ms": round(max(latencies), 2),
+            "request_mean_ms": round(statistics.mean(latencies), 2),
+            "queue_drained_s": round(drained, 2),
+            "smtp_messages": smtp.messages,
+            "smtp_connections": smtp.connections,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--smtp-delay", type=float, default=1.0)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmpdir, "bench.db")
+    from app import app, init_db, mail_queue
+    init_db()
+
+    results = [run(app, mail_queue, 0.0, args.requests), run(app, mail_queue, args.smtp_delay, args.requests)]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Delivery latency of /api/events across gunicorn workers.
+
+    python benchmarks/event_fanout.py --workers 2 --clients 8 --events 50
+
+Opens `--clients` event streams against gunicorn (spread over its workers
+by the kernel), then posts contact messages one by one and times each
+`contact.received` event from the moment its POST returned to its arrival
+on every stream. Runs once per `--poll-interval`; a stream on the worker
+that handled the POST sees the event right after the commit, the others
+within one poll interval.
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import gunicorn, percentile
+
+
+def listen(port, received, ready, streams):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    streams.append(conn)
+    conn.request("GET", "/api/events")
+    resp = conn.getresponse()
+    assert resp.status == 200, resp.status
+    ready.release()
+    kind = None
+    while True:
+        try:
+            line = resp.fp.readline()
+        except (OSError, ValueError):  # closed by run()
+            break
+        if not line:
+            break
+        line = line.decode().rstrip("\n")
+        if line.startswith("event: "):
+            kind = line[7:]
+        elif line.startswith("data: ") and kind == "contact.received":
+            received.setdefault(json.loads(line[6:])["id"], []).append(time.perf_counter())
+
+
+def run(poll_interval, workers, clients, events):
+    tmpdir = tempfile.mkdtemp()
+    env = {"DATABASE_URL": "sqlite:///" + os.path.join(tmpdir, "bench.db"), "MAIL_WORKER": "external",
+           "EVENTS_POLL_INTERVAL": str(poll_interval), "EVENTS_MAX_STREAMS": str(clients),
+           "EVENTS_STREAM_SECONDS": "600", "EVENTS_HEARTBEAT": "1", "METRICS_ENABLED": "0"}
+    # gunicorn.conf.py gives each worker a thread per allowed stream on top of
+    # the ones that serve the POSTs.
+    with gunicorn(env, workers=workers) as port:
+        received, ready, streams = {}, threading.Semaphore(0), []
+        threads = [threading.Thread(target=listen, args=(port, received, ready, streams), daemon=True)
+                   for _ in range(clients)]
+        for t in threads:
+            t.start()
+        for _ in threads:
+            ready.acquire()
+
+        sent = {}
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        for i in range(events):
+            conn.request("POST", "/api/contact", body=json.dumps({
+                "name": f"Bench {i}", "email": f"bench{i}@example.com", "message": "Hello from the benchmark",
+            }), headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            resp.read()
+            assert resp.status == 201, resp.status
+            sent[len(sent) + 1] = time.perf_counter()  # fresh database: ids start at 1
+            time.sleep(0.02)
+        conn.close()
+
+        deadline = time.time() + poll_interval * 4 + 2
+        while time.time() < deadline and sum(len(v) for v in received.values()) < events * clients:
+            time.sleep(0.05)
+        # Workers finish open requests before exiting; a closed socket ends
+        # its stream at the next heartbeat.
+        for stream in streams:
+            stream.sock.shutdown(socket.SHUT_RDWR)
+            stream.close()
+
+    latencies = [(at - sent[msg_id]) * 1000 for msg_id, times in received.items() if msg_id in sent for at in times]
+    return {
+        "poll_interval_s": poll_interval,
+        "workers": workers,
+        "clients": clients,
+        "events": events,
+        "delivered": len(latencies),
+        "expected": events * clients,
+        "latency_p50_ms": round(percentile(latencies, 50), 1) if latencies else None,
+        "latency_p95_ms": round(percentile(latencies, 95), 1) if latencies else None,
+        "latency_max_ms": round(max(latencies), 1) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--poll-interval", type=float, action="append", dest="poll_intervals")
+    args = parser.parse_args()
+
+    results = [run(interval, args.workers, args.clients, args.events)
+               for interval in args.poll_intervals or [0.5, 0.1]]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import contextlib
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def gunicorn(env=None, workers=4, extra_args=(), backend_dir=BACKEND_DIR):
+    """Run `gunicorn app:app` from the backend directory on a free port.
+
+    Started with that directory as its cwd, so gunicorn.conf.py applies just
+    as in production; `extra_args` override it. The server's output goes to
+    stderr so a benchmark's JSON report on stdout stays parseable.
+    """
+    port = free_port()
+    cmd = [sys.executable, "-m", "gunicorn", "--chdir", backend_dir, "-w", str(workers),
+           "-b", f"127.0.0.1:{port}", "--log-level", "warning", *extra_args, "app:app"]
+    # No max_requests recycling: a restart mid-run shows up as errors on
+    # the connections the old worker was keeping alive.
+    env = {"GUNICORN_MAX_REQUESTS": "0", **(env or {})}
+    proc = subprocess.Popen(cmd, cwd=backend_dir, env={**os.environ, **env},
+                            stdout=sys.stderr)
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+                conn.request("GET", "/")
+                if conn.getresponse().status == 200:
+                    conn.close()
+                    break
+            except (OSError, http.client.HTTPException):
+                pass
+            if proc.poll() is not None or time.time() > deadline:
+                raise RuntimeError("gunicorn did not start")
+            time.sleep(0.1)
+        # The master accepts connections before every worker has imported
+        # the app; keep the boot time out of the measurements.
+        drive(port, "/", concurrency=workers * 2, duration=2.0)
+        yield port
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def drive(port, path, concurrency=8, duration=5.0, method="GET", headers=None, body=None):
+    """Hammer one route from `concurrency` threads for `duration` seconds.
+
+    `path`, `headers` and `body` may be callables returning fresh values for
+    every request; a `path` callable raising StopIteration ends the run
+    early (e.g. when a delete benchmark runs out of rows).
+    """
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        local, local_status = [], {}
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        while time.perf_counter() < stop_at:
+            try:
+                url = path() if callable(path) else path
+            except StopIteration:
+                break
+            t0 = time.perf_counter()
+            try:
+                conn.request(method, url, body=body() if callable(body) else body,
+                             headers=(headers() if callable(headers) else headers) or {})
+                resp = conn.getresponse()
+                resp.read()
+                status = resp.status
+                if resp.getheader("Connection", "").lower() == "close":
+                    conn.close()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                status = "error"
+            local.append((time.perf_counter() - t0) * 1000)
+            local_status[status] = local_status.get(status, 0) + 1
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            for k, v in local_status.items():
+                statuses[k] = statuses.get(k, 0) + v
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "statuses": {str(k): v for k, v in statuses.items()},
+    }
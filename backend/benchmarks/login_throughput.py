@@ -0,0 +1,98 @@
+"""Login throughput with hashed passwords, and the cost of a stuffing burst.
+
+    python benchmarks/login_throughput.py --workers 4 --concurrency 8 --duration 5
+
+Runs gunicorn on a seeded scratch database and measures:
+  valid     - correct credentials, rate limiting off
+  mixed     - the same, plus a reader on /api/students. With
+              --gunicorn-args "-k sync" the reader queues behind logins;
+              with the gthread workers of gunicorn.conf.py and
+              PASSWORD_HASH_WORKERS=1 it gets a thread and a core share
+  stuffing  - wrong passwords for random accounts from one IP with the
+              limiter on (LOGIN_IP_BURST=10, per worker); once the burst
+              is spent, everything should be a cheap 429
+"""
+import argparse
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import drive, gunicorn, percentile
+
+JSON = {"Content-Type": "application/json"}
+VALID = json.dumps({"email": "student@example.com", "password": "password123"})
+
+
+def seeded_template():
+    path = os.path.join(tempfile.mkdtemp(), "template.db")
+    # gunicorn inherits the key, so the reader's admin token is valid there
+    os.environ.update({"DATABASE_URL": "sqlite:///" + path, "SECRET_KEY": "benchmark-secret"})
+    from app import app, init_db, password_hasher, token_auth
+    init_db()
+    with app.app_context():
+        timings = []
+        for _ in range(20):
+            t0 = time.perf_counter()
+            password_hasher.hash("password123")
+            timings.append((time.perf_counter() - t0) * 1000)
+        admin = {"Authorization": "Bearer " + token_auth.issue(1, "admin")}
+    return path, round(percentile(timings, 50), 2), admin
+
+
+def scratch_copy(template):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    with sqlite3.connect(template) as src, sqlite3.connect(path) as dst:
+        src.backup(dst)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--gunicorn-args", default="", help="extra gunicorn arguments, e.g. '-k sync'")
+    args = parser.parse_args()
+    extra = tuple(args.gunicorn_args.split())
+
+    template, hash_ms, admin = seeded_template()
+    report = {"hash_p50_ms": hash_ms}
+    env = {"MAIL_WORKER": "external"}
+
+    env_off = dict(env, DATABASE_URL="sqlite:///" + scratch_copy(template), LOGIN_RATE_LIMIT="0")
+    with gunicorn(env_off, workers=args.workers, extra_args=extra) as port:
+        report["valid"] = drive(port, "/api/login", args.concurrency, args.duration,
+                                method="POST", headers=JSON, body=VALID)
+        report["reader_alone"] = drive(port, "/api/students?limit=20", 1, args.duration, headers=admin)
+
+        results = {}
+
+        def logins():
+            results["valid"] = drive(port, "/api/login", args.concurrency, args.duration,
+                                     method="POST", headers=JSON, body=VALID)
+
+        thread = threading.Thread(target=logins)
+        thread.start()
+        results["reader"] = drive(port, "/api/students?limit=20", 1, args.duration, headers=admin)
+        thread.join()
+        report["mixed"] = results
+
+    counter = itertools.count()
+    env_on = dict(env, DATABASE_URL="sqlite:///" + scratch_copy(template), LOGIN_IP_BURST="10")
+    with gunicorn(env_on, workers=args.workers, extra_args=extra) as port:
+        report["stuffing"] = drive(port, "/api/login", args.concurrency, args.duration, method="POST", headers=JSON,
+                                   body=lambda: json.dumps({"email": f"victim{next(counter)}@example.com",
+                                                            "password": "guess"}))
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Image uploads, background thumbnails and what the course grid downloads.
+
+    python benchmarks/media_thumbnails.py --images 24 --media-workers 1 --media-workers 4
+
+Uploads `--images` synthetic photos (`--width` x 2/3 of it, JPEG) to
+gunicorn, once per `--media-workers`. `upload_*` is the POST /api/media
+latency, which should not depend on the pool since thumbnails are made
+after the response; `thumbnails_ready_s` is the time from the first
+upload until every image reports `ready`. The byte counts compare the
+originals with the 320 and 640 px WebP thumbnails a card loads instead.
+Needs Pillow.
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageFilter
+
+from load import gunicorn, percentile
+
+
+def photo(seed, width):
+    """A JPEG that compresses roughly like a photograph: detail at every
+    scale, so the thumbnails keep some too."""
+    rng = random.Random(seed)
+    height = width * 2 // 3
+    image = Image.new('RGB', (width, height), tuple(rng.randrange(256) for _ in range(3)))
+    for scale in (64, 16, 4, 1):
+        layer = Image.effect_noise((max(1, width // scale), max(1, height // scale)), 60 + rng.randrange(40))
+        layer = layer.convert('RGB').resize((width, height), Image.BICUBIC).filter(ImageFilter.GaussianBlur(0.6))
+        image = Image.blend(image, layer, 0.35)
+    out = io.BytesIO()
+    image.save(out, 'JPEG', quality=85)
+    return out.getvalue()
+
+
+def request(conn, method, path, body=None, headers=None):
+    conn.request(method, path, body=body, headers=headers or {})
+    resp = conn.getresponse()
+    return resp.status, resp.getheaders(), resp.read()
+
+
+def run(images, media_workers, workers, width):
+    tmpdir = tempfile.mkdtemp()
+    env = {"DATABASE_URL": "sqlite:///" + os.path.join(tmpdir, "bench.db"), "MAIL_WORKER": "external",
+           "MEDIA_DIR": os.path.join(tmpdir, "media"), "MEDIA_WORKERS": str(media_workers),
+           "METRICS_ENABLED": "0", "LOGIN_RATE_LIMIT": "0"}
+    with gunicorn(env, workers=workers) as port:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        status, _, body = request(conn, "POST", "/api/login", json.dumps(
+            {"email": "admin@example.com", "password": "password123"}), {"Content-Type": "application/json"})
+        assert status == 200, status
+        auth = {"Authorization": "Bearer " + json.loads(body)["token"]}
+
+        photos = [photo(i, width) for i in range(images)]
+        uploads, latencies = [], []
+        started = time.perf_counter()
+        for data in photos:
+            t0 = time.perf_counter()
+            status, _, body = request(conn, "POST", "/api/media", data, {**auth, "Content-Type": "image/jpeg"})
+            latencies.append((time.perf_counter() - t0) * 1000)
+            assert status == 201, (status, body)
+            uploads.append(json.loads(body))
+
+        pending = {u["hash"] for u in uploads}
+        while pending:
+            for digest in list(pending):
+                status, _, body = request(conn, "GET", f"/api/media/{digest}")
+                state = json.loads(body)["status"]
+                assert state != "failed", body
+                if state == "ready":
+                    pending.discard(digest)
+            time.sleep(0.02)
+        ready = time.perf_counter() - started
+
+        sizes = {"original": 0, "320": 0, "640": 0}
+        for u in uploads:
+            sizes["original"] += u["bytes"]
+            for size in ("320", "640"):
+                status, headers, body = request(conn, "GET", u["thumbnails"][size])
+                assert status == 200, status
+                sizes[size] += len(body)
+        etag = dict(headers)["ETag"]
+        status, headers, _ = request(conn, "GET", uploads[-1]["thumbnails"]["640"], headers={"If-None-Match": etag})
+        assert status == 304, status
+        conn.close()
+
+    return {
+        "media_workers": media_workers,
+        "images": images,
+        "upload_p50_ms": round(percentile(latencies, 50), 1),
+        "upload_p95_ms": round(percentile(latencies, 95), 1),
+        "thumbnails_ready_s": round(ready, 2),
+        "original_kb_per_image": round(sizes["original"] / images / 1024, 1),
+        "thumb_320_kb_per_image": round(sizes["320"] / images / 1024, 1),
+        "thumb_640_kb_per_image": round(sizes["640"] / images / 1024, 1),
+        "cache_control": dict(headers).get("Cache-Control"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=24)
+    parser.add_argument("--width", type=int, default=2400)
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--media-workers", type=int, action="append", dest="media_workers")
+    args = parser.parse_args()
+
+    results = [run(args.images, n, args.workers, args.width) for n in args.media_workers or [1, 4]]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
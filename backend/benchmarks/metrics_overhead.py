@@ -0,0 +1,64 @@
+"""Cost of request metrics, and a check that /metrics adds up across workers.
+
+    python benchmarks/metrics_overhead.py --workers 4 --concurrency 8 --duration 5
+
+Drives /api/courses under gunicorn with METRICS_ENABLED=0 and =1, then
+scrapes /metrics (served by whichever worker picks it up) and compares the
+summed request count against the number of requests the client sent.
+"""
+import argparse
+import http.client
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import drive, gunicorn
+
+ROUTE = "/api/courses"
+
+
+def scrape(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("GET", "/metrics")
+    text = conn.getresponse().read().decode()
+    conn.close()
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    db = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = db
+    from app import init_db
+    init_db()
+    env = {"DATABASE_URL": db, "MAIL_WORKER": "external"}
+    report = {}
+    with gunicorn(dict(env, METRICS_ENABLED="0"), workers=args.workers) as port:
+        report["metrics_off"] = drive(port, ROUTE, args.concurrency, args.duration)
+
+    with gunicorn(dict(env, METRICS_DIR=tempfile.mkdtemp()), workers=args.workers) as port:
+        report["metrics_on"] = drive(port, ROUTE, args.concurrency, args.duration)
+        time.sleep(1.5)  # one METRICS_FLUSH_INTERVAL for every worker to publish
+        text = scrape(port)
+        pattern = r'portal_http_requests_total\{method="GET",route="%s",status="200"\} (\d+)' % re.escape(ROUTE)
+        match = re.search(pattern, text)
+        report["sent"] = report["metrics_on"]["requests"]
+        report["scraped"] = int(match.group(1)) if match else 0
+
+    off, on = report["metrics_off"]["rps"], report["metrics_on"]["rps"]
+    report["overhead_pct"] = round((off - on) / off * 100, 1) if off else None
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
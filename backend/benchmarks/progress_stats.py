@@ -0,0 +1,101 @@
+"""Course progress stats from the histogram against a scan of the enrollments.
+
+    python benchmarks/progress_stats.py --enrollments 1000 --enrollments 100000
+
+Runs in process on a copy of the 1k seed with `--enrollments` extra
+students enrolled (at random progress) in one course, once per value.
+`histogram_ms` reads the course's histogram rows as the route does;
+`scan_ms` computes the same figures from its enrollment rows, which is
+what the route would cost without the histogram; `endpoint_ms` is the
+whole route through the test client. The first and last should stay flat
+as the course grows.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import BACKEND_DIR, percentile
+from seed import SCALES, scratch_copy, template
+
+
+def measure(extra, requests):
+    seeded = template(SCALES["1k"]["students"], SCALES["1k"]["messages"], BACKEND_DIR)
+    os.environ.update({"DATABASE_URL": "sqlite:///" + scratch_copy(seeded), "MAIL_WORKER": "external",
+                       "METRICS_ENABLED": "0"})
+    from app import app, db, rebuild_progress_stats, CourseProgressStats, Enrollment, Student
+    rng = random.Random(1)
+    with app.app_context():
+        course_id = db.session.query(db.func.min(Enrollment.course_id)).scalar()
+        first = (db.session.query(db.func.max(Student.id)).scalar() or 0) + 1
+        db.session.execute(Student.__table__.insert(), [
+            {"id": first + i, "name": "Progress Bench", "email": f"progress.bench{i}@example.com"} for i in range(extra)])
+        db.session.execute(Enrollment.__table__.insert(), [
+            {"student_id": first + i, "course_id": course_id, "progress": rng.randint(0, 100)} for i in range(extra)])
+        rebuild_progress_stats()
+        db.session.commit()
+        enrolled = Enrollment.query.filter_by(course_id=course_id).count()
+    client = app.test_client()
+
+    def histogram():
+        with app.app_context():
+            counts = [0] * 11
+            total = 0
+            for row in CourseProgressStats.query.filter_by(course_id=course_id):
+                counts[row.bucket] = row.students
+                total += row.progress_sum
+            return counts
+
+    def scan():
+        with app.app_context():
+            counts = [0] * 11
+            total = 0
+            for (p,) in db.session.query(Enrollment.progress).filter_by(course_id=course_id):
+                counts[min(p // 10, 10)] += 1
+                total += p
+            return counts
+
+    def endpoint():
+        resp = client.get(f"/api/courses/{course_id}/progress-stats")
+        assert resp.status_code == 200, resp.status_code
+        return [b["students"] for b in resp.get_json()["histogram"]]
+
+    assert histogram() == scan() == endpoint(), "histogram out of step with the enrollments"
+    result = {"course_enrollments": enrolled}
+    for name, fn in (("histogram", histogram), ("scan", scan), ("endpoint", endpoint)):
+        timings = []
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - t0) * 1000)
+        result[f"{name}_p50_ms"] = round(percentile(timings, 50), 3)
+        result[f"{name}_p95_ms"] = round(percentile(timings, 95), 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--enrollments", type=int, action="append", dest="sizes")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--one", type=int, help=argparse.SUPPRESS)  # measure one size in this process
+    args = parser.parse_args()
+
+    if args.one is not None:
+        print(json.dumps(measure(args.one, args.requests)))
+        return
+    # One process per size: the app binds its database at import time.
+    results = []
+    for size in args.sizes or [1000, 10000, 100000]:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--one", str(size),
+                              "--requests", str(args.requests)], check=True, stdout=subprocess.PIPE, text=True)
+        results.append(json.loads(out.stdout.splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
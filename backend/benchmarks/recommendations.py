@@ -0,0 +1,97 @@
+"""Recommendation lookups from the in-memory index against a query-time join.
+
+    python benchmarks/recommendations.py --scale 1k --scale 100k
+
+Runs in process on a copy of each seeded scale. `build_sparse_ms` and
+`build_python_ms` are full index builds with NumPy/SciPy and with the
+pure-Python fallback. `related_ms` and `recommended_ms` are the two
+routes through the test client once the index is built; `join_ms` is
+the co-enrollment half of /related done as a self-join on the
+enrollment table per request, which is what the index replaces. The
+routes should stay flat as enrollments grow.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import BACKEND_DIR, percentile
+from seed import SCALES, scratch_copy, template
+
+JOIN = ("SELECT b.course_id, COUNT(*) AS together FROM enrollment a"
+        " JOIN enrollment b ON b.student_id = a.student_id AND b.course_id != a.course_id"
+        " WHERE a.course_id = :course_id GROUP BY b.course_id ORDER BY together DESC, b.course_id LIMIT 20")
+
+
+def timed(fn, requests):
+    timings = []
+    for _ in range(requests):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return round(percentile(timings, 50), 3), round(percentile(timings, 95), 3)
+
+
+def measure(scale, requests):
+    seeded = template(SCALES[scale]["students"], SCALES[scale]["messages"], BACKEND_DIR)
+    os.environ.update({"DATABASE_URL": "sqlite:///" + scratch_copy(seeded), "MAIL_WORKER": "external",
+                       "METRICS_ENABLED": "0"})
+    from app import app, db, recommender, Enrollment
+    rng = random.Random(1)
+    client = app.test_client()
+    with app.app_context():
+        course_ids = [c for (c,) in db.session.query(Enrollment.course_id).distinct()]
+        student_ids = [s for (s,) in db.session.query(Enrollment.student_id).limit(10000)]
+        enrollments = db.session.query(Enrollment.id).count()
+
+        result = {"scale": scale, "enrollments": enrollments, "courses": len(course_ids)}
+        for name, use_sparse in (("sparse", True), ("python", False)):
+            app.config["RECOMMEND_SPARSE"] = use_sparse
+            recommender.build()  # warm imports and the page cache
+            builds = [recommender.build() for _ in range(3)]
+            result[f"build_{name}_ms"] = round(sorted(b.build_ms for b in builds)[1], 1)
+        recommender._index = builds[-1]
+
+        def join():
+            with app.app_context():
+                db.session.execute(db.text(JOIN), {"course_id": rng.choice(course_ids)}).fetchall()
+
+    def related():
+        resp = client.get(f"/api/courses/{rng.choice(course_ids)}/related")
+        assert resp.status_code == 200, resp.status_code
+
+    def recommended():
+        resp = client.get(f"/api/students/{rng.choice(student_ids)}/recommended")
+        assert resp.status_code == 200, resp.status_code
+
+    for name, fn in (("related", related), ("recommended", recommended), ("join", join)):
+        result[f"{name}_p50_ms"], result[f"{name}_p95_ms"] = timed(fn, requests)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), action="append", dest="scales")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--one", help=argparse.SUPPRESS)  # measure one scale in this process
+    args = parser.parse_args()
+
+    if args.one is not None:
+        print(json.dumps(measure(args.one, args.requests)))
+        return
+    # One process per scale: the app binds its database at import time.
+    results = []
+    for scale in args.scales or ["1k", "10k", "100k"]:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--one", scale,
+                              "--requests", str(args.requests)], check=True, stdout=subprocess.PIPE, text=True)
+        results.append(json.loads(out.stdout.splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
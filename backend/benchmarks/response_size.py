@@ -0,0 +1,82 @@
+"""Bytes on the wire and CPU per request for the list endpoints.
+
+    python benchmarks/response_size.py --scale 10k --requests 200
+
+Runs in process against a seeded copy of the database, with the catalog
+cache off so every request serializes. For each route it reports:
+  bytes         - body size with no Accept-Encoding, with gzip and with br
+  cpu_ms        - process CPU per request through the test client, for the
+                  stdlib encoder and orjson, uncompressed and compressed
+  serialize_ms  - just turning the route's rows into a response body
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import BACKEND_DIR
+from seed import SCALES, scratch_copy, template
+
+GRID = "id,title,instructor,duration,rating,students,image,tags"
+ROUTES = [
+    "/api/courses",
+    f"/api/courses?fields={GRID}",
+    "/api/faculty",
+    "/api/students?limit=500",
+    "/api/contact-messages?limit=500",
+]
+ENCODINGS = (("identity", {}), ("gzip", {"Accept-Encoding": "gzip"}), ("br", {"Accept-Encoding": "br"}))
+
+
+def cpu_per_request(client, path, headers, count):
+    t0 = time.process_time()
+    for _ in range(count):
+        client.get(path, headers=headers).close()
+    return round((time.process_time() - t0) * 1000 / count, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    seeded = template(SCALES[args.scale]["students"], SCALES[args.scale]["messages"], BACKEND_DIR)
+    os.environ.update({"DATABASE_URL": "sqlite:///" + scratch_copy(seeded), "CATALOG_CACHE_ENABLED": "0",
+                       "MAIL_WORKER": "external", "METRICS_ENABLED": "0"})
+    from app import app, token_auth
+    import compression
+    import json_provider
+    client = app.test_client()
+    with app.app_context():
+        # The registry and inbox are admin-only
+        admin = {"Authorization": "Bearer " + token_auth.issue(1, "admin")}
+    providers = [("stdlib", False)] + ([("orjson", True)] if json_provider.orjson is not None else [])
+
+    report = {"scale": args.scale, "brotli": compression.brotli is not None, "routes": {}}
+    for path in ROUTES:
+        row = {"bytes": {}, "cpu_ms": {}, "serialize_ms": {}}
+        for name, headers in ENCODINGS:
+            resp = client.get(path, headers={**admin, **headers})
+            row["bytes"][name] = len(resp.data)
+        body = client.get(path, headers=admin).get_json()
+        for provider, use_orjson in providers:
+            app.json.use_orjson = use_orjson
+            for name, headers in ENCODINGS:
+                cpu_per_request(client, path, {**admin, **headers}, 5)  # warm up
+                row["cpu_ms"][f"{provider}+{name}"] = cpu_per_request(client, path, {**admin, **headers}, args.requests)
+            with app.app_context():
+                t0 = time.process_time()
+                for _ in range(args.requests):
+                    app.json.response(body)
+                row["serialize_ms"][provider] = round((time.process_time() - t0) * 1000 / args.requests, 3)
+        app.json.use_orjson = providers[-1][1]
+        report["routes"][path] = row
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
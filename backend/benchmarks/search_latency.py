@@ -0,0 +1,67 @@
+"""Latency of /api/search on a large synthetic catalog.
+
+    python benchmarks/search_latency.py --courses 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import percentile
+
+SYLLABLES = ("ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pa", "qu", "dri", "bel", "tor", "gan")
+
+
+def vocabulary(rng, size):
+    # Synthetic words with a realistic spread of document frequencies.
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    from app import app, db, init_db, search, Course
+    init_db()
+    rng = random.Random(42)
+    words = vocabulary(rng, args.vocabulary)
+    with app.app_context():
+        db.session.execute(Course.__table__.insert(), [{
+            "title": " ".join(rng.sample(words, 3)).title() + f" {i}",
+            "instructor": f"Instructor {i % 500}",
+            "tags": json.dumps(rng.sample(words, 2)),
+        } for i in range(args.courses)])
+        db.session.commit()
+
+        # A prefix of one word plus a second full word, as typed into a search box.
+        queries = [rng.choice(words)[:rng.randint(3, 6)] + " " + rng.choice(words) for _ in range(args.queries)]
+        conn = db.session.connection()
+        timings = []
+        for q in queries:
+            t0 = time.perf_counter()
+            search.search(conn, {"q": q, "limit": "20"})
+            timings.append((time.perf_counter() - t0) * 1000)
+
+    print(json.dumps({
+        "courses": args.courses,
+        "queries": args.queries,
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Seed a database at benchmark scale.
+
+    python benchmarks/seed.py --database-url sqlite:///bench.db --students 100000 --messages 100000
+
+Runs init_db() (migrations and the demo rows), then adds generated
+courses, faculty, users, students with one or two enrollments each, and
+contact messages, shaped like the rows init_db seeds. The same arguments
+and --seed always produce the same data. Rows are inserted with
+executemany in chunks, so a million students takes well under a minute
+on SQLite.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CHUNK = 10000
+
+SCALES = {
+    "1k": {"students": 1000, "messages": 1000},
+    "10k": {"students": 10000, "messages": 10000},
+    "100k": {"students": 100000, "messages": 100000},
+    "1m": {"students": 1000000, "messages": 1000000},
+}
+
+FIRST_NAMES = ["Alice", "Bob", "Charlie", "David", "Emma", "Liam", "Mia", "Noah", "Sophia", "James",
+               "Isabella", "Lucas", "Olivia", "Ethan", "Ava", "Mason", "Priya", "Arjun", "Wei", "Fatima"]
+LAST_NAMES = ["Johnson", "Smith", "Brown", "Wilson", "Garcia", "Miller", "Davis", "Martinez", "Zhang",
+              "Liu", "Williams", "Patel", "Kumar", "Nguyen", "Khan", "Lopez", "Clark", "Lewis"]
+ROLES = ["AI & ML Expert", "Senior System Architect", "Frontend Specialist", "Cybersecurity Expert",
+         "Cloud Architect", "UX/UI Designer", "Data Scientist", "Full Stack Developer", "DevOps Engineer",
+         "Mobile Developer", "Java Developer", "Project Manager", "AI Researcher", "Cloud Engineer"]
+TOPICS = [("System Design", ["Architecture", "Backend"]), ("React Native", ["Mobile", "Frontend"]),
+          ("Machine Learning", ["AI", "Python"]), ("AWS", ["Cloud", "AWS"]), ("CI/CD", ["DevOps", "CI/CD"]),
+          ("Cybersecurity", ["Security", "Ethical Hacking"]), ("Data Science", ["Data Science", "Python"]),
+          ("Web Development", ["Full Stack", "Web Development"]), ("Kubernetes", ["Kubernetes", "DevOps"]),
+          ("Blockchain", ["Blockchain", "Web3"]), ("UI/UX Design", ["Design", "UI/UX"]),
+          ("Flutter", ["Flutter", "Mobile"]), ("Database Optimization", ["Database", "SQL"])]
+LEVELS = ["Introduction to", "Practical", "Advanced", "Mastering", "Applied", "Production"]
+IMAGE = "https://images.unsplash.com/photo-1518770660439-4636190af475?auto=format&fit=crop&q=80&w=600"
+VIDEO = "https://www.youtube.com/watch?v=i53Gi_K397I"
+
+
+def person(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def insert(conn, table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK:
+            conn.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        conn.execute(table.insert(), batch)
+
+
+def populate(students, messages, courses=200, faculty=100, users=1000, seed=1):
+    """Add generated rows to the database `app` is configured for."""
+    from app import (app, db, init_db, rebuild_inbox_stats, rebuild_instructor_stats, rebuild_progress_stats,
+                     password_hasher, Course, ContactMessage, Enrollment, FacultyMember, ProgressEvent, Student, User)
+    init_db()
+    rng = random.Random(seed)
+    with app.app_context():
+        conn = db.session.connection()
+        instructors = [person(rng) for _ in range(faculty)]
+        insert(conn, FacultyMember.__table__, (
+            {"name": name, "role": rng.choice(ROLES), "bio": f"{rng.randint(3, 25)}+ years teaching {rng.choice(TOPICS)[0]}."}
+            for name in instructors))
+
+        first_course = (db.session.query(db.func.max(Course.id)).scalar() or 0) + 1
+        insert(conn, Course.__table__, ({
+            "title": f"{rng.choice(LEVELS)} {topic} {i}",
+            "instructor": rng.choice(instructors),
+            "duration": f"{rng.randint(4, 14)} weeks",
+            "rating": round(rng.uniform(4.0, 5.0), 1),
+            "students": 0,
+            "image": IMAGE,
+            "tags": json.dumps(tags),
+            "video_url": VIDEO,
+        } for i, (topic, tags) in ((i, rng.choice(TOPICS)) for i in range(courses))))
+        course_ids = list(range(first_course, first_course + courses))
+
+        password = password_hasher.hash("password123")  # one scrypt, shared by every generated user
+        insert(conn, User.__table__, ({
+            "email": f"bench.user{i}@example.com", "password": password, "name": person(rng),
+            "role": "faculty" if i % 20 == 0 else "student",
+        } for i in range(users)))
+
+        first_student = (db.session.query(db.func.max(Student.id)).scalar() or 0) + 1
+        insert(conn, Student.__table__, (
+            {"name": person(rng), "email": f"bench.student{i}@example.com"} for i in range(students)))
+
+        enrolled = dict.fromkeys(course_ids, 0)
+
+        def enrollments():
+            for student_id in range(first_student, first_student + students):
+                picks = rng.sample(course_ids, 2 if rng.random() < 0.3 else 1)
+                for course_id in picks:
+                    enrolled[course_id] += 1
+                    yield {"student_id": student_id, "course_id": course_id, "progress": rng.randint(0, 100)}
+
+        insert(conn, Enrollment.__table__, enrollments())
+        conn.execute(Course.__table__.update().where(Course.__table__.c.id == db.bindparam("course_id"))
+                     .values(students=db.bindparam("count")),
+                     [{"course_id": cid, "count": count} for cid, count in enrolled.items()])
+
+        start = time.time() - 365 * 86400
+        insert(conn, ContactMessage.__table__, ({
+            "name": person(rng), "email": f"visitor{rng.randint(0, messages)}@example.com",
+            "message": f"Question about the {rng.choice(TOPICS)[0]} course, message {i}.",
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start + i * 365 * 86400 / max(messages, 1))),
+            "is_read": rng.random() < 0.5,
+        } for i in range(messages)))
+
+        rebuild_instructor_stats()
+        rebuild_inbox_stats()
+        rebuild_progress_stats()
+        # One logged change per enrollment that has made progress
+        conn.execute(ProgressEvent.__table__.insert().from_select(
+            ["student_id", "course_id", "delta", "progress", "created_at"],
+            db.select(Enrollment.student_id, Enrollment.course_id, Enrollment.progress, Enrollment.progress,
+                      db.literal(time.time())).where(Enrollment.progress > 0)))
+        db.session.commit()
+
+
+def template(students, messages, backend_dir, cache_dir=None, seed=1):
+    """Path of a seeded SQLite file for these arguments, built on first use.
+
+    Keyed by the backend's migrations.py so a schema change rebuilds it.
+    """
+    with open(os.path.join(backend_dir, "migrations.py"), "rb") as f:
+        schema = hashlib.sha1(f.read()).hexdigest()[:10]
+    cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "portal-bench")
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"seed-{students}-{messages}-{seed}-{schema}.db")
+    if not os.path.exists(path):
+        building = f"{path}.{os.getpid()}"
+        subprocess.run([sys.executable, os.path.join(BENCH_DIR, "seed.py"), "--backend", backend_dir,
+                        "--database-url", "sqlite:///" + building, "--students", str(students),
+                        "--messages", str(messages), "--seed", str(seed)],
+                       check=True, env={**os.environ, "MAIL_WORKER": "external"}, stdout=sys.stderr)
+        os.replace(building, path)
+    return path
+
+
+def scratch_copy(path):
+    copy = os.path.join(tempfile.mkdtemp(), "bench.db")
+    with sqlite3.connect(path) as src, sqlite3.connect(copy) as dst:
+        src.backup(dst)
+    return copy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--scale", choices=sorted(SCALES), help="preset for --students and --messages")
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--faculty", type=int, default=100)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--backend", default=os.path.dirname(BENCH_DIR), help="backend directory to import app from")
+    args = parser.parse_args()
+    if args.scale:
+        args.students, args.messages = SCALES[args.scale]["students"], SCALES[args.scale]["messages"]
+
+    os.environ["DATABASE_URL"] = args.database_url
+    sys.path.insert(0, os.path.abspath(args.backend))
+    t0 = time.perf_counter()
+    populate(args.students, args.messages, args.courses, args.faculty, args.users, args.seed)
+    # Close the pool so SQLite checkpoints the WAL into the file; template()
+    # moves the file and would leave the -wal behind.
+    from app import app, db
+    with app.app_context():
+        db.engine.dispose()
+    print(f"Seeded {args.students} students and {args.messages} messages in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
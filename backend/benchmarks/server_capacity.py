@@ -0,0 +1,95 @@
+"""Concurrent-connection capacity: sync workers vs gunicorn.conf.py (gthread).
+
+    python benchmarks/server_capacity.py --workers 2 --duration 5
+
+Both servers get the same number of processes on the same seeded database;
+"sync" is `-k sync`, the old setup, and "gthread" is the shipped config.
+  sweep         - /api/courses at --concurrency levels, one keep-alive
+                  connection per client
+  idle_clients  - --idle-clients connections are opened and left silent
+                  (browser preconnects, clients on slow networks), then
+                  first_response_s is how long a new request waits to be
+                  served. A sync worker reads each silent connection
+                  until it gives up; gthread lends each one a thread for 5
+                  seconds before parking it in its poller, so it only
+                  does better with threads to spare. "after" is
+                  /api/courses once the server has recovered
+  mixed         - 4 readers on /api/courses/1 while 8 clients enroll
+                  students, so requests queue on the SQLite write lock
+
+Single runs are noisy on small machines; compare a few.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import BACKEND_DIR, drive, gunicorn
+from seed import scratch_copy, template
+
+SERVERS = (("sync", ("-k", "sync")), ("gthread", ()))
+
+
+def idle(port, count):
+    """Open `count` connections that never send anything."""
+    return [socket.create_connection(("127.0.0.1", port)) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", default="4,16,64")
+    parser.add_argument("--idle-clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--students", type=int, default=10000)
+    args = parser.parse_args()
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    seeded = template(args.students, 1000, BACKEND_DIR)
+    emails = itertools.count()
+    report = {"workers": args.workers}
+    for label, extra in SERVERS:
+        env = {"DATABASE_URL": "sqlite:///" + scratch_copy(seeded), "MAIL_WORKER": "external",
+               "LOGIN_RATE_LIMIT": "0"}
+        run = {}
+        with gunicorn(env, workers=args.workers, extra_args=extra) as port:
+            run["sweep"] = {str(c): drive(port, "/api/courses", c, args.duration) for c in levels}
+
+            socks = idle(port, args.idle_clients)
+            try:
+                t0 = time.perf_counter()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+                conn.request("GET", "/api/courses")
+                conn.getresponse().read()
+                conn.close()
+                run["idle_clients"] = {"first_response_s": round(time.perf_counter() - t0, 2),
+                                       "after": drive(port, "/api/courses", 4, args.duration)}
+            finally:
+                for sock in socks:
+                    sock.close()
+
+            def enroll():
+                return json.dumps({"name": "Capacity Bench", "email": f"capacity{next(emails)}@example.com",
+                                   "course_id": 1})
+
+            writes = {}
+            writer = threading.Thread(target=lambda: writes.update(drive(
+                port, "/api/enroll", 8, args.duration, method="POST",
+                headers={"Content-Type": "application/json"}, body=enroll)))
+            writer.start()
+            run["mixed"] = {"reads": drive(port, "/api/courses/1", 4, args.duration)}
+            writer.join()
+            run["mixed"]["writes"] = writes
+        report[label] = run
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
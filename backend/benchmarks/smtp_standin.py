@@ -0,0 +1,66 @@
+import socketserver
+import threading
+import time
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    # Just enough of RFC 5321 for smtplib.sendmail(); no TLS, no AUTH.
+
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+        self.wfile.flush()
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 localhost stand-in ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.decode(errors="replace").strip().split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                # Simulate a slow relay: the delay lands on whoever is
+                # waiting for the 250 after DATA.
+                time.sleep(server.delay)
+                server.messages += 1
+                self.reply("250 OK queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Local SMTP server that accepts everything after `delay` seconds."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, delay=0.0, host="127.0.0.1", port=0):
+        super().__init__((host, port), _SMTPHandler)
+        self.delay = delay
+        self.messages = 0
+        self.connections = 0
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,100 @@
+"""Course deletes against the purge that follows them.
+
+    python benchmarks/soft_delete.py --scale 100k --courses 20
+
+Runs in process on a copy of the seed. `delete_ms` is the time for the
+DELETE requests of the `--courses` biggest courses, which only mark the
+courses and their enrollments. The marked rows are then purged twice
+while another thread keeps saving progress on other enrollments: once
+with PURGE_BATCH_SIZE `--batch` (`batched`), and once in a single
+transaction (`single`), which is what a hard delete in the request used
+to cost. `max_step_ms` is the longest purge step, waiting for the write
+lock included, and `write_max_ms` the slowest save of the other writer.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import BACKEND_DIR
+from seed import SCALES, scratch_copy, template
+
+
+def ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="100k")
+    parser.add_argument("--courses", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    seeded = template(SCALES[args.scale]["students"], SCALES[args.scale]["messages"], BACKEND_DIR)
+    path = scratch_copy(seeded)
+    os.environ.update({"DATABASE_URL": "sqlite:///" + path, "MAIL_WORKER": "external",
+                       "PURGE_WORKER": "off", "METRICS_ENABLED": "0"})
+    from app import app, db, purger, token_auth, Enrollment
+    client = app.test_client()
+    with app.app_context():
+        headers = {"Authorization": "Bearer " + token_auth.issue(1, "admin")}
+        counts = db.session.query(Enrollment.course_id, db.func.count()).group_by(Enrollment.course_id) \
+            .order_by(db.func.count().desc()).limit(args.courses).all()
+        course_ids = [cid for cid, _ in counts]
+        others = [i for (i,) in db.session.query(Enrollment.id).filter(Enrollment.course_id.notin_(course_ids))
+                  .order_by(Enrollment.id).limit(2000)]
+
+    result = {"scale": args.scale, "courses": len(course_ids), "enrollments": sum(n for _, n in counts)}
+    t0 = time.perf_counter()
+    for cid in course_ids:
+        assert client.delete(f"/api/courses/{cid}", headers=headers).status_code == 200
+    result["delete_ms"] = ms(time.perf_counter() - t0)
+    # Both runs start from the same marked rows: keep a copy to restore.
+    marked = scratch_copy(path)
+    for name, batch in (("batched", args.batch), ("single", result["enrollments"] + len(course_ids))):
+        with sqlite3.connect(marked) as src, sqlite3.connect(path) as dst:
+            src.backup(dst)
+        result[name] = purge_under_load(app, purger, client, headers, others, batch)
+    print(json.dumps(result, indent=2))
+
+
+def purge_under_load(app, purger, client, headers, others, batch):
+    rng = random.Random(1)
+    waits, stop = [], threading.Event()
+
+    def writer():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            resp = client.patch(f"/api/students/{rng.choice(others)}", json={"progress": rng.randint(0, 100)},
+                                headers=headers)
+            assert resp.status_code == 200, resp.status_code
+            waits.append(time.perf_counter() - t0)
+
+    app.config["PURGE_BATCH_SIZE"] = batch
+    thread = threading.Thread(target=writer)
+    thread.start()
+    steps = []
+    t0 = time.perf_counter()
+    while True:
+        s0 = time.perf_counter()
+        done = purger.step()
+        if done is None:
+            break
+        steps.append(time.perf_counter() - s0)
+    total = time.perf_counter() - t0
+    stop.set()
+    thread.join()
+    return {"batch": batch, "purge_ms": ms(total), "steps": len(steps), "max_step_ms": ms(max(steps, default=0)),
+            "writes": len(waits), "write_p50_ms": ms(statistics.median(waits)), "write_max_ms": ms(max(waits))}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+"""Benchmark every /api route and compare runs.
+
+    python benchmarks/suite.py run --scale 10k --output head.json
+    python benchmarks/suite.py compare base.json head.json
+    python benchmarks/suite.py against main --scale 10k --repeat 3
+
+`run` seeds (or reuses) a database at the given scale with seed.py, then
+drives each route through the Flask test client in process (one client,
+no network) and through gunicorn with concurrent clients. It reports
+requests, throughput, p50/p95/p99 latency and status counts per route as
+JSON. Reads run first; writes and deletes run last on rows made for them.
+Every mode and run starts from a fresh copy of the seeded template.
+/api/events is a long-lived stream and has its own benchmark,
+event_fanout.py.
+
+`compare` flags routes whose throughput dropped or p95 rose by more than
+--threshold percent, or whose share of errors grew, and exits 1 if there
+are any. `against REF` checks
+REF out into a temporary git worktree, runs the same suite against its
+backend and then against this tree, and compares the two.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+
+from load import drive, gunicorn, percentile
+from seed import SCALES, scratch_copy, template
+
+SECRET = "benchmark-secret"
+SERVER_ENV = {"MAIL_WORKER": "external", "LOGIN_RATE_LIMIT": "0", "SECRET_KEY": SECRET}
+JSON = {"Content-Type": "application/json"}
+USERS = 1000  # seed.py's default; every one has the password "password123"
+
+
+class Scenario:
+    def __init__(self, name, path, method="GET", body=None, role=None, prepare=None):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.body = body
+        self.role = role
+        self.prepare = prepare
+
+
+def json_body(make):
+    return lambda: json.dumps(make())
+
+
+def scenarios(ctx):
+    """Route definitions; `ctx` holds ids looked up from the seeded data."""
+    rng = random.Random(7)
+    n = itertools.count()
+    course_ids, enrollment_ids, faculty_ids = ctx["course_ids"], ctx["enrollment_ids"], ctx["faculty_ids"]
+    message_ids = ctx["message_ids"]
+
+    def pick(ids, fmt):
+        return lambda: fmt.format(rng.choice(ids))
+
+    def bulk(make):
+        return json_body(lambda: [make(next(n)) for _ in range(100)])
+
+    return [
+        Scenario("health", "/"),
+        Scenario("courses_list", "/api/courses"),
+        Scenario("courses_page", "/api/courses?limit=20&sort=title"),
+        Scenario("course_detail", pick(course_ids, "/api/courses/{}")),
+        Scenario("course_progress_stats", pick(course_ids, "/api/courses/{}/progress-stats")),
+        Scenario("course_related", pick(course_ids, "/api/courses/{}/related")),
+        Scenario("student_recommended", pick(ctx["student_ids"], "/api/students/{}/recommended")),
+        Scenario("search", "/api/search?q=data%20science"),
+        Scenario("faculty_list", "/api/faculty?limit=50"),
+        Scenario("faculty_analytics", "/api/faculty/analytics?instructor=" + ctx["instructor"].replace(" ", "%20")),
+        Scenario("students_page", "/api/students?limit=50", role="admin"),
+        Scenario("students_by_course", pick(course_ids, "/api/students?course_id={}&limit=50"), role="admin"),
+        Scenario("students_by_email", lambda: f"/api/students?email=bench.student{rng.randrange(ctx['students'])}@example.com",
+                 role="admin"),
+        Scenario("students_export", pick(course_ids, "/api/students?format=csv&course_id={}"), role="admin"),
+        Scenario("contact_messages", "/api/contact-messages?limit=50", role="admin"),
+        Scenario("contact_unread", "/api/contact-messages?is_read=false&limit=50", role="admin"),
+        Scenario("contact_summary", "/api/contact-messages/summary"),
+
+        Scenario("contact_submit", "/api/contact", "POST", json_body(lambda: {
+            "name": "Bench Visitor", "email": f"visitor{next(n)}@example.com", "message": "Benchmark message"})),
+        Scenario("enroll", "/api/enroll", "POST", json_body(lambda: {
+            "name": "Bench Enrollee", "email": f"enrollee{next(n)}@example.com", "course_id": rng.choice(course_ids)})),
+        Scenario("signup", "/api/signup", "POST", json_body(lambda: {
+            "name": "Bench Signup", "email": f"signup{next(n)}@example.com", "password": "password123"})),
+        Scenario("login", "/api/login", "POST", json_body(lambda: {
+            "email": f"bench.user{rng.randrange(ctx['users'])}@example.com", "password": "password123"})),
+        Scenario("logout", "/api/logout", "POST", role="student"),
+        Scenario("course_create", "/api/courses", "POST", json_body(lambda: {
+            "title": f"Bench Course {next(n)}", "instructor": ctx["instructor"], "duration": "6 weeks",
+            "tags": ["Bench"]}), role="faculty"),
+        Scenario("student_update", pick(enrollment_ids, "/api/students/{}"), "PUT",
+                 json_body(lambda: {"progress": rng.randint(0, 100)}), role="admin"),
+        Scenario("faculty_update", pick(faculty_ids, "/api/faculty/{}"), "PUT",
+                 json_body(lambda: {"bio": f"Updated bio {next(n)}"}), role="admin"),
+        Scenario("student_patch", pick(enrollment_ids, "/api/students/{}"), "PATCH",
+                 json_body(lambda: {"progress": rng.randint(0, 100)}), role="admin"),
+        Scenario("faculty_patch", pick(faculty_ids, "/api/faculty/{}"), "PATCH",
+                 json_body(lambda: {"bio": f"Patched bio {next(n)}"}), role="admin"),
+        Scenario("students_batch_patch", "/api/students", "PATCH", json_body(lambda: [
+            {"id": i, "progress": rng.randint(0, 100)} for i in rng.sample(enrollment_ids, min(50, len(enrollment_ids)))]),
+                 role="admin"),
+        # Marks read and unread alternately so repeated runs keep flipping rows
+        Scenario("contact_mark_read", "/api/contact-messages/mark-read", "POST", json_body(lambda: {
+            "ids": rng.sample(message_ids, min(20, len(message_ids))), "read": rng.random() < 0.5}), role="admin"),
+        Scenario("contact_mark_all_read", "/api/contact-messages/mark-all-read", "POST", json_body(lambda: {
+            "up_to_id": rng.choice(message_ids)}), role="admin"),
+        Scenario("bulk_students", "/api/bulk/students", "POST", bulk(lambda i: {
+            "name": "Bulk Student", "email": f"bulk{i}@example.com", "course_id": rng.choice(course_ids)}), role="admin"),
+        Scenario("bulk_courses", "/api/bulk/courses", "POST", bulk(lambda i: {
+            "title": f"Bulk Course {i}", "instructor": ctx["instructor"], "rating": 4.5}), role="admin"),
+        Scenario("bulk_faculty", "/api/bulk/faculty", "POST", bulk(lambda i: {
+            "name": f"Bulk Faculty {i}", "role": "Instructor"}), role="admin"),
+
+        Scenario("course_delete", "/api/courses/{}", "DELETE", role="admin", prepare=disposable_courses),
+        Scenario("faculty_delete", "/api/faculty/{}", "DELETE", role="admin", prepare=disposable_faculty),
+        Scenario("student_delete", "/api/students/{}", "DELETE", role="admin", prepare=disposable_enrollments),
+    ]
+
+
+# Rows for the delete scenarios, inserted just before they run so the
+# read scenarios never see them. Each batch gets its own tag.
+
+def disposable_courses(conn, count, text, tag):
+    conn.execute(text("INSERT INTO course (title, instructor, duration, rating, students, tags) "
+                      "VALUES (:title, :tag, '1 week', 4.0, 0, '[]')"),
+                 [{"title": f"{tag} Course {i}", "tag": tag} for i in range(count)])
+    return [r[0] for r in conn.execute(text("SELECT id FROM course WHERE instructor = :tag"), {"tag": tag})]
+
+
+def disposable_faculty(conn, count, text, tag):
+    conn.execute(text("INSERT INTO faculty_member (name, role, bio) VALUES (:name, :tag, '')"),
+                 [{"name": f"{tag} Faculty {i}", "tag": tag} for i in range(count)])
+    return [r[0] for r in conn.execute(text("SELECT id FROM faculty_member WHERE role = :tag"), {"tag": tag})]
+
+
+def disposable_enrollments(conn, count, text, tag):
+    conn.execute(text("INSERT INTO student (name, email) VALUES (:tag, :email)"),
+                 [{"tag": tag, "email": f"{tag.replace(' ', '.').lower()}.{i}@example.com"} for i in range(count)])
+    course_id = conn.execute(text("SELECT MIN(id) FROM course")).scalar()
+    conn.execute(text("INSERT INTO enrollment (student_id, course_id, progress) "
+                      "SELECT id, :course_id, 0 FROM student WHERE name = :tag"), {"course_id": course_id, "tag": tag})
+    conn.execute(text("UPDATE course SET students = students + :count WHERE id = :course_id"),
+                 {"count": count, "course_id": course_id})
+    from sqlalchemy import inspect
+    if inspect(conn).has_table("course_progress_stats"):  # absent in trees before progress tracking
+        params = {"count": count, "course_id": course_id}
+        if not conn.execute(text("UPDATE course_progress_stats SET students = students + :count "
+                                 "WHERE course_id = :course_id AND bucket = 0"), params).rowcount:
+            conn.execute(text("INSERT INTO course_progress_stats (course_id, bucket, students, progress_sum) "
+                              "VALUES (:course_id, 0, :count, 0)"), params)
+    return [r[0] for r in conn.execute(text(
+        "SELECT enrollment.id FROM enrollment JOIN student ON student.id = enrollment.student_id "
+        "WHERE student.name = :tag"), {"tag": tag})]
+
+
+def lookup(url, students, users):
+    from sqlalchemy import create_engine, text
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        ctx = {
+            "students": students,
+            "users": users,
+            "course_ids": [r[0] for r in conn.execute(text("SELECT id FROM course"))],
+            "faculty_ids": [r[0] for r in conn.execute(text("SELECT id FROM faculty_member"))],
+            "enrollment_ids": [r[0] for r in conn.execute(text("SELECT id FROM enrollment ORDER BY id LIMIT 10000"))],
+            "student_ids": [r[0] for r in conn.execute(text("SELECT student_id FROM enrollment ORDER BY id LIMIT 10000"))],
+            "message_ids": [r[0] for r in conn.execute(text("SELECT id FROM contact_message ORDER BY id LIMIT 10000"))],
+            "instructor": conn.execute(text("SELECT instructor FROM course ORDER BY students DESC")).first()[0],
+        }
+    engine.dispose()
+    return ctx
+
+
+_batches = itertools.count(1)
+
+
+def prepare_targets(url, scenario, count):
+    """Insert rows for a delete scenario; returns a path callable that
+    raises StopIteration once every row has been used."""
+    from sqlalchemy import create_engine, text
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        ids = scenario.prepare(conn, count, text, f"Disposable {next(_batches)}")
+    engine.dispose()
+    next_id = iter(ids).__next__  # atomic under the GIL, safe across client threads
+    return lambda: scenario.path.format(next_id())
+
+
+def drive_client(client, method, path, duration, headers, body):
+    """Sequential requests through the Flask test client; same report shape as load.drive."""
+    latencies, statuses = [], {}
+    stop_at = time.perf_counter() + duration
+    started = time.perf_counter()
+    while time.perf_counter() < stop_at:
+        try:
+            url = path() if callable(path) else path
+        except StopIteration:
+            break
+        t0 = time.perf_counter()
+        try:
+            response = client.open(url, method=method, headers=headers() if callable(headers) else headers,
+                                   data=body() if callable(body) else body)
+            response.get_data()
+            response.close()
+            status = response.status_code
+        except Exception as e:  # raised out of a streamed body; the app's own 500s are responses
+            if "error" not in statuses:
+                print(f"{method} {url}: {e!r}", file=sys.stderr)
+            status = "error"
+        latencies.append((time.perf_counter() - t0) * 1000)
+        statuses[status] = statuses.get(status, 0) + 1
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "statuses": {str(k): v for k, v in statuses.items()},
+    }
+
+
+def git_commit(directory):
+    try:
+        return subprocess.run(["git", "-C", directory, "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    backend = os.path.abspath(args.backend)
+    students, messages = SCALES[args.scale]["students"], SCALES[args.scale]["messages"]
+    seeded = template(students, messages, backend, args.cache_dir)
+    selected = set(args.routes.split(",")) if args.routes else None
+
+    # The in-process app (test client mode, token signing) gets its own copy.
+    client_db = "sqlite:///" + scratch_copy(seeded)
+    os.environ.update(SERVER_ENV, DATABASE_URL=client_db)
+    sys.path.insert(0, backend)
+    from app import app, token_auth
+    with app.app_context():
+        tokens = {role: token_auth.issue(1, role) for role in ("student", "faculty", "admin")}
+
+    def headers_for(scenario):
+        if scenario.name == "logout":  # every logout needs a token nobody has revoked yet
+            return lambda: {"Authorization": "Bearer " + token_auth.issue(1, "student")}
+        headers = dict(JSON) if scenario.body else {}
+        if scenario.role:
+            headers["Authorization"] = "Bearer " + tokens[scenario.role]
+        return headers
+
+    report = {
+        "meta": {
+            "commit": git_commit(backend), "backend": backend, "scale": args.scale, "students": students,
+            "messages": messages, "duration": args.duration, "repeat": args.repeat, "concurrency": args.concurrency,
+            "workers": args.workers, "python": platform.python_version(), "cpus": os.cpu_count(),
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+    }
+
+    def run_mode(mode, url, drive_one):
+        ctx = lookup(url, students, USERS)
+        results = {}
+        for scenario in scenarios(ctx):
+            if selected and scenario.name not in selected:
+                continue
+            # Best of --repeat runs: interference from the rest of the machine
+            # only ever makes a run slower.
+            runs = []
+            for _ in range(args.repeat):
+                path = prepare_targets(url, scenario, args.delete_rows) if scenario.prepare else scenario.path
+                runs.append(drive_one(scenario, path))
+            results[scenario.name] = max(runs, key=lambda r: r["rps"])
+            print(f"{mode:8} {scenario.name:20} {json.dumps(results[scenario.name])}", file=sys.stderr)
+        report[mode] = results
+
+    if args.mode in ("client", "both"):
+        client = app.test_client()
+        run_mode("client", client_db, lambda s, path: drive_client(
+            client, s.method, path, args.duration, headers_for(s), s.body))
+
+    if args.mode in ("gunicorn", "both"):
+        server_db = "sqlite:///" + scratch_copy(seeded)
+        extra = tuple(args.gunicorn_args.split())
+        with gunicorn(dict(SERVER_ENV, DATABASE_URL=server_db), workers=args.workers, extra_args=extra,
+                      backend_dir=backend) as port:
+            run_mode("gunicorn", server_db, lambda s, path: drive(
+                port, path, args.concurrency, args.duration, method=s.method, headers=headers_for(s), body=s.body))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return report
+
+
+def error_rate(result):
+    failed = sum(count for status, count in result["statuses"].items() if not status.startswith(("2", "3")))
+    return failed / result["requests"] * 100 if result["requests"] else 0.0
+
+
+def compare_reports(base, head, threshold, min_ms=1.0):
+    """Print a per-route comparison; return the list of regressions.
+
+    A route regresses when its throughput drops or its p95 rises by more
+    than `threshold` percent (and at least `min_ms`), or when its share of
+    errors grows by more than a percentage point. Latency is only compared
+    between runs where the route was working in the base.
+    """
+    regressions = []
+    print(f"{'mode':8} {'route':20} {'rps base':>9} {'rps head':>9} {'rps %':>8} "
+          f"{'p95 base':>9} {'p95 head':>9} {'p95 %':>8} {'err% base':>9} {'err% head':>9}")
+    for mode in ("client", "gunicorn"):
+        for route, new in head.get(mode, {}).items():
+            old = base.get(mode, {}).get(route)
+            if not old or not old["requests"] or not new["requests"]:
+                continue
+            old_err, new_err = error_rate(old), error_rate(new)
+            rps = (new["rps"] - old["rps"]) / old["rps"] * 100 if old["rps"] else None
+            p95 = (new["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 if old["p95_ms"] else None
+            worse = new_err > old_err + 1 or (old_err <= 1 and (
+                (rps is not None and rps < -threshold) or
+                (p95 is not None and p95 > threshold and new["p95_ms"] - old["p95_ms"] >= min_ms)))
+            if worse:
+                regressions.append((mode, route))
+            rps_text = "n/a" if rps is None else f"{rps:+.1f}%"
+            p95_text = "n/a" if p95 is None else f"{p95:+.1f}%"
+            print(f"{mode:8} {route:20} {old['rps']:>9} {new['rps']:>9} {rps_text:>8} "
+                  f"{old['p95_ms']:>9} {new['p95_ms']:>9} {p95_text:>8} {old_err:>9.1f} {new_err:>9.1f}"
+                  f"{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    regressions = compare_reports(base, head, args.threshold)
+    print(f"\n{len(regressions)} regression(s) over {args.threshold}%")
+    return 1 if regressions else 0
+
+
+def against(args):
+    """Run the suite on REF (in a temporary worktree) and on this tree, then compare."""
+    repo = subprocess.run(["git", "-C", BACKEND_DIR, "rev-parse", "--show-toplevel"],
+                          capture_output=True, text=True, check=True).stdout.strip()
+    relative = os.path.relpath(BACKEND_DIR, repo)
+    workdir = tempfile.mkdtemp()
+    worktree = os.path.join(workdir, "tree")
+    subprocess.run(["git", "-C", repo, "worktree", "add", "--detach", worktree, args.ref], check=True)
+    try:
+        base_json, head_json = os.path.join(workdir, "base.json"), os.path.join(workdir, "head.json")
+        common = ["--scale", args.scale, "--mode", args.mode, "--duration", str(args.duration),
+                  "--repeat", str(args.repeat),
+                  "--concurrency", str(args.concurrency), "--workers", str(args.workers),
+                  "--gunicorn-args", args.gunicorn_args, "--delete-rows", str(args.delete_rows)]
+        if args.routes:
+            common += ["--routes", args.routes]
+        if args.cache_dir:
+            common += ["--cache-dir", args.cache_dir]
+        for backend, output in ((os.path.join(worktree, relative), base_json), (BACKEND_DIR, head_json)):
+            subprocess.run([sys.executable, os.path.abspath(__file__), "run", *common,
+                            "--backend", backend, "--output", output], check=True)
+        print(f"base: {args.ref}, head: working tree; reports in {workdir}")
+        args.base, args.head = base_json, head_json
+        return compare(args)
+    finally:
+        subprocess.run(["git", "-C", repo, "worktree", "remove", "--force", worktree], check=False)
+
+
+def add_run_options(parser):
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--mode", choices=("client", "gunicorn", "both"), default="both")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per route")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per route; the fastest is reported")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads in gunicorn mode")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--gunicorn-args", default="", help="extra gunicorn arguments, e.g. '-k sync'")
+    parser.add_argument("--routes", help="comma-separated scenario names (default: all)")
+    parser.add_argument("--delete-rows", type=int, default=2000, help="rows made for each delete scenario")
+    parser.add_argument("--cache-dir", help="where seeded templates are kept (default: <tmp>/portal-bench)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="benchmark this (or another) backend")
+    add_run_options(run_parser)
+    run_parser.add_argument("--backend", default=BACKEND_DIR, help="backend directory to benchmark")
+    run_parser.add_argument("--output", help="write the JSON report here instead of stdout")
+
+    compare_parser = commands.add_parser("compare", help="compare two reports")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument("--threshold", type=float, default=15.0, help="percent change that counts")
+
+    against_parser = commands.add_parser("against", help="run on a git ref and on this tree, then compare")
+    against_parser.add_argument("ref")
+    add_run_options(against_parser)
+    against_parser.add_argument("--threshold", type=float, default=15.0, help="percent change that counts")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    elif args.command == "compare":
+        sys.exit(compare(args))
+    else:
+        sys.exit(against(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Per-request cost of token verification.
+
+    python benchmarks/token_verify.py --iterations 100000
+
+Times TokenAuth.verify() with the revocation list on and off, and the
+whole `required("admin")` decorator around an empty view, against the
+same empty view undecorated.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def per_call_us(fn, iterations):
+    fn()  # warm caches (and the revocation list)
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - t0) / iterations * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    from app import app, init_db, token_auth
+    init_db()
+    token = token_auth.issue(1, "admin")
+
+    def view():
+        return "ok"
+
+    guarded = token_auth.required("admin")(view)
+    report = {}
+    with app.test_request_context("/", headers={"Authorization": "Bearer " + token}):
+        report["issue_us"] = per_call_us(lambda: token_auth.issue(1, "admin"), args.iterations)
+        app.config["AUTH_REVOCATION"] = False
+        report["verify_us"] = per_call_us(lambda: token_auth.verify(token), args.iterations)
+        app.config["AUTH_REVOCATION"] = True
+        report["verify_with_revocation_us"] = per_call_us(lambda: token_auth.verify(token), args.iterations)
+        report["view_us"] = per_call_us(view, args.iterations)
+        report["guarded_view_us"] = per_call_us(guarded, args.iterations)
+    report["decorator_overhead_us"] = round(report["guarded_view_us"] - report["view_us"], 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
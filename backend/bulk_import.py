@@ -0,0 +1,151 @@
+import csv
+import io
+import json
+
+IMPORT_FORMATS = {
+    'application/json': 'json',
+    'application/x-ndjson': 'ndjson',
+    'text/csv': 'csv',
+}
+
+# Rows validated, de-duplicated and inserted per transaction.
+CHUNK_SIZE = 1000
+# Read-ahead on the request body; the raw stream returns one line per read.
+BUFFER_BYTES = 64 * 1024
+
+
+class BulkImportError(ValueError):
+    """The upload as a whole cannot be read (unsupported type, bad JSON)."""
+
+
+class RowError(ValueError):
+    """One row is invalid; it is reported back and skipped."""
+
+
+def _record(number, record):
+    if isinstance(record, dict):
+        return number, record
+    return number, RowError("Expected an object")
+
+
+def read_rows(request):
+    """Yield (row_number, record) pairs from a JSON array, NDJSON or CSV body.
+
+    NDJSON and CSV are decoded from the request stream as they arrive, so
+    an upload is never held in memory as a whole. A row that cannot be
+    decoded is yielded as a RowError in place of its record.
+    """
+    fmt = IMPORT_FORMATS.get(request.mimetype)
+    if fmt is None:
+        raise BulkImportError(f"Unsupported Content-Type {request.mimetype!r}; "
+                              f"send one of {', '.join(IMPORT_FORMATS)}")
+
+    if fmt == 'json':
+        data = request.get_json(silent=True)
+        if not isinstance(data, list):
+            raise BulkImportError("Expected a JSON array of rows")
+        for number, record in enumerate(data, 1):
+            yield _record(number, record)
+        return
+
+    stream = io.BufferedReader(request.stream, BUFFER_BYTES)
+    if fmt == 'ndjson':
+        number = 0
+        for line in stream:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield number, RowError("Invalid JSON")
+                continue
+            yield _record(number, record)
+
+    else:
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        number = 0
+        try:
+            for record in csv.DictReader(text):
+                number += 1
+                # Columns missing from a short line come back as None.
+                yield number, {key.strip(): value for key, value in record.items()
+                               if key is not None and value is not None}
+        except (csv.Error, UnicodeDecodeError) as e:
+            yield number + 1, RowError(f"Unreadable CSV, import stopped here: {e}")
+
+
+def text_field(record, name, required=False, max_length=None):
+    value = record.get(name)
+    if value is not None and not isinstance(value, str):
+        value = str(value)
+    value = (value or '').strip()
+    if not value:
+        if required:
+            raise RowError(f"{name} is required")
+        return None
+    if max_length and len(value) > max_length:
+        raise RowError(f"{name} is longer than {max_length} characters")
+    return value
+
+
+def number_field(record, name, cast, minimum=None, maximum=None):
+    value = record.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        value = cast(value)
+    except (TypeError, ValueError):
+        raise RowError(f"{name} must be a number")
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise RowError(f"{name} is out of range")
+    return value
+
+
+def list_field(record, name):
+    """A list from JSON, or from a CSV cell holding a JSON array or a comma-separated string."""
+    value = record.get(name)
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        if value.lstrip().startswith('['):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                raise RowError(f"{name} is not a valid JSON array")
+        else:
+            value = [item.strip() for item in value.split(',') if item.strip()]
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise RowError(f"{name} must be a list of strings")
+    return value
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_import(rows, import_chunk, chunk_size=CHUNK_SIZE):
+    """Feed `rows` to `import_chunk` `chunk_size` at a time; build the report.
+
+    `import_chunk` receives the decodable (row_number, record) pairs of one
+    chunk, writes and commits them as one transaction, and returns
+    {row_number: message} for the rows it rejected.
+    """
+    report = {"received": 0, "inserted": 0, "failed": 0, "errors": []}
+    for chunk in _chunks(rows, chunk_size):
+        errors = {number: str(record) for number, record in chunk if isinstance(record, RowError)}
+        valid = [(number, record) for number, record in chunk if not isinstance(record, RowError)]
+        if valid:
+            errors.update(import_chunk(valid))
+        report["received"] += len(chunk)
+        report["failed"] += len(errors)
+        report["inserted"] += len(chunk) - len(errors)
+        report["errors"].extend({"row": number, "error": errors[number]} for number in sorted(errors))
+    return report
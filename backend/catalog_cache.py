@@ -0,0 +1,137 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request
+
+
+class _Entry:
+    __slots__ = ('version', 'counts', 'built_at', 'body', 'etag', 'mimetype')
+
+    def __init__(self, version, counts, built_at, body, etag, mimetype):
+        self.version = version
+        self.counts = counts
+        self.built_at = built_at
+        self.body = body
+        self.etag = etag
+        self.mimetype = mimetype
+
+
+class CatalogCache:
+    """In-process cache of serialized GET responses, keyed by URL.
+
+    Entries are tagged with a version number kept in a `cache_version`
+    row. Writers bump that row in the same transaction as their change;
+    every worker re-reads it at most once per `CATALOG_VERSION_TTL`
+    seconds and drops entries built against an older version. Between
+    checks, cached responses and 304s are served without touching the
+    database.
+
+    Enrollment counts shown in the catalog move far more often than the
+    catalog itself, so they have a row of their own (`<name>_counts`,
+    see `bump_counts`). An entry built before the counts moved is
+    rebuilt once it is `CATALOG_COUNTS_MAX_AGE` seconds old, so counts lag
+    by at most that long and a busy enrollment period rebuilds each
+    response at most that often.
+    """
+
+    def __init__(self, app=None, db=None, model=None, name='catalog'):
+        self.name = name
+        self.counts_name = f'{name}_counts'
+        self.app = None
+        self.db = None
+        self.model = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._counts = 0
+        self._checked_at = 0.0
+        if app is not None:
+            self.init_app(app, db, model)
+
+    def init_app(self, app, db, model):
+        self.app = app
+        self.db = db
+        self.model = model
+        app.config.setdefault('CATALOG_CACHE_ENABLED', os.environ.get('CATALOG_CACHE_ENABLED', '1') not in ('0', 'false', 'False'))
+        app.config.setdefault('CATALOG_VERSION_TTL', float(os.environ.get('CATALOG_VERSION_TTL', 1.0)))
+        app.config.setdefault('CATALOG_CACHE_SIZE', int(os.environ.get('CATALOG_CACHE_SIZE', 256)))
+        app.config.setdefault('CATALOG_CACHE_CONTROL', os.environ.get('CATALOG_CACHE_CONTROL', 'public, max-age=0, must-revalidate'))
+        app.config.setdefault('CATALOG_COUNTS_MAX_AGE', float(os.environ.get('CATALOG_COUNTS_MAX_AGE', 30)))
+
+    def _check(self):
+        now = time.monotonic()
+        if self._version is None or now - self._checked_at >= self.app.config['CATALOG_VERSION_TTL']:
+            rows = dict(self.db.session.query(self.model.name, self.model.version).filter(
+                self.model.name.in_((self.name, self.counts_name))))
+            self._version = rows.get(self.name, 0)
+            self._counts = rows.get(self.counts_name, 0)
+            self._checked_at = now
+
+    def current_version(self):
+        self._check()
+        return self._version
+
+    def versions(self):
+        """(catalog version, counts version), for callers that care about both."""
+        self._check()
+        return self._version, self._counts
+
+    def _bump(self, name):
+        updated = self.model.query.filter_by(name=name).update(
+            {'version': self.model.version + 1}, synchronize_session=False)
+        if not updated:
+            self.db.session.add(self.model(name=name, version=1))
+        # Force this worker to pick the new version up on its next read.
+        self._version = None
+
+    def bump(self):
+        """Invalidate every worker's cache; call before the writer commits."""
+        self._bump(self.name)
+
+    def bump_counts(self):
+        """Mark enrollment counts as changed; call before the writer commits."""
+        self._bump(self.counts_name)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self._version = None
+
+    def cached(self, view):
+        """Serve `view` from the cache, with a strong ETag and 304 support."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not self.app.config['CATALOG_CACHE_ENABLED']:
+                return view(*args, **kwargs)
+
+            key = request.full_path
+            version, counts = self.versions()
+            now = time.monotonic()
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version or (
+                    entry.counts != counts and now - entry.built_at >= self.app.config['CATALOG_COUNTS_MAX_AGE']):
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                body = response.get_data()
+                etag = f'{version}-{hashlib.sha1(body).hexdigest()[:16]}'
+                entry = _Entry(version, counts, now, body, etag, response.mimetype)
+                with self._lock:
+                    self._entries[key] = entry
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.app.config['CATALOG_CACHE_SIZE']:
+                        self._entries.popitem(last=False)
+
+            # Weak comparison: compression.py sends W/ ETags for gzip/br copies.
+            if request.if_none_match.contains_weak(entry.etag):
+                response = Response(status=304)
+            else:
+                response = Response(entry.body, mimetype=entry.mimetype)
+            response.set_etag(entry.etag)
+            response.headers['Cache-Control'] = self.app.config['CATALOG_CACHE_CONTROL']
+            return response
+        return wrapper
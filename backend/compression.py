@@ -0,0 +1,94 @@
+import gzip
+import os
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional; clients get gzip instead
+    brotli = None
+
+COMPRESSIBLE = frozenset(('application/json', 'application/x-ndjson', 'text/csv', 'text/html', 'text/plain'))
+
+
+class ResponseCompressor:
+    """gzip or brotli response bodies, negotiated through Accept-Encoding.
+
+    Bodies under `COMPRESS_MIN_SIZE` bytes are sent as they are, since
+    the headers and the CPU would cost more than they save. brotli is
+    preferred when the `brotli` package is installed and the client
+    takes it. Streamed responses (exports) are left alone.
+
+    A compressed body gets a weak ETag (W/"..."), as it is a different
+    byte sequence from the uncompressed one. Bodies with an ETag are
+    compressed once per encoding and kept in a small LRU, so cached
+    catalog responses are not recompressed on every hit.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._encoded = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        cfg = app.config
+        cfg.setdefault('COMPRESS_ENABLED', os.environ.get('COMPRESS_ENABLED', '1') not in ('0', 'false', 'False'))
+        cfg.setdefault('COMPRESS_MIN_SIZE', int(os.environ.get('COMPRESS_MIN_SIZE', 1024)))
+        cfg.setdefault('COMPRESS_GZIP_LEVEL', int(os.environ.get('COMPRESS_GZIP_LEVEL', 6)))
+        cfg.setdefault('COMPRESS_BROTLI_QUALITY', int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5)))
+        cfg.setdefault('COMPRESS_CACHE_SIZE', int(os.environ.get('COMPRESS_CACHE_SIZE', 256)))
+        if cfg['COMPRESS_ENABLED']:
+            app.after_request(self._after_request)
+
+    def encodings(self):
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def compress(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.app.config['COMPRESS_BROTLI_QUALITY'])
+        return gzip.compress(body, self.app.config['COMPRESS_GZIP_LEVEL'], mtime=0)
+
+    def _after_request(self, response):
+        response.vary.add('Accept-Encoding')
+        if response.status_code == 304:
+            # Revalidating a compressed copy: answer with the ETag it was sent with.
+            etag, weak = response.get_etag()
+            if etag and not weak and not request.if_none_match.contains(etag):
+                response.set_etag(etag, weak=True)
+            return response
+        if (response.status_code < 200 or response.status_code in (204, 206)
+                or response.is_streamed or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE
+                or 'no-transform' in response.headers.get('Cache-Control', '')):
+            return response
+        encoding = request.accept_encodings.best_match(self.encodings())
+        if encoding is None:
+            return response
+        body = response.get_data()
+        if len(body) < self.app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        etag, weak = response.get_etag()
+        if etag:
+            key = (etag, encoding)
+            encoded = self._encoded.get(key)
+            if encoded is None:
+                encoded = self.compress(body, encoding)
+                with self._lock:
+                    self._encoded[key] = encoded
+                    self._encoded.move_to_end(key)
+                    while len(self._encoded) > self.app.config['COMPRESS_CACHE_SIZE']:
+                        self._encoded.popitem(last=False)
+            response.set_etag(etag, weak=True)
+        else:
+            encoded = self.compress(body, encoding)
+
+        response.set_data(encoded)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,248 @@
+import collections
+import json
+import logging
+import os
+import threading
+import time
+
+from flask import Response, request
+from sqlalchemy import event
+
+from sqlite_profile import write_intent
+
+log = logging.getLogger(__name__)
+
+
+class _Event:
+    __slots__ = ('id', 'kind', 'data')
+
+    def __init__(self, id, kind, data):
+        self.id = id
+        self.kind = kind
+        self.data = data
+
+    def encode(self):
+        return f'id: {self.id}\nevent: {self.kind}\ndata: {self.data}\n\n'
+
+
+class ChangeFeed:
+    """Change events for live dashboards, served as Server-Sent Events.
+
+    Mutating routes call `publish()`, which adds a row to the change-event
+    table in the caller's transaction, so an event exists exactly when its
+    change committed. Every process tails that table by id with one query
+    per `EVENTS_POLL_INTERVAL` (sooner after a local commit) and keeps the
+    last `EVENTS_BUFFER` events in memory; however many clients are
+    connected, they are served from that buffer and never touch the
+    database. That is what fans events out across gunicorn workers.
+
+    Ids are handed out in commit order on SQLite. On PostgreSQL a later id
+    can commit first, so the tailer waits up to `EVENTS_GAP_TIMEOUT`
+    seconds for a missing id before skipping it (a rolled-back insert
+    leaves a permanent gap).
+    """
+
+    def __init__(self, app=None, db=None, model=None):
+        self.app = None
+        self.db = None
+        self.model = None
+        self._buffer = collections.deque()
+        self._last_id = None
+        self._gap_since = None
+        self._pruned_at = 0.0
+        self._changed = threading.Condition()
+        self._wakeup = threading.Event()
+        self._poll_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._streams = 0
+        if app is not None:
+            self.init_app(app, db, model)
+
+    def init_app(self, app, db, model):
+        self.app = app
+        self.db = db
+        self.model = model
+        cfg = app.config
+        cfg.setdefault('EVENTS_ENABLED', os.environ.get('EVENTS_ENABLED', '1') not in ('0', 'false', 'False'))
+        cfg.setdefault('EVENTS_POLL_INTERVAL', float(os.environ.get('EVENTS_POLL_INTERVAL', 0.5)))
+        cfg.setdefault('EVENTS_BUFFER', int(os.environ.get('EVENTS_BUFFER', 1000)))
+        cfg.setdefault('EVENTS_GAP_TIMEOUT', float(os.environ.get('EVENTS_GAP_TIMEOUT', 5)))
+        cfg.setdefault('EVENTS_RETENTION', float(os.environ.get('EVENTS_RETENTION', 86400)))
+        cfg.setdefault('EVENTS_HEARTBEAT', float(os.environ.get('EVENTS_HEARTBEAT', 15)))
+        # An open stream holds a server thread, so streams are capped per
+        # process and end after a while; EventSource reconnects by itself
+        # and resumes from Last-Event-ID. gunicorn.conf.py adds this many
+        # threads per worker on top of GUNICORN_THREADS.
+        cfg.setdefault('EVENTS_MAX_STREAMS', int(os.environ.get('EVENTS_MAX_STREAMS', 8)))
+        cfg.setdefault('EVENTS_STREAM_SECONDS', float(os.environ.get('EVENTS_STREAM_SECONDS', 300)))
+        cfg.setdefault('EVENTS_RETRY_MS', int(os.environ.get('EVENTS_RETRY_MS', 3000)))
+        if cfg['EVENTS_ENABLED']:
+            app.add_url_rule('/api/events', 'events', self.events_view)
+
+        # Poll right after a local commit that published, so this worker's
+        # clients see their own changes without waiting for the interval.
+        @event.listens_for(db.session, 'after_commit')
+        def after_commit(session):
+            if session.info.pop('change_feed_published', False):
+                self._wakeup.set()
+
+        @event.listens_for(db.session, 'after_rollback')
+        def after_rollback(session):
+            session.info.pop('change_feed_published', None)
+
+    # Producer side
+
+    def publish(self, kind, data):
+        """Add an event to the current session; it is sent once the caller commits."""
+        if not self.app.config['EVENTS_ENABLED']:
+            return
+        self.db.session.add(self.model(kind=kind, data=json.dumps(data, separators=(',', ':')),
+                                       created_at=time.time()))
+        self.db.session.info['change_feed_published'] = True
+
+    # Tailing
+
+    def start(self):
+        # Threads do not survive fork(); each gunicorn worker tails on its own.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self.run_forever, name='change-feed', daemon=True)
+            self._thread.start()
+
+    def run_forever(self):
+        while True:
+            self._wakeup.wait(self.app.config['EVENTS_POLL_INTERVAL'])
+            self._wakeup.clear()
+            if not self._streams:
+                continue
+            try:
+                self.poll()
+                self._prune()
+            except Exception:
+                log.exception("Change feed poll failed")
+
+    def poll(self):
+        """Read events committed since the last poll into the buffer."""
+        cfg = self.app.config
+        Event = self.model
+        with self._poll_lock, self.app.app_context():
+            query = self.db.session.query(Event.id, Event.kind, Event.data)
+            preload = self._last_id is None
+            if preload:
+                # First poll in this process: load the most recent events so
+                # reconnecting clients can resume from them.
+                rows = query.order_by(Event.id.desc()).limit(cfg['EVENTS_BUFFER']).all()[::-1]
+                self._last_id = rows[0].id - 1 if rows else 0
+            else:
+                rows = query.filter(Event.id > self._last_id).order_by(Event.id).limit(cfg['EVENTS_BUFFER']).all()
+            self.db.session.rollback()
+
+            fresh = []
+            for row in rows:
+                if row.id != self._last_id + 1 and not preload:
+                    if self._gap_since is None:
+                        self._gap_since = time.monotonic()
+                    if time.monotonic() - self._gap_since < cfg['EVENTS_GAP_TIMEOUT']:
+                        break
+                self._gap_since = None
+                fresh.append(_Event(row.id, row.kind, row.data))
+                self._last_id = row.id
+            if not fresh:
+                return
+            with self._changed:
+                self._buffer.extend(fresh)
+                while len(self._buffer) > cfg['EVENTS_BUFFER']:
+                    self._buffer.popleft()
+                self._changed.notify_all()
+
+    def _prune(self):
+        now = time.time()
+        if now - self._pruned_at < 60 or self.app.config.get('DATABASE_READ_ONLY'):
+            return
+        self._pruned_at = now
+        with self.app.app_context(), write_intent():
+            self.model.query.filter(
+                self.model.created_at < now - self.app.config['EVENTS_RETENTION']).delete(synchronize_session=False)
+            self.db.session.commit()
+
+    def head(self):
+        return self._last_id or 0
+
+    def events_after(self, last_id):
+        """Buffered events after `last_id`, or None if some were already dropped."""
+        with self._changed:
+            if last_id > self.head():
+                return None  # an id from another database, e.g. after a restore
+            if not self._buffer:
+                return [] if last_id == self.head() else None
+            if last_id < self._buffer[0].id - 1:
+                return None
+            return [e for e in self._buffer if e.id > last_id]
+
+    # Serving
+
+    def stream(self, last_id):
+        cfg = self.app.config
+        deadline = time.monotonic() + cfg['EVENTS_STREAM_SECONDS']
+        yield f"retry: {cfg['EVENTS_RETRY_MS']}\n\n"
+        if last_id is None:
+            last_id = self.head()
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            events = self.events_after(last_id)
+            if events is None:
+                # Too far behind: the client should refetch its lists.
+                last_id = self.head()
+                yield f'id: {last_id}\nevent: reset\ndata: {{}}\n\n'
+                continue
+            if events:
+                last_id = events[-1].id
+                yield ''.join(e.encode() for e in events)
+                continue
+            with self._changed:
+                notified = self._changed.wait_for(lambda: self.head() > last_id,
+                                                  min(cfg['EVENTS_HEARTBEAT'], remaining))
+            if not notified:
+                yield ': keepalive\n\n'
+
+    def _release(self):
+        with self._lock:
+            self._streams -= 1
+
+    def events_view(self):
+        """GET /api/events: the change feed as text/event-stream."""
+        last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        try:
+            last_id = int(last_id) if last_id else None
+        except ValueError:
+            last_id = None
+        headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+        with self._lock:
+            busy = self._streams >= self.app.config['EVENTS_MAX_STREAMS']
+            if not busy:
+                self._streams += 1
+        if busy:
+            # EventSource gives up on an error status; an empty stream just
+            # makes it reconnect after `retry`.
+            return Response(f"retry: {self.app.config['EVENTS_RETRY_MS']}\n\n",
+                            mimetype='text/event-stream', headers=headers)
+        try:
+            self.start()
+            self.poll()
+        except Exception:
+            self._release()
+            raise
+        response = Response(self.stream(last_id), mimetype='text/event-stream', headers=headers)
+        # Runs when the server is done with the response, also if the client
+        # left before the first byte.
+        response.call_on_close(self._release)
+        return response
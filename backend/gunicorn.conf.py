@@ -0,0 +1,86 @@
+"""Gunicorn settings, picked up automatically by `gunicorn app:app` run
+from this directory. Every value can be overridden with an environment
+variable (listed next to it) or on the command line.
+
+Workers are gthread by default: each process serves GUNICORN_THREADS
+requests at once, so a request waiting on the database write lock, a
+slow client or a password hash no longer holds a whole process, and idle
+keep-alive connections wait in the worker's poller instead of a thread.
+Flask-SQLAlchemy scopes sessions to the app context, i.e. per request
+thread, and the shared pieces of app.py (caches, rate limiters, the mail
+queue, the SQLite writer lock) are guarded by locks.
+
+The app is imported once in the master (preload), which runs the
+migrations and seeds before any worker starts; workers fork with the
+database pool emptied.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+# Same default as gunicorn's: all interfaces on $PORT (Render), else local.
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ['PORT']}" if 'PORT' in os.environ else '127.0.0.1:8000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+# Processes are for CPU parallelism and threads for waiting, so one per
+# core is enough; capped because containers often report the host's cores.
+workers = int(os.environ.get('WEB_CONCURRENCY', os.environ.get('GUNICORN_WORKERS', min(max(multiprocessing.cpu_count(), 2), 8))))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+# An open /api/events stream holds a thread for minutes, so streams get
+# threads of their own on top of the ones above, which stay free for
+# ordinary requests. The cap is read by events.py (imported below).
+event_streams = int(os.environ.setdefault('EVENTS_MAX_STREAMS', '8'))
+# Longer than the usual 60s proxy idle timeout, so the proxy closes first
+# and never sends a request down a connection gunicorn is closing.
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 65))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+# Recycle workers now and then so slow leaks cannot accumulate; the jitter
+# keeps them from all restarting at once.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+preload_app = True
+# Worker heartbeats go to tmpfs where available, so a slow disk cannot
+# make a busy worker look dead.
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# Every request thread may hold a database connection; size the pool to
+# match unless it was set explicitly (read when app.py is imported, below).
+# Event streams are served from memory and need none.
+os.environ.setdefault('DB_POOL_SIZE', str(threads))
+threads += event_streams
+
+# One metrics directory per master, shared by its workers (see metrics.py);
+# removed again when this master exits.
+_metrics_dir = None
+if 'METRICS_DIR' not in os.environ:
+    _metrics_dir = os.path.join(tempfile.gettempdir(), f'portal-metrics-{os.getpid()}')
+    os.environ['METRICS_DIR'] = _metrics_dir
+
+
+def on_starting(server):
+    from app import app, db, init_db, recommender
+    init_db()
+    with app.app_context():
+        # Built once here and inherited by every worker, rather than each
+        # worker importing NumPy/SciPy and building it on a first request.
+        try:
+            recommender.index()
+        except Exception:
+            server.log.exception("Could not build the recommendation index; workers will build their own")
+        # Workers must not share the master's connections.
+        db.engine.dispose()
+
+
+def post_fork(server, worker):
+    # Each worker's mail sender and purge thread start now, not on its first
+    # request, so a recycled worker resumes queued work straight away.
+    from app import mail_queue, purger
+    mail_queue.autostart()
+    purger.autostart()
+
+
+def on_exit(server):
+    if _metrics_dir:
+        shutil.rmtree(_metrics_dir, ignore_errors=True)
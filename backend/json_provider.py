@@ -0,0 +1,62 @@
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, encoding with orjson when it is installed.
+
+    orjson builds the response body as UTF-8 bytes in one call, several
+    times faster than `json.dumps` on the list endpoints. Output follows
+    `sort_keys`, `compact` and `default` like the stdlib provider's:
+    dates still go through `default` as HTTP dates. Anything orjson
+    refuses (non-string keys, integers beyond 64 bits) falls back to the
+    stdlib encoder. Set `JSON_PROVIDER=stdlib`, or leave orjson
+    uninstalled, to use the stdlib encoder throughout.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        app.config.setdefault('JSON_PROVIDER', os.environ.get('JSON_PROVIDER', 'orjson'))
+        self.use_orjson = orjson is not None and app.config['JSON_PROVIDER'] != 'stdlib'
+
+    def _orjson_options(self, indent=False):
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options | orjson.OPT_APPEND_NEWLINE
+
+    def _encode(self, obj, indent=False):
+        """`obj` as UTF-8 JSON bytes ending in a newline."""
+        if self.use_orjson:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._orjson_options(indent))
+            except TypeError:  # orjson.JSONEncodeError
+                pass
+        if indent:
+            text = super().dumps(obj, indent=2)
+        else:
+            text = super().dumps(obj, separators=(',', ':'))
+        return (text + '\n').encode()
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson and not kwargs:
+            return self._encode(obj)[:-1].decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._encode(obj, indent), mimetype=self.mimetype)
@@ -0,0 +1,305 @@
+import logging
+import os
+import threading
+import time
+import uuid
+
+from sqlalchemy import and_, or_, update
+
+from sqlite_profile import write_intent
+
+log = logging.getLogger(__name__)
+
+
+class MailQueue:
+    """Persistent outbound-mail queue drained by a background worker.
+
+    Rows are written to the outbox table in the same transaction as the
+    record that triggered them, so the HTTP request only pays for the
+    commit. A worker thread (one per process) claims pending rows in
+    batches, sends them over a single pooled SMTP connection and retries
+    failures with exponential backoff.
+
+    Nothing is sent until MAIL_USERNAME and MAIL_PASSWORD are set (or
+    MAIL_REQUIRE_AUTH=0 for a relay without AUTH); until then messages
+    stay queued and the worker logs why.
+    """
+
+    def __init__(self, app=None, db=None, model=None):
+        self.app = None
+        self.db = None
+        self.model = None
+        self._smtp = None
+        self._smtp_last_used = 0.0
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._warned = False
+        if app is not None:
+            self.init_app(app, db, model)
+
+    def init_app(self, app, db, model):
+        self.app = app
+        self.db = db
+        self.model = model
+        app.config.setdefault('MAIL_SERVER', os.environ.get('MAIL_SERVER', 'smtp.gmail.com'))
+        app.config.setdefault('MAIL_PORT', int(os.environ.get('MAIL_PORT', 587)))
+        app.config.setdefault('MAIL_USE_TLS', os.environ.get('MAIL_USE_TLS', '1') not in ('0', 'false', 'False'))
+        # Credentials only ever come from the environment
+        app.config.setdefault('MAIL_USERNAME', os.environ.get('MAIL_USERNAME', ''))
+        app.config.setdefault('MAIL_PASSWORD', os.environ.get('MAIL_PASSWORD', ''))
+        app.config.setdefault('MAIL_REQUIRE_AUTH', os.environ.get('MAIL_REQUIRE_AUTH', '1') not in ('0', 'false', 'False'))
+        app.config.setdefault('MAIL_SENDER', os.environ.get('MAIL_SENDER', app.config['MAIL_USERNAME']))
+        app.config.setdefault('MAIL_RECIPIENT', os.environ.get('MAIL_RECIPIENT', app.config['MAIL_SENDER']))
+        app.config.setdefault('MAIL_TIMEOUT', float(os.environ.get('MAIL_TIMEOUT', 30)))
+        app.config.setdefault('MAIL_BATCH_SIZE', int(os.environ.get('MAIL_BATCH_SIZE', 20)))
+        app.config.setdefault('MAIL_MAX_ATTEMPTS', int(os.environ.get('MAIL_MAX_ATTEMPTS', 6)))
+        app.config.setdefault('MAIL_RETRY_BASE', float(os.environ.get('MAIL_RETRY_BASE', 30)))
+        app.config.setdefault('MAIL_RETRY_MAX', float(os.environ.get('MAIL_RETRY_MAX', 3600)))
+        app.config.setdefault('MAIL_POLL_INTERVAL', float(os.environ.get('MAIL_POLL_INTERVAL', 15)))
+        app.config.setdefault('MAIL_LEASE_SECONDS', float(os.environ.get('MAIL_LEASE_SECONDS', 300)))
+        app.config.setdefault('MAIL_IDLE_TIMEOUT', float(os.environ.get('MAIL_IDLE_TIMEOUT', 60)))
+        # "thread" runs a sender inside every web process, "external" leaves
+        # delivery to a separate `python mail_queue.py` process.
+        app.config.setdefault('MAIL_WORKER', os.environ.get('MAIL_WORKER', 'thread'))
+        app.before_request(self.autostart)
+
+    def configured(self):
+        """Whether there is enough configuration to send mail."""
+        cfg = self.app.config
+        if not (cfg['MAIL_SERVER'] and cfg['MAIL_SENDER'] and cfg['MAIL_RECIPIENT']):
+            return False
+        return bool(cfg['MAIL_USERNAME'] and cfg['MAIL_PASSWORD']) or not cfg['MAIL_REQUIRE_AUTH']
+
+    # Producer side
+
+    def enqueue(self, subject, body, recipient=None, contact_message_id=None):
+        """Add a message to the current session; the caller commits it."""
+        cfg = self.app.config
+        outbound = self.model(
+            contact_message_id=contact_message_id,
+            sender=cfg['MAIL_SENDER'],
+            recipient=recipient or cfg['MAIL_RECIPIENT'],
+            subject=subject,
+            body=body,
+            status='pending',
+            attempts=0,
+            next_attempt_at=0.0,
+            created_at=time.time(),
+        )
+        self.db.session.add(outbound)
+        return outbound
+
+    def wake(self):
+        """Nudge the worker after a commit so new mail goes out immediately."""
+        if self.app.config['MAIL_WORKER'] == 'thread':
+            self.start()
+        self._wakeup.set()
+
+    # Worker side
+
+    def autostart(self):
+        """Start this process's sender if MAIL_WORKER=thread. Runs before
+        every request (and from gunicorn's post_fork), so mail an earlier
+        process left queued goes out without waiting for a new message."""
+        if self._pid != os.getpid() and self.app.config['MAIL_WORKER'] == 'thread' \
+                and not self.app.config.get('DATABASE_READ_ONLY'):
+            self.start()
+
+    def start(self):
+        # Threads do not survive fork(), so a gunicorn worker that inherited
+        # a started queue from the master needs its own sender thread.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        if not self.configured():
+            if not self._warned:
+                self._warned = True
+                log.warning("Outbound email is not configured (set MAIL_USERNAME and MAIL_PASSWORD); "
+                            "messages stay queued")
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._smtp = None
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self.run_forever, name='mail-queue', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._close_connection()
+
+    def run_forever(self):
+        poll = self.app.config['MAIL_POLL_INTERVAL']
+        try:
+            self.reclaim_stale()
+        except Exception:
+            log.exception("Could not reclaim stale outbound email")
+        while not self._stopping.is_set():
+            self._wakeup.clear()
+            try:
+                sent = self.process_batch()
+            except Exception:
+                log.exception("Mail queue batch failed")
+                sent = 0
+            if sent:
+                # A full batch probably means more is waiting.
+                continue
+            self._close_idle_connection()
+            self._wakeup.wait(poll)
+
+    def process_batch(self):
+        """Claim and deliver one batch. Returns the number of rows claimed."""
+        with self.app.app_context():
+            with write_intent():
+                rows = self._claim_batch()
+            if not rows:
+                return 0
+            # No transaction is open while talking to the SMTP server.
+            results = [self._deliver(row) for row in rows]
+            with write_intent():
+                self.db.session.execute(update(self.model), results)
+                self.db.session.commit()
+            return len(rows)
+
+    def reclaim_stale(self):
+        """Put rows whose sender died mid-batch (claimed more than
+        MAIL_LEASE_SECONDS ago and still "sending") back in the queue.
+        Returns how many."""
+        Outbound = self.model
+        with self.app.app_context():
+            with write_intent():
+                reclaimed = Outbound.query.filter(
+                    Outbound.status == 'sending',
+                    Outbound.claimed_at < time.time() - self.app.config['MAIL_LEASE_SECONDS'],
+                ).update({'status': 'pending', 'claim_token': None, 'claimed_at': None}, synchronize_session=False)
+                self.db.session.commit()
+        if reclaimed:
+            log.info("Requeued %s outbound emails left in sending", reclaimed)
+        return reclaimed
+
+    def pending_count(self):
+        with self.app.app_context():
+            return self.model.query.filter(self.model.status.in_(('pending', 'sending'))).count()
+
+    def _claim_batch(self):
+        Outbound = self.model
+        cfg = self.app.config
+        now = time.time()
+        ready = or_(
+            and_(Outbound.status == 'pending', Outbound.next_attempt_at <= now),
+            # Rows left in "sending" by a worker that died mid-batch.
+            and_(Outbound.status == 'sending', Outbound.claimed_at < now - cfg['MAIL_LEASE_SECONDS']),
+        )
+        ids = [row_id for (row_id,) in (
+            self.db.session.query(Outbound.id).filter(ready)
+            .order_by(Outbound.id).limit(cfg['MAIL_BATCH_SIZE'])
+        )]
+        if not ids:
+            self.db.session.rollback()
+            return []
+
+        token = uuid.uuid4().hex
+        Outbound.query.filter(Outbound.id.in_(ids), ready).update(
+            {'status': 'sending', 'claim_token': token, 'claimed_at': now},
+            synchronize_session=False,
+        )
+        rows = Outbound.query.filter_by(claim_token=token, status='sending').order_by(Outbound.id).all()
+        # Keep the loaded rows usable after the commit without a reload.
+        self.db.session.expunge_all()
+        self.db.session.commit()
+        return rows
+
+    def _deliver(self, row):
+        """Send one claimed row; returns the column updates to persist."""
+        cfg = self.app.config
+        try:
+            self._send(row)
+        except Exception as e:
+            attempts = row.attempts + 1
+            result = {'id': row.id, 'attempts': attempts, 'last_error': str(e)[:500], 'claim_token': None}
+            if attempts >= cfg['MAIL_MAX_ATTEMPTS']:
+                result['status'] = 'failed'
+                log.error("Giving up on outbound email %s after %s attempts: %s", row.id, attempts, e)
+            else:
+                delay = min(cfg['MAIL_RETRY_BASE'] * (2 ** (attempts - 1)), cfg['MAIL_RETRY_MAX'])
+                result['status'] = 'pending'
+                result['next_attempt_at'] = time.time() + delay
+                log.warning("Failed to send email %s (attempt %s), retrying in %ss: %s", row.id, attempts, delay, e)
+            # Whatever went wrong, do not trust the connection for the next message.
+            self._close_connection()
+            return result
+        return {'id': row.id, 'status': 'sent', 'sent_at': time.time(), 'claim_token': None, 'last_error': None}
+
+    def _send(self, row):
+        # Imported here, not at module level: smtplib and email cost every
+        # process a few ms at startup and only the sender needs them.
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+
+        # Rows queued while mail was unconfigured have no addresses yet
+        sender = row.sender or self.app.config['MAIL_SENDER']
+        recipient = row.recipient or self.app.config['MAIL_RECIPIENT']
+        msg = MIMEMultipart()
+        msg['From'] = sender
+        msg['To'] = recipient
+        msg['Subject'] = row.subject
+        msg.attach(MIMEText(row.body, 'plain'))
+        self._connection().sendmail(sender, [recipient], msg.as_string())
+        self._smtp_last_used = time.time()
+
+    # Pooled SMTP connection
+
+    def _connection(self):
+        import smtplib
+
+        cfg = self.app.config
+        if self._smtp is not None and time.time() - self._smtp_last_used > 10:
+            # The server may have dropped a connection that sat idle.
+            try:
+                if self._smtp.noop()[0] != 250:
+                    self._close_connection()
+            except (smtplib.SMTPException, OSError):
+                self._close_connection()
+        if self._smtp is None:
+            server = smtplib.SMTP(cfg['MAIL_SERVER'], cfg['MAIL_PORT'], timeout=cfg['MAIL_TIMEOUT'])
+            try:
+                if cfg['MAIL_USE_TLS']:
+                    server.starttls()
+                if cfg['MAIL_USERNAME'] and cfg['MAIL_PASSWORD']:
+                    server.login(cfg['MAIL_USERNAME'], cfg['MAIL_PASSWORD'])
+            except Exception:
+                server.close()
+                raise
+            self._smtp = server
+            self._smtp_last_used = time.time()
+        return self._smtp
+
+    def _close_idle_connection(self):
+        if self._smtp is not None and time.time() - self._smtp_last_used > self.app.config['MAIL_IDLE_TIMEOUT']:
+            self._close_connection()
+
+    def _close_connection(self):
+        server, self._smtp = self._smtp, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+
+if __name__ == "__main__":
+    # Dedicated sender process: `MAIL_WORKER=external gunicorn ...` for the
+    # web tier plus one `python mail_queue.py` next to it.
+    logging.basicConfig(level=logging.INFO)
+    from app import mail_queue
+    if not mail_queue.configured():
+        raise SystemExit("Set MAIL_USERNAME and MAIL_PASSWORD (or MAIL_REQUIRE_AUTH=0) to send mail")
+    mail_queue.run_forever()
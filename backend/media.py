@@ -0,0 +1,294 @@
+import concurrent.futures
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import jsonify, redirect, send_from_directory
+from sqlalchemy import event
+
+from sqlite_profile import write_intent
+from thumbnails import Image, lower_priority, make_thumbnails, write_atomic
+
+log = logging.getLogger(__name__)
+
+CONTENT_TYPES = {'jpg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif', 'webp': 'image/webp'}
+EXTENSIONS = {content_type: ext for ext, content_type in CONTENT_TYPES.items()}
+
+FILE_PREFIX = '/api/media/files/'
+# <sha256>.<ext> for an original, <sha256>-<width>.webp for a thumbnail
+FILE_NAME = re.compile(r'^([0-9a-f]{64})(?:-([1-9][0-9]{0,4}))?\.(jpg|png|gif|webp)$')
+
+YOUTUBE_HOSTS = frozenset(('youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com',
+                           'youtube-nocookie.com', 'www.youtube-nocookie.com'))
+YOUTUBE_ID = re.compile(r'^[A-Za-z0-9_-]{11}$')
+YOUTUBE_EMBED_URL = 'https://www.youtube-nocookie.com/embed/{}'
+YOUTUBE_THUMBNAIL_URL = 'https://i.ytimg.com/vi/{}/hqdefault.jpg'
+
+
+class MediaError(ValueError):
+    """An image or media URL that cannot be stored."""
+
+
+def sniff(data):
+    """The extension for JPEG, PNG, GIF or WebP bytes, going by their magic
+    number rather than a client-supplied content type; None otherwise."""
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def web_url(url):
+    parts = urllib.parse.urlsplit(url)
+    return parts.scheme in ('http', 'https') and bool(parts.netloc)
+
+
+def youtube_id(url):
+    """The video id in a youtube.com or youtu.be URL, or None."""
+    parts = urllib.parse.urlsplit(url)
+    host = (parts.hostname or '').lower()
+    segments = [s for s in parts.path.split('/') if s]
+    candidate = None
+    if host == 'youtu.be' and segments:
+        candidate = segments[0]
+    elif host in YOUTUBE_HOSTS:
+        if segments == ['watch']:
+            candidate = (urllib.parse.parse_qs(parts.query).get('v') or [None])[0]
+        elif len(segments) >= 2 and segments[0] in ('embed', 'shorts', 'live', 'v'):
+            candidate = segments[1]
+    return candidate if candidate and YOUTUBE_ID.match(candidate) else None
+
+
+def fetch(url, max_bytes, timeout):
+    """Download an image for import, refusing anything over `max_bytes`."""
+    if not web_url(url):
+        raise MediaError(f"Not an http(s) URL: {url}")
+    req = urllib.request.Request(url, headers={'User-Agent': 'industry-portal-media-import'})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        data = resp.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise MediaError(f"{url} is larger than {max_bytes} bytes")
+    return data
+
+
+class MediaStore:
+    """Course images kept on local disk, with thumbnails made ahead of time.
+
+    Files are named by the SHA-256 of their content, so a URL always
+    points at the same bytes and is served with a year-long `immutable`
+    Cache-Control; the same image stored twice is one file. After a new
+    image commits, a process pool (`MEDIA_WORKERS`) writes a WebP
+    thumbnail for each of `MEDIA_THUMBNAIL_WIDTHS`, off the request
+    thread, outside the GIL and at a lower CPU priority. Thumbnail URLs are known before they
+    exist; until then they redirect to the original.
+
+    Thumbnails need Pillow. Without it images are still stored and
+    served, just without thumbnails.
+    """
+
+    def __init__(self, app=None, db=None, model=None):
+        self.app = None
+        self.db = None
+        self.model = None
+        self._executor = None
+        self._pid = None
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        if app is not None:
+            self.init_app(app, db, model)
+
+    def init_app(self, app, db, model):
+        self.app = app
+        self.db = db
+        self.model = model
+        cfg = app.config
+        cfg.setdefault('MEDIA_DIR', os.environ.get('MEDIA_DIR', os.path.join(app.instance_path, 'media')))
+        cfg.setdefault('MEDIA_MAX_BYTES', int(os.environ.get('MEDIA_MAX_BYTES', 5 * 1024 * 1024)))
+        cfg.setdefault('MEDIA_THUMBNAIL_WIDTHS', tuple(
+            int(w) for w in os.environ.get('MEDIA_THUMBNAIL_WIDTHS', '320,640').split(',') if w.strip()))
+        cfg.setdefault('MEDIA_THUMBNAIL_QUALITY', int(os.environ.get('MEDIA_THUMBNAIL_QUALITY', 80)))
+        cfg.setdefault('MEDIA_WORKERS', int(os.environ.get('MEDIA_WORKERS', 2)))
+        cfg.setdefault('MEDIA_FETCH_TIMEOUT', float(os.environ.get('MEDIA_FETCH_TIMEOUT', 10)))
+        cfg.setdefault('MEDIA_MAX_AGE', int(os.environ.get('MEDIA_MAX_AGE', 365 * 86400)))
+        app.add_url_rule(FILE_PREFIX + '<name>', 'media_file', self.file_view)
+
+        # Thumbnails are started once the row is committed, so the pool's
+        # result always has a row to land on.
+        @event.listens_for(db.session, 'after_commit')
+        def after_commit(session):
+            for digest, name in session.info.pop('media_pending', ()):
+                try:
+                    self.submit(digest, name)
+                except Exception:  # the row stays pending; `flask import-media` retries it
+                    log.exception("Could not start thumbnails for %s", digest)
+
+        @event.listens_for(db.session, 'after_rollback')
+        def after_rollback(session):
+            session.info.pop('media_pending', None)
+
+    # URLs
+
+    def url(self, name):
+        return FILE_PREFIX + name
+
+    def file_name(self, asset):
+        return f'{asset.hash}.{EXTENSIONS[asset.content_type]}'
+
+    def thumbnails(self, digest):
+        """{width: URL} for an image's thumbnails, or None without Pillow."""
+        if Image is None:
+            return None
+        return {str(w): self.url(f'{digest}-{w}.webp') for w in self.app.config['MEDIA_THUMBNAIL_WIDTHS']}
+
+    def parse_url(self, url):
+        """The hash in the URL of a stored original, or None for any other URL."""
+        if not url.startswith(FILE_PREFIX):
+            return None
+        match = FILE_NAME.match(url[len(FILE_PREFIX):])
+        return match.group(1) if match and match.group(2) is None else None
+
+    def to_dict(self, asset):
+        return {
+            "hash": asset.hash,
+            "url": self.url(self.file_name(asset)),
+            "content_type": asset.content_type,
+            "bytes": asset.bytes,
+            "width": asset.width,
+            "height": asset.height,
+            "status": asset.status,
+            "thumbnails": self.thumbnails(asset.hash),
+            "source_url": asset.source_url,
+        }
+
+    # Storing
+
+    def store(self, data, source_url=None):
+        """Keep `data` as a media file. Returns `(asset, created)`; a new row
+        is added to the caller's session and gets its thumbnails after the
+        caller commits."""
+        cfg = self.app.config
+        if len(data) > cfg['MEDIA_MAX_BYTES']:
+            raise MediaError(f"Images are limited to {cfg['MEDIA_MAX_BYTES'] // (1024 * 1024)} MB")
+        ext = sniff(data)
+        if ext is None:
+            raise MediaError("Only JPEG, PNG, GIF and WebP images are accepted")
+        digest = hashlib.sha256(data).hexdigest()
+        name = f'{digest}.{ext}'
+        path = os.path.join(cfg['MEDIA_DIR'], name)
+        if not os.path.exists(path):
+            os.makedirs(cfg['MEDIA_DIR'], exist_ok=True)
+            write_atomic(path, data)
+
+        asset = self.model.query.filter_by(hash=digest).first()
+        if asset is not None:
+            return asset, False
+        asset = self.model(hash=digest, content_type=CONTENT_TYPES[ext], bytes=len(data), source_url=source_url,
+                           status='pending' if Image is not None else 'ready', created_at=time.time())
+        self.db.session.add(asset)
+        if Image is not None:
+            self.db.session.info.setdefault('media_pending', []).append((digest, name))
+        return asset, True
+
+    # Thumbnails
+
+    def _pool(self):
+        # One pool per process; gunicorn workers each start their own. Spawned
+        # rather than forked, since the worker already runs threads.
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._inflight = {}
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.app.config['MEDIA_WORKERS'], mp_context=multiprocessing.get_context('spawn'),
+                    initializer=lower_priority)
+            return self._executor
+
+    def submit(self, digest, name):
+        """Make an image's thumbnails in the background; returns the future."""
+        cfg = self.app.config
+        executor = self._pool()
+        with self._lock:
+            future = self._inflight.get(digest)
+            if future is not None:
+                return future
+            try:
+                future = executor.submit(make_thumbnails, cfg['MEDIA_DIR'], name, digest,
+                                         cfg['MEDIA_THUMBNAIL_WIDTHS'], cfg['MEDIA_THUMBNAIL_QUALITY'])
+            except BrokenProcessPool:
+                self._executor = None
+                raise
+            self._inflight[digest] = future
+        future.add_done_callback(lambda done: self._finished(digest, done))
+        return future
+
+    def reprocess(self, assets):
+        """Resubmit assets whose thumbnails are missing, e.g. left pending by a
+        worker that exited mid-job."""
+        if Image is None:
+            return []
+        return [self.submit(asset.hash, self.file_name(asset)) for asset in assets]
+
+    def join(self):
+        """Wait until every thumbnail job this process started is recorded."""
+        with self._idle:
+            self._idle.wait_for(lambda: not self._inflight)
+
+    def _finished(self, digest, future):
+        try:
+            size = future.result()
+            values = {'status': 'ready', 'width': size['width'], 'height': size['height'],
+                      'thumbnails': json.dumps(list(self.app.config['MEDIA_THUMBNAIL_WIDTHS'])), 'error': None}
+        except Exception as e:
+            log.warning("Could not make thumbnails for %s: %s", digest, e)
+            values = {'status': 'failed', 'error': str(e)[:500]}
+            if isinstance(e, BrokenProcessPool):
+                with self._lock:
+                    self._executor = None
+        try:
+            with self.app.app_context(), write_intent():
+                self.model.query.filter_by(hash=digest).update(values, synchronize_session=False)
+                self.db.session.commit()
+        except Exception:
+            log.exception("Could not record thumbnails for %s", digest)
+        finally:
+            with self._idle:
+                if self._inflight.get(digest) is future:
+                    del self._inflight[digest]
+                self._idle.notify_all()
+
+    # Serving
+
+    def file_view(self, name):
+        """GET /api/media/files/<name>: an original or a thumbnail."""
+        cfg = self.app.config
+        match = FILE_NAME.match(name)
+        if match is None:
+            return jsonify({"message": "Media not found"}), 404
+        directory = cfg['MEDIA_DIR']
+        if not os.path.exists(os.path.join(directory, name)):
+            digest, width = match.group(1), match.group(2)
+            for ext in CONTENT_TYPES if width else ():
+                # Thumbnail not made yet (or no Pillow): the original for now.
+                if os.path.exists(os.path.join(directory, f'{digest}.{ext}')):
+                    response = redirect(self.url(f'{digest}.{ext}'), 302)
+                    response.headers['Cache-Control'] = 'no-store'
+                    return response
+            return jsonify({"message": "Media not found"}), 404
+        response = send_from_directory(directory, name, mimetype=CONTENT_TYPES[match.group(3)],
+                                       max_age=cfg['MEDIA_MAX_AGE'], etag=name.rsplit('.', 1)[0], conditional=True)
+        response.cache_control.immutable = True
+        return response
@@ -0,0 +1,346 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+try:
+    import fcntl
+except ImportError:  # Windows: no multi-worker servers, nothing to retire
+    fcntl = None
+
+# Request latency histogram buckets, in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Statements kept per request for the slow-request log.
+MAX_STATEMENTS = 1000
+# Clients allowed to scrape /metrics when METRICS_TOKEN is not set.
+LOOPBACK = frozenset(('127.0.0.1', '::1'))
+
+
+def _key(*labels):
+    return '\x1f'.join(labels)
+
+
+def _labels(names, key):
+    values = key.split('\x1f')
+    return ','.join('{}="{}"'.format(name, value.replace('\\', r'\\').replace('"', r'\"'))
+                    for name, value in zip(names, values))
+
+
+class RequestMetrics:
+    """Per-route request counts, latency histograms, response bytes and SQL
+    query count/time, exposed at `/metrics` in Prometheus text format.
+
+    Each process aggregates in memory and a background thread writes a
+    snapshot to `METRICS_DIR/<pid>.json` every `METRICS_FLUSH_INTERVAL`
+    seconds when something changed; a scrape sums every snapshot in the directory, so any worker
+    can answer for all of them. Snapshots of exited workers are folded into
+    `retired.json` on the next scrape, so counters never go backwards and
+    the directory does not grow with every recycled worker. The default
+    directory is keyed by the parent pid, i.e. one per gunicorn master.
+
+    Without `METRICS_TOKEN` only loopback clients may scrape.
+
+    Requests slower than `METRICS_SLOW_REQUEST_MS` are logged along with
+    their slowest SQL statements.
+    """
+
+    def __init__(self, app=None, engine=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._latency = {}
+        self._bytes = {}
+        self._sql = {}
+        self._dirty = False
+        self._flusher_pid = None
+        self._process = None
+        if app is not None:
+            self.init_app(app, engine)
+
+    def init_app(self, app, engine):
+        self.app = app
+        cfg = app.config
+        cfg.setdefault('METRICS_ENABLED', os.environ.get('METRICS_ENABLED', '1') not in ('0', 'false', 'False'))
+        cfg.setdefault('METRICS_DIR', os.environ.get('METRICS_DIR') or
+                       os.path.join(tempfile.gettempdir(), f'portal-metrics-{os.getppid()}'))
+        cfg.setdefault('METRICS_FLUSH_INTERVAL', float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0)))
+        cfg.setdefault('METRICS_SLOW_REQUEST_MS', float(os.environ.get('METRICS_SLOW_REQUEST_MS', 500)))
+        cfg.setdefault('METRICS_TOKEN', os.environ.get('METRICS_TOKEN'))
+        if not cfg['METRICS_ENABLED']:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+        # The start time lives on the execution context, so a statement that
+        # fails (no after_cursor_execute) leaves nothing behind.
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if context is not None:
+                context._metrics_start = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started = getattr(context, '_metrics_start', None)
+            if started is None or not has_request_context() or 'metrics' not in g:
+                return
+            elapsed = time.perf_counter() - started
+            sample = g.metrics
+            sample['queries'] += 1
+            sample['sql_seconds'] += elapsed
+            if len(sample['statements']) < MAX_STATEMENTS:
+                sample['statements'].append((elapsed, statement))
+
+    # Collection
+
+    def _before_request(self):
+        g.metrics = {'started': time.perf_counter(), 'queries': 0, 'sql_seconds': 0.0, 'statements': []}
+
+    def _after_request(self, response):
+        sample = g.get('metrics')
+        if sample is None:
+            return response
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        labels = (request.method, route, str(response.status_code))
+
+        if not response.is_streamed:
+            self._record(labels, sample, response.calculate_content_length() or 0)
+            return response
+
+        # Streamed exports: count the body (and the SQL it runs, g.metrics
+        # stays live under stream_with_context) and finish the sample when
+        # the server closes the response.
+        sent = [0]
+        body = response.response
+
+        def counting():
+            try:
+                for chunk in body:
+                    sent[0] += len(chunk)
+                    yield chunk
+            finally:
+                if hasattr(body, 'close'):  # e.g. an export stopped by a disconnect
+                    body.close()
+
+        response.response = counting()
+        # Event streams stay open by design; they are not slow requests.
+        log_slow = response.mimetype != 'text/event-stream'
+        response.call_on_close(lambda: self._record(labels, sample, sent[0], log_slow))
+        return response
+
+    def _record(self, labels, sample, size, log_slow=True):
+        elapsed = time.perf_counter() - sample['started']
+        method, route, _ = labels
+        route_key = _key(method, route)
+        with self._lock:
+            self._requests[_key(*labels)] = self._requests.get(_key(*labels), 0) + 1
+            hist = self._latency.setdefault(route_key, [0] * (len(BUCKETS) + 2))
+            for i, bound in enumerate(BUCKETS):
+                if elapsed <= bound:
+                    hist[i] += 1
+            hist[-2] += elapsed
+            hist[-1] += 1
+            self._bytes[route_key] = self._bytes.get(route_key, 0) + size
+            sql = self._sql.setdefault(route_key, [0, 0.0])
+            sql[0] += sample['queries']
+            sql[1] += sample['sql_seconds']
+            self._dirty = True
+        if self._flusher_pid != os.getpid():
+            self._start_flusher()
+        if log_slow and elapsed * 1000 >= self.app.config['METRICS_SLOW_REQUEST_MS']:
+            self._log_slow(labels, elapsed, sample)
+
+    def _log_slow(self, labels, elapsed, sample):
+        method, route, status = labels
+        lines = [f"Slow request: {method} {route} -> {status} in {elapsed * 1000:.0f}ms, "
+                 f"{sample['queries']} queries, {sample['sql_seconds'] * 1000:.0f}ms in SQL"]
+        for seconds, statement in sorted(sample['statements'], key=lambda s: s[0], reverse=True)[:5]:
+            lines.append(f"  {seconds * 1000:8.1f}ms  {' '.join(statement.split())[:500]}")
+        self.app.logger.warning('\n'.join(lines))
+
+    # Cross-process snapshots
+
+    def _process_id(self):
+        # Tells a worker apart from an earlier one that had the same pid.
+        if self._process is None or self._process[0] != os.getpid():
+            self._process = (os.getpid(), time.time())
+        return '{}:{}'.format(*self._process)
+
+    def _snapshot(self):
+        with self._lock:
+            return {'process': self._process_id(), 'requests': dict(self._requests),
+                    'latency': {k: list(v) for k, v in self._latency.items()}, 'bytes': dict(self._bytes), 'sql': {k: list(v) for k, v in self._sql.items()}}
+
+    def _start_flusher(self):
+        # One thread per process, started lazily so it lives in the forked
+        # gunicorn worker rather than the master.
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(self.app.config['METRICS_FLUSH_INTERVAL'])
+                if self._dirty:
+                    self.flush()
+
+        threading.Thread(target=run, name='metrics-flusher', daemon=True).start()
+
+    def flush(self):
+        directory = self.app.config['METRICS_DIR']
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        self._dirty = False
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self._write(path, self._snapshot())
+        except OSError as e:
+            self.app.logger.warning("Could not write metrics snapshot %s: %s", path, e)
+
+    @staticmethod
+    def _load(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None  # missing, or being replaced right now
+
+    @staticmethod
+    def _write(path, data):
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def _merge(total, snapshot):
+        for section in ('requests', 'bytes'):
+            for key, value in snapshot[section].items():
+                total[section][key] = total[section].get(key, 0) + value
+        for section in ('latency', 'sql'):
+            for key, values in snapshot[section].items():
+                merged = total[section].setdefault(key, [0] * len(values))
+                for i, value in enumerate(values):
+                    merged[i] += value
+        return total
+
+    @staticmethod
+    def _empty():
+        return {'requests': {}, 'latency': {}, 'bytes': {}, 'sql': {}}
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _snapshot_pids(self, directory):
+        return [int(name[:-5]) for name in os.listdir(directory) if name.endswith('.json') and name[:-5].isdigit()]
+
+    def retire(self):
+        """Fold the snapshots of exited processes into retired.json.
+
+        retired.json also names the processes it just absorbed, and is
+        written before their files are removed, so a scrape that reads it
+        after the per-pid files never counts a process twice or drops one.
+        """
+        if fcntl is None:
+            return 0
+        directory = self.app.config['METRICS_DIR']
+        dead = [pid for pid in self._snapshot_pids(directory) if not self._alive(pid)]
+        if not dead:
+            return 0
+        with open(os.path.join(directory, 'retired.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            retired_path = os.path.join(directory, 'retired.json')
+            retired = self._load(retired_path) or self._empty()
+            retired['processes'] = []
+            paths = []
+            for pid in dead:
+                path = os.path.join(directory, f'{pid}.json')
+                snapshot = self._load(path)
+                if snapshot is None:
+                    continue  # retired by another worker while we waited
+                self._merge(retired, snapshot)
+                retired['processes'].append(snapshot.get('process'))
+                paths += [path, path + '.tmp']
+            if not paths:
+                return 0
+            self._write(retired_path, retired)
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return len(paths) // 2
+
+    def collect(self):
+        """Sum the snapshots of every process sharing METRICS_DIR."""
+        self.flush()
+        directory = self.app.config['METRICS_DIR']
+        try:
+            self.retire()
+        except OSError as e:
+            self.app.logger.warning("Could not retire metrics snapshots in %s: %s", directory, e)
+        snapshots = [self._load(os.path.join(directory, f'{pid}.json')) for pid in self._snapshot_pids(directory)]
+        # Read after the per-pid files, see retire()
+        retired = self._load(os.path.join(directory, 'retired.json'))
+        total = self._empty()
+        if retired is not None:
+            self._merge(total, retired)
+        absorbed = set(retired.get('processes', ())) if retired is not None else set()
+        for snapshot in snapshots:
+            if snapshot is not None and snapshot.get('process') not in absorbed:
+                self._merge(total, snapshot)
+        return total
+
+    def render(self):
+        data = self.collect()
+        lines = [
+            '# HELP portal_http_requests_total HTTP requests by route and status.',
+            '# TYPE portal_http_requests_total counter',
+        ]
+        for key, value in sorted(data['requests'].items()):
+            lines.append(f'portal_http_requests_total{{{_labels(("method", "route", "status"), key)}}} {value}')
+
+        lines += ['# HELP portal_http_request_duration_seconds Time to handle a request, including streaming the body.',
+                  '# TYPE portal_http_request_duration_seconds histogram']
+        for key, hist in sorted(data['latency'].items()):
+            labels = _labels(('method', 'route'), key)
+            for bound, count in zip(BUCKETS, hist):
+                lines.append(f'portal_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'portal_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {hist[-1]}')
+            lines.append(f'portal_http_request_duration_seconds_sum{{{labels}}} {hist[-2]:.6f}')
+            lines.append(f'portal_http_request_duration_seconds_count{{{labels}}} {hist[-1]}')
+
+        lines += ['# HELP portal_http_response_bytes_total Response body bytes sent.',
+                  '# TYPE portal_http_response_bytes_total counter']
+        for key, value in sorted(data['bytes'].items()):
+            lines.append(f'portal_http_response_bytes_total{{{_labels(("method", "route"), key)}}} {value}')
+
+        lines += ['# HELP portal_db_queries_total SQL statements executed while handling requests.',
+                  '# TYPE portal_db_queries_total counter']
+        for key, (queries, _) in sorted(data['sql'].items()):
+            lines.append(f'portal_db_queries_total{{{_labels(("method", "route"), key)}}} {queries}')
+        lines += ['# HELP portal_db_query_seconds_total Time spent in SQL while handling requests.',
+                  '# TYPE portal_db_query_seconds_total counter']
+        for key, (_, seconds) in sorted(data['sql'].items()):
+            lines.append(f'portal_db_query_seconds_total{{{_labels(("method", "route"), key)}}} {seconds:.6f}')
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        token = self.app.config['METRICS_TOKEN']
+        if token:
+            if request.headers.get('Authorization') != f'Bearer {token}':
+                return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        elif request.remote_addr not in LOOPBACK:
+            return Response('Set METRICS_TOKEN to scrape from other hosts\n', status=403, mimetype='text/plain')
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,520 @@
+import re
+import time
+import urllib.parse
+
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+
+# Applied migrations are recorded here; each one runs exactly once per database.
+schema_migration = sa.Table(
+    'schema_migration', sa.MetaData(),
+    sa.Column('id', sa.String(100), primary_key=True),
+    sa.Column('applied_at', sa.Float, nullable=False),
+)
+
+MIGRATIONS = []
+
+
+def migration(migration_id):
+    """Register a data migration. Functions receive a Connection inside a
+    transaction and must only use table constructs defined here, never the
+    app's models, so they keep working as the models evolve."""
+    def register(fn):
+        MIGRATIONS.append((migration_id, fn))
+        return fn
+    return register
+
+
+def applied_migrations(engine):
+    schema_migration.create(bind=engine, checkfirst=True)
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(sa.select(schema_migration.c.id))}
+
+
+def pending_migrations(engine):
+    """Ids of migrations not applied yet, read with a single query; all of
+    them when the database has no schema_migration table."""
+    try:
+        with engine.connect() as conn:
+            applied = {row[0] for row in conn.execute(sa.select(schema_migration.c.id))}
+    except (OperationalError, ProgrammingError):  # no such table
+        applied = set()
+    return [migration_id for migration_id, _ in MIGRATIONS if migration_id not in applied]
+
+
+def run_migrations(engine):
+    """Apply pending migrations in order. Safe to call from several
+    processes at once: the id is inserted first, in the migration's own
+    transaction, so a concurrent runner fails on the primary key and skips."""
+    if not pending_migrations(engine):
+        return  # the usual restart: one query and no DDL
+    applied = applied_migrations(engine)
+    for migration_id, fn in MIGRATIONS:
+        if migration_id in applied:
+            continue
+        try:
+            with engine.begin() as conn:
+                conn.execute(schema_migration.insert().values(id=migration_id, applied_at=time.time()))
+                fn(conn)
+        except IntegrityError:
+            if migration_id not in applied_migrations(engine):
+                raise
+        else:
+            print(f"Applied migration {migration_id}")
+
+
+# The schema as of the first migration-managed release. Tables and indexes
+# are created only if missing, so this also brings databases made by
+# db.create_all() (or by the original seed script) up to date. Later schema
+# changes get their own migrations; do not edit this snapshot.
+_initial = sa.MetaData()
+sa.Table('user', _initial,
+         sa.Column('id', sa.Integer, primary_key=True),
+         sa.Column('email', sa.String(120), unique=True, nullable=False),
+         sa.Column('password', sa.String(120), nullable=False),
+         sa.Column('name', sa.String(120), nullable=False),
+         sa.Column('role', sa.String(20), nullable=False))
+sa.Table('course', _initial,
+         sa.Column('id', sa.Integer, primary_key=True),
+         sa.Column('title', sa.String(200), nullable=False),
+         sa.Column('instructor', sa.String(120), nullable=False),
+         sa.Column('duration', sa.String(50)),
+         sa.Column('rating', sa.Float),
+         sa.Column('students', sa.Integer),
+         sa.Column('image', sa.String(500)),
+         sa.Column('tags', sa.Text),
+         sa.Column('video_url', sa.String(500)),
+         sa.Index('ix_course_title_id', 'title', 'id'),
+         sa.Index('ix_course_instructor_id', 'instructor', 'id'))
+sa.Table('faculty_member', _initial,
+         sa.Column('id', sa.Integer, primary_key=True),
+         sa.Column('name', sa.String(120), nullable=False),
+         sa.Column('role', sa.String(120)),
+         sa.Column('bio', sa.Text),
+         sa.Index('ix_faculty_member_name_id', 'name', 'id'),
+         sa.Index('ix_faculty_member_role_id', 'role', 'id'))
+sa.Table('student', _initial,
+         sa.Column('id', sa.Integer, primary_key=True),
+         sa.Column('name', sa.String(120), nullable=False),
+         sa.Column('email', sa.String(120), unique=True, nullable=False))
+sa.Table('enrollment', _initial,
+         sa.Column('id', sa.Integer, primary_key=True),
+         sa.Column('student_id', sa.Integer, sa.ForeignKey('student.id', ondelete='CASCADE'), nullable=False),
+         sa.Column('course_id', sa.Integer, sa.ForeignKey('course.id', ondelete='CASCADE'), nullable=False),
+         sa.Column('progress', sa.String(20)),
+         sa.Index('ux_enrollment_student_course', 'student_id', 'course_id', unique=True),
+         sa.Index('ix_enrollment_course_student', 'course_id', 'student_id'))
+sa.Table('contact_message', _initial,
+         sa.Column('id', sa.Integer, primary_key=True),
+         sa.Column('name', sa.String(120), nullable=False),
+         sa.Column('email', sa.String(120), nullable=False),
+         sa.Column('message', sa.Text, nullable=False),
+         sa.Column('timestamp', sa.String(50)),
+         sa.Column('is_read', sa.Boolean),
+         sa.Index('ix_contact_message_name_id', 'name', 'id'),
+         sa.Index('ix_contact_message_email_id', 'email', 'id'),
+         sa.Index('ix_contact_message_is_read_id', 'is_read', 'id'))
+sa.Table('outbound_email', _initial,
+         sa.Column('id', sa.Integer, primary_key=True),
+         sa.Column('contact_message_id', sa.Integer, sa.ForeignKey('contact_message.id')),
+         sa.Column('sender', sa.String(120), nullable=False),
+         sa.Column('recipient', sa.String(120), nullable=False),
+         sa.Column('subject', sa.String(300), nullable=False),
+         sa.Column('body', sa.Text, nullable=False),
+         sa.Column('status', sa.String(20), nullable=False),
+         sa.Column('attempts', sa.Integer, nullable=False),
+         sa.Column('next_attempt_at', sa.Float, nullable=False),
+         sa.Column('claim_token', sa.String(32), index=True),
+         sa.Column('claimed_at', sa.Float),
+         sa.Column('last_error', sa.Text),
+         sa.Column('created_at', sa.Float),
+         sa.Column('sent_at', sa.Float),
+         sa.Index('ix_outbound_email_status_next_attempt', 'status', 'next_attempt_at'))
+sa.Table('instructor_stats', _initial,
+         sa.Column('instructor', sa.String(120), primary_key=True),
+         sa.Column('course_count', sa.Integer, nullable=False),
+         sa.Column('student_count', sa.Integer, nullable=False),
+         sa.Column('rating_sum', sa.Float, nullable=False),
+         sa.Column('avg_rating', sa.Float, nullable=False),
+         sa.Index('ix_instructor_stats_student_count', 'student_count'),
+         sa.Index('ix_instructor_stats_avg_rating', 'avg_rating', 'student_count'))
+sa.Table('cache_version', _initial,
+         sa.Column('name', sa.String(50), primary_key=True),
+         sa.Column('version', sa.Integer, nullable=False))
+
+
+@migration('0000_initial_schema')
+def initial_schema(conn):
+    _initial.create_all(bind=conn, checkfirst=True)
+    # create_all skips existing tables entirely, including their indexes.
+    for table in _initial.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+
+# Frozen views of the tables as the migrations below expect them.
+_tables = sa.MetaData()
+_course = sa.Table('course', _tables, sa.Column('id', sa.Integer, primary_key=True), sa.Column('title', sa.String))
+_student = sa.Table('student', _tables, sa.Column('id', sa.Integer, primary_key=True),
+                    sa.Column('name', sa.String), sa.Column('email', sa.String))
+_enrollment = sa.Table('enrollment', _tables, sa.Column('id', sa.Integer, primary_key=True),
+                       sa.Column('student_id', sa.Integer), sa.Column('course_id', sa.Integer),
+                       sa.Column('progress', sa.String))
+
+
+@migration('0001_enrollments_from_student_registry')
+def enrollments_from_student_registry(conn):
+    # student_registry stored one free-text row per (student, course title),
+    # plus "Not Enrolled" placeholders from signup. Split it into students
+    # and enrollments keyed by course id; rows whose title no longer matches
+    # a course only produce the student.
+    if not sa.inspect(conn).has_table('student_registry'):
+        return
+    registry = conn.execute(sa.text(
+        "SELECT name, email, course, progress FROM student_registry ORDER BY id")).fetchall()
+
+    course_ids = {}
+    for course_id, title in conn.execute(sa.select(_course.c.id, _course.c.title).order_by(_course.c.id)):
+        course_ids.setdefault(title, course_id)
+    student_ids = {email: student_id for student_id, email in conn.execute(sa.select(_student.c.id, _student.c.email))}
+
+    enrollments = {}
+    for name, email, course, progress in registry:
+        email = (email or '').strip().lower()
+        if not email:
+            continue
+        student_id = student_ids.get(email)
+        if student_id is None:
+            student_id = conn.execute(_student.insert().values(name=name, email=email)).inserted_primary_key[0]
+            student_ids[email] = student_id
+        course_id = course_ids.get(course)
+        if course_id is not None:
+            enrollments.setdefault((student_id, course_id), progress or "0%")
+
+    if enrollments:
+        conn.execute(_enrollment.insert(), [
+            {"student_id": s, "course_id": c, "progress": p} for (s, c), p in enrollments.items()
+        ])
+
+
+def parse_count(value):
+    """'1.2k' -> 1200, '850' -> 850, '2M' -> 2000000; unparseable -> 0."""
+    text = str(value or '').strip().lower().replace(',', '')
+    multiplier = 1
+    if text.endswith('k'):
+        multiplier, text = 1000, text[:-1]
+    elif text.endswith('m'):
+        multiplier, text = 1000000, text[:-1]
+    try:
+        return int(round(float(text) * multiplier))
+    except ValueError:
+        return 0
+
+
+def parse_rating(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 5.0
+
+
+@migration('0002_numeric_course_rating_and_students')
+def numeric_course_rating_and_students(conn):
+    columns = {c['name']: c['type'] for c in sa.inspect(conn).get_columns('course')}
+    if isinstance(columns['students'], sa.Integer):
+        return  # created with numeric columns already
+
+    values = [
+        {"row_id": row_id, "rating": parse_rating(rating), "students": parse_count(students)}
+        for row_id, rating, students in conn.execute(sa.text("SELECT id, rating, students FROM course"))
+    ]
+    if conn.dialect.name == 'sqlite':
+        # SQLite cannot change a column's type; rebuild the table the way
+        # https://www.sqlite.org/lang_altertable.html#otheralter describes.
+        conn.execute(sa.text(
+            "CREATE TABLE course_new ("
+            " id INTEGER NOT NULL, title VARCHAR(200) NOT NULL, instructor VARCHAR(120) NOT NULL,"
+            " duration VARCHAR(50), rating FLOAT, students INTEGER, image VARCHAR(500), tags TEXT,"
+            " video_url VARCHAR(500), PRIMARY KEY (id))"))
+        conn.execute(sa.text(
+            "INSERT INTO course_new (id, title, instructor, duration, image, tags, video_url)"
+            " SELECT id, title, instructor, duration, image, tags, video_url FROM course"))
+        conn.execute(sa.text("DROP TABLE course"))
+        conn.execute(sa.text("ALTER TABLE course_new RENAME TO course"))
+        # DROP TABLE took the indexes with it.
+        conn.execute(sa.text("CREATE INDEX ix_course_title_id ON course (title, id)"))
+        conn.execute(sa.text("CREATE INDEX ix_course_instructor_id ON course (instructor, id)"))
+    else:
+        conn.execute(sa.text("ALTER TABLE course DROP COLUMN rating"))
+        conn.execute(sa.text("ALTER TABLE course DROP COLUMN students"))
+        conn.execute(sa.text("ALTER TABLE course ADD COLUMN rating FLOAT"))
+        conn.execute(sa.text("ALTER TABLE course ADD COLUMN students INTEGER"))
+    if values:
+        conn.execute(sa.text("UPDATE course SET rating = :rating, students = :students WHERE id = :row_id"), values)
+
+
+@migration('0003_fts5_search_index')
+def fts5_search_index(conn):
+    # External-content FTS5 tables over the catalog and faculty, kept in sync
+    # by triggers. Only SQLite has FTS5; search.py falls back to LIKE elsewhere.
+    if conn.dialect.name != 'sqlite':
+        return
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS course_fts USING fts5("
+        " title, instructor, tags, content='course', content_rowid='id', prefix='2 3')",
+        "CREATE TRIGGER IF NOT EXISTS course_fts_ai AFTER INSERT ON course BEGIN"
+        " INSERT INTO course_fts(rowid, title, instructor, tags) VALUES (new.id, new.title, new.instructor, new.tags);"
+        " END",
+        "CREATE TRIGGER IF NOT EXISTS course_fts_ad AFTER DELETE ON course BEGIN"
+        " INSERT INTO course_fts(course_fts, rowid, title, instructor, tags)"
+        " VALUES ('delete', old.id, old.title, old.instructor, old.tags);"
+        " END",
+        # Only the indexed columns: enrollments rewrite course.students constantly.
+        "CREATE TRIGGER IF NOT EXISTS course_fts_au AFTER UPDATE OF title, instructor, tags ON course BEGIN"
+        " INSERT INTO course_fts(course_fts, rowid, title, instructor, tags)"
+        " VALUES ('delete', old.id, old.title, old.instructor, old.tags);"
+        " INSERT INTO course_fts(rowid, title, instructor, tags) VALUES (new.id, new.title, new.instructor, new.tags);"
+        " END",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS faculty_fts USING fts5("
+        " name, role, bio, content='faculty_member', content_rowid='id', prefix='2 3')",
+        "CREATE TRIGGER IF NOT EXISTS faculty_fts_ai AFTER INSERT ON faculty_member BEGIN"
+        " INSERT INTO faculty_fts(rowid, name, role, bio) VALUES (new.id, new.name, new.role, new.bio);"
+        " END",
+        "CREATE TRIGGER IF NOT EXISTS faculty_fts_ad AFTER DELETE ON faculty_member BEGIN"
+        " INSERT INTO faculty_fts(faculty_fts, rowid, name, role, bio) VALUES ('delete', old.id, old.name, old.role, old.bio);"
+        " END",
+        "CREATE TRIGGER IF NOT EXISTS faculty_fts_au AFTER UPDATE OF name, role, bio ON faculty_member BEGIN"
+        " INSERT INTO faculty_fts(faculty_fts, rowid, name, role, bio) VALUES ('delete', old.id, old.name, old.role, old.bio);"
+        " INSERT INTO faculty_fts(rowid, name, role, bio) VALUES (new.id, new.name, new.role, new.bio);"
+        " END",
+        # Index whatever is already in the tables.
+        "INSERT INTO course_fts(course_fts) VALUES ('rebuild')",
+        "INSERT INTO faculty_fts(faculty_fts) VALUES ('rebuild')",
+    ]
+    for statement in statements:
+        conn.execute(sa.text(statement))
+
+
+_user = sa.Table('user', _tables, sa.Column('id', sa.Integer, primary_key=True),
+                 sa.Column('email', sa.String), sa.Column('password', sa.String))
+
+
+@migration('0004_user_password_hashes')
+def user_password_hashes(conn):
+    # Hashes (passwords.py) are longer than the old plaintext column. The
+    # plaintext values themselves are replaced by a hash on each user's
+    # next successful login, since hashing needs the password.
+    if conn.dialect.name != 'sqlite':  # SQLite does not enforce VARCHAR lengths
+        conn.execute(sa.text('ALTER TABLE "user" ALTER COLUMN password TYPE VARCHAR(255)'))
+
+    # Login now matches emails case-insensitively, as signup always stored
+    # them lowercased. Leave a mixed-case address alone if its lowercase
+    # form already belongs to another account.
+    rows = conn.execute(sa.select(_user.c.id, _user.c.email)).fetchall()
+    taken = {email for _, email in rows}
+    for user_id, email in rows:
+        lowered = (email or '').strip().lower()
+        if lowered != email and lowered not in taken:
+            conn.execute(_user.update().where(_user.c.id == user_id).values(email=lowered))
+            taken.add(lowered)
+
+
+@migration('0005_revoked_token')
+def revoked_token(conn):
+    table = sa.Table('revoked_token', sa.MetaData(),
+                     sa.Column('jti', sa.String(32), primary_key=True),
+                     sa.Column('expires_at', sa.Float, nullable=False, index=True))
+    table.create(bind=conn, checkfirst=True)
+
+
+_contact_message = sa.Table('contact_message', _tables, sa.Column('id', sa.Integer, primary_key=True),
+                            sa.Column('is_read', sa.Boolean))
+
+
+@migration('0006_inbox_stats')
+def inbox_stats(conn):
+    # One row of running contact-message totals for the admin inbox badge,
+    # seeded from the messages already stored.
+    table = sa.Table('inbox_stats', sa.MetaData(),
+                     sa.Column('id', sa.Integer, primary_key=True, autoincrement=False),
+                     sa.Column('total', sa.Integer, nullable=False),
+                     sa.Column('unread', sa.Integer, nullable=False))
+    table.create(bind=conn, checkfirst=True)
+    total, unread = conn.execute(sa.select(
+        sa.func.count(),
+        sa.func.coalesce(sa.func.sum(sa.case((_contact_message.c.is_read == sa.false(), 1), else_=0)), 0),
+    ).select_from(_contact_message)).one()
+    conn.execute(table.delete())
+    conn.execute(table.insert().values(id=1, total=total, unread=unread))
+
+
+@migration('0007_change_event')
+def change_event(conn):
+    # Log of committed changes tailed by every worker for /api/events
+    # (events.py). AUTOINCREMENT keeps SQLite from reusing the ids of
+    # pruned rows, which clients hold on to as Last-Event-ID.
+    table = sa.Table('change_event', sa.MetaData(),
+                     sa.Column('id', sa.Integer, primary_key=True),
+                     sa.Column('kind', sa.String(50), nullable=False),
+                     sa.Column('data', sa.Text, nullable=False),
+                     sa.Column('created_at', sa.Float, nullable=False, index=True),
+                     sqlite_autoincrement=True)
+    table.create(bind=conn, checkfirst=True)
+
+
+def parse_progress(value):
+    """'85%' -> 85, '100' -> 100; clamped to 0-100, unparseable -> 0."""
+    try:
+        return min(100, max(0, int(round(float(str(value or '').strip().rstrip('%'))))))
+    except ValueError:
+        return 0
+
+
+@migration('0008_numeric_enrollment_progress')
+def numeric_enrollment_progress(conn):
+    # Progress becomes a whole percentage, with an append-only log of
+    # changes and a per-course histogram (ten 10-point buckets plus one
+    # for 100) kept in step by the app.
+    columns = {c['name']: c['type'] for c in sa.inspect(conn).get_columns('enrollment')}
+    values = [
+        {"row_id": row_id, "course_id": course_id, "student_id": student_id, "progress": parse_progress(progress)}
+        for row_id, student_id, course_id, progress
+        in conn.execute(sa.text("SELECT id, student_id, course_id, progress FROM enrollment"))
+    ]
+    if not isinstance(columns['progress'], sa.Integer):
+        if conn.dialect.name == 'sqlite':
+            # Rebuild as in 0002, keeping the foreign keys and indexes.
+            conn.execute(sa.text(
+                "CREATE TABLE enrollment_new ("
+                " id INTEGER NOT NULL, student_id INTEGER NOT NULL, course_id INTEGER NOT NULL,"
+                " progress INTEGER DEFAULT 0 NOT NULL, PRIMARY KEY (id),"
+                " FOREIGN KEY(student_id) REFERENCES student (id) ON DELETE CASCADE,"
+                " FOREIGN KEY(course_id) REFERENCES course (id) ON DELETE CASCADE)"))
+            conn.execute(sa.text(
+                "INSERT INTO enrollment_new (id, student_id, course_id) SELECT id, student_id, course_id FROM enrollment"))
+            conn.execute(sa.text("DROP TABLE enrollment"))
+            conn.execute(sa.text("ALTER TABLE enrollment_new RENAME TO enrollment"))
+            conn.execute(sa.text("CREATE UNIQUE INDEX ux_enrollment_student_course ON enrollment (student_id, course_id)"))
+            conn.execute(sa.text("CREATE INDEX ix_enrollment_course_student ON enrollment (course_id, student_id)"))
+        else:
+            conn.execute(sa.text("ALTER TABLE enrollment DROP COLUMN progress"))
+            conn.execute(sa.text("ALTER TABLE enrollment ADD COLUMN progress INTEGER DEFAULT 0 NOT NULL"))
+        changed = [v for v in values if v["progress"]]
+        if changed:
+            conn.execute(sa.text("UPDATE enrollment SET progress = :progress WHERE id = :row_id"), changed)
+
+    events = sa.Table('progress_event', sa.MetaData(),
+                      sa.Column('id', sa.Integer, primary_key=True),
+                      sa.Column('student_id', sa.Integer, nullable=False),
+                      sa.Column('course_id', sa.Integer, nullable=False),
+                      sa.Column('delta', sa.Integer, nullable=False),
+                      sa.Column('progress', sa.Integer, nullable=False),
+                      sa.Column('created_at', sa.Float, nullable=False),
+                      sa.Index('ix_progress_event_course_id', 'course_id', 'id'),
+                      sa.Index('ix_progress_event_student_course_id', 'student_id', 'course_id', 'id'))
+    stats = sa.Table('course_progress_stats', sa.MetaData(),
+                     sa.Column('course_id', sa.Integer, primary_key=True, autoincrement=False),
+                     sa.Column('bucket', sa.Integer, primary_key=True, autoincrement=False),
+                     sa.Column('students', sa.Integer, nullable=False),
+                     sa.Column('progress_sum', sa.Integer, nullable=False))
+    events.create(bind=conn, checkfirst=True)
+    stats.create(bind=conn, checkfirst=True)
+
+    # Start the log from the progress already recorded, so each
+    # enrollment's deltas add up to its current value.
+    now = time.time()
+    logged = [{"student_id": v["student_id"], "course_id": v["course_id"], "delta": v["progress"],
+               "progress": v["progress"], "created_at": now} for v in values if v["progress"]]
+    if logged:
+        conn.execute(events.insert(), logged)
+    buckets = {}
+    for v in values:
+        key = (v["course_id"], min(v["progress"] // 10, 10))
+        students, total = buckets.get(key, (0, 0))
+        buckets[key] = (students + 1, total + v["progress"])
+    conn.execute(stats.delete())
+    if buckets:
+        conn.execute(stats.insert(), [{"course_id": c, "bucket": b, "students": n, "progress_sum": total}
+                                      for (c, b), (n, total) in buckets.items()])
+
+
+YOUTUBE_HOSTS = ('youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com',
+                 'youtube-nocookie.com', 'www.youtube-nocookie.com')
+
+
+def parse_youtube_id(url):
+    """The 11-character id in a youtube.com or youtu.be URL, else None."""
+    parts = urllib.parse.urlsplit(url or '')
+    host = (parts.hostname or '').lower()
+    segments = [s for s in parts.path.split('/') if s]
+    candidate = None
+    if host == 'youtu.be' and segments:
+        candidate = segments[0]
+    elif host in YOUTUBE_HOSTS:
+        if segments == ['watch']:
+            candidate = (urllib.parse.parse_qs(parts.query).get('v') or [None])[0]
+        elif len(segments) >= 2 and segments[0] in ('embed', 'shorts', 'live', 'v'):
+            candidate = segments[1]
+    return candidate if candidate and re.match(r'^[A-Za-z0-9_-]{11}$', candidate) else None
+
+
+@migration('0009_course_media')
+def course_media(conn):
+    # Locally stored images (media.py) and the columns derived from a
+    # course's image and video URLs when they are written.
+    columns = {c['name'] for c in sa.inspect(conn).get_columns('course')}
+    if 'image_hash' not in columns:
+        conn.execute(sa.text("ALTER TABLE course ADD COLUMN image_hash VARCHAR(64)"))
+    if 'video_id' not in columns:
+        conn.execute(sa.text("ALTER TABLE course ADD COLUMN video_id VARCHAR(20)"))
+    sa.Table('media_asset', sa.MetaData(),
+             sa.Column('id', sa.Integer, primary_key=True),
+             sa.Column('hash', sa.String(64), unique=True, nullable=False),
+             sa.Column('content_type', sa.String(50), nullable=False),
+             sa.Column('bytes', sa.Integer, nullable=False),
+             sa.Column('width', sa.Integer),
+             sa.Column('height', sa.Integer),
+             sa.Column('thumbnails', sa.Text),
+             sa.Column('status', sa.String(20), nullable=False),
+             sa.Column('error', sa.String(500)),
+             sa.Column('source_url', sa.String(500)),
+             sa.Column('created_at', sa.Float, nullable=False)).create(bind=conn, checkfirst=True)
+
+    videos = [{"row_id": row_id, "video_id": parse_youtube_id(url)}
+              for row_id, url in conn.execute(sa.text("SELECT id, video_url FROM course WHERE video_url IS NOT NULL"))]
+    videos = [v for v in videos if v["video_id"]]
+    if videos:
+        conn.execute(sa.text("UPDATE course SET video_id = :video_id WHERE id = :row_id"), videos)
+
+
+@migration('0010_record_versions')
+def record_versions(conn):
+    # Optimistic concurrency for admin edits: bumped on every update, sent
+    # as the ETag and checked against If-Match.
+    for table in ('faculty_member', 'enrollment'):
+        if 'version' not in {c['name'] for c in sa.inspect(conn).get_columns(table)}:
+            conn.execute(sa.text(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+@migration('0011_soft_delete')
+def soft_delete(conn):
+    # Deletes set deleted_at and soft_delete.Purger removes the rows later.
+    # Indexes behind active-row queries leave deleted rows out, so rows
+    # waiting for the purge cost those queries nothing, and each table gets
+    # a partial index of just its deleted rows for the purge to find them.
+    for table in ('user', 'course', 'faculty_member', 'enrollment'):
+        if 'deleted_at' not in {c['name'] for c in sa.inspect(conn).get_columns(table)}:
+            conn.execute(sa.text(f'ALTER TABLE "{table}" ADD COLUMN deleted_at FLOAT'))
+        conn.execute(sa.text(f'CREATE INDEX IF NOT EXISTS ix_{table}_deleted_at ON "{table}" (deleted_at)'
+                             ' WHERE deleted_at IS NOT NULL'))
+    for name, table, columns in (
+            ('ix_course_title_id', 'course', 'title, id'),
+            ('ix_course_instructor_id', 'course', 'instructor, id'),
+            ('ix_faculty_member_name_id', 'faculty_member', 'name, id'),
+            ('ix_faculty_member_role_id', 'faculty_member', 'role, id'),
+            # Unique among active rows only, so a student can enroll again
+            # while their deleted enrollment waits for the purge.
+            ('ux_enrollment_student_course', 'enrollment', 'student_id, course_id')):
+        unique = 'UNIQUE ' if name.startswith('ux_') else ''
+        conn.execute(sa.text(f"DROP INDEX IF EXISTS {name}"))
+        conn.execute(sa.text(f"CREATE {unique}INDEX {name} ON {table} ({columns}) WHERE deleted_at IS NULL"))
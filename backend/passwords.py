@@ -0,0 +1,131 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEMES = ('scrypt', 'pbkdf2_sha256')
+
+
+class HasherBusy(RuntimeError):
+    """Every hashing slot is taken and the wait for one timed out."""
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode().rstrip('=')
+
+
+def _unb64(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+class PasswordHasher:
+    """Salted scrypt or PBKDF2 password hashes, computed on a bounded pool.
+
+    Hashes are stored as `scrypt$N$r$p$salt$hash` or
+    `pbkdf2_sha256$iterations$salt$hash`. hashlib releases the GIL while
+    hashing, so the pool caps how many cores logins can take per worker
+    process; callers beyond `PASSWORD_HASH_WORKERS` running plus
+    `PASSWORD_HASH_QUEUE` waiting get HasherBusy instead of piling up.
+
+    Anything not in one of those formats is a legacy plaintext password;
+    `verify` accepts it and reports that it needs rehashing, as it does
+    for hashes made with other parameters than the configured ones.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._pid = None
+        self._slots = None
+        self._dummy = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        cfg = app.config
+        cfg.setdefault('PASSWORD_SCHEME', os.environ.get('PASSWORD_SCHEME', 'scrypt'))
+        cfg.setdefault('PASSWORD_SCRYPT_N', int(os.environ.get('PASSWORD_SCRYPT_N', 2 ** 14)))
+        cfg.setdefault('PASSWORD_SCRYPT_R', int(os.environ.get('PASSWORD_SCRYPT_R', 8)))
+        cfg.setdefault('PASSWORD_SCRYPT_P', int(os.environ.get('PASSWORD_SCRYPT_P', 1)))
+        cfg.setdefault('PASSWORD_PBKDF2_ITERATIONS', int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 600000)))
+        cfg.setdefault('PASSWORD_HASH_WORKERS', int(os.environ.get('PASSWORD_HASH_WORKERS', 2)))
+        cfg.setdefault('PASSWORD_HASH_QUEUE', int(os.environ.get('PASSWORD_HASH_QUEUE', 16)))
+        cfg.setdefault('PASSWORD_HASH_WAIT', float(os.environ.get('PASSWORD_HASH_WAIT', 5.0)))
+        if cfg['PASSWORD_SCHEME'] not in SCHEMES:
+            raise ValueError(f"PASSWORD_SCHEME must be one of {', '.join(SCHEMES)}")
+
+    # Hashing primitives (run on the pool)
+
+    def _params(self):
+        cfg = self.app.config
+        if cfg['PASSWORD_SCHEME'] == 'scrypt':
+            return ('scrypt', str(cfg['PASSWORD_SCRYPT_N']), str(cfg['PASSWORD_SCRYPT_R']), str(cfg['PASSWORD_SCRYPT_P']))
+        return ('pbkdf2_sha256', str(cfg['PASSWORD_PBKDF2_ITERATIONS']))
+
+    @staticmethod
+    def _derive(params, password, salt):
+        if params[0] == 'scrypt':
+            n, r, p = (int(v) for v in params[1:])
+            return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                                  maxmem=256 * n * r + 1024 * 1024, dklen=32)
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, int(params[1]), dklen=32)
+
+    def _hash(self, password):
+        params = self._params()
+        salt = os.urandom(16)
+        return '$'.join(params + (_b64(salt), _b64(self._derive(params, password, salt))))
+
+    def _verify(self, stored, password):
+        parts = stored.split('$')
+        if parts[0] not in SCHEMES:
+            # Legacy plaintext from before hashing was introduced
+            return hmac.compare_digest(stored.encode(), password.encode()), True
+        try:
+            params, salt, expected = tuple(parts[:-2]), _unb64(parts[-2]), _unb64(parts[-1])
+            ok = hmac.compare_digest(self._derive(params, password, salt), expected)
+        except (ValueError, IndexError):
+            return False, False  # corrupt hash: nothing matches it
+        return ok, params != self._params()
+
+    def _verify_unknown(self, password):
+        # Made on first use, on the pool like every other hash
+        if self._dummy is None:
+            self._dummy = self._hash(os.urandom(16).hex())
+        self._verify(self._dummy, password)
+
+    # Pool
+
+    def _run(self, fn, *args):
+        cfg = self.app.config
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # Threads do not survive a fork; gunicorn workers build their own pool.
+                self._executor = ThreadPoolExecutor(max_workers=cfg['PASSWORD_HASH_WORKERS'],
+                                                    thread_name_prefix='password-hash')
+                self._slots = threading.BoundedSemaphore(cfg['PASSWORD_HASH_WORKERS'] + cfg['PASSWORD_HASH_QUEUE'])
+                self._pid = os.getpid()
+            executor, slots = self._executor, self._slots
+        if not slots.acquire(timeout=cfg['PASSWORD_HASH_WAIT']):
+            raise HasherBusy("Password hashing is saturated")
+        try:
+            return executor.submit(fn, *args).result()
+        finally:
+            slots.release()
+
+    def hash(self, password):
+        return self._run(self._hash, password)
+
+    def verify(self, stored, password):
+        """Return (matches, needs_rehash).
+
+        With `stored=None` (unknown account) a dummy hash is checked so
+        the response takes as long as for a real account.
+        """
+        if stored is None:
+            self._run(self._verify_unknown, password)
+            return False, False
+        return self._run(self._verify, stored, password)
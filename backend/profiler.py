@@ -0,0 +1,198 @@
+import io
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+from auth import TokenError
+
+# Collapses literals and expanded IN lists so "the same query with other
+# values" counts as one statement shape.
+_SHAPE_RULES = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%\(\w+\)s|\$\d+|:\w+'), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\?(?:\s*,\s*\?)+'), '?'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def statement_shape(statement):
+    for pattern, replacement in _SHAPE_RULES:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's Python stack every `interval` seconds and counts
+    the stacks in collapsed form ("outer;inner;leaf count"), which
+    flamegraph.pl and speedscope read directly."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """Development profiler and repeated-query (N+1) detector.
+
+    An admin adds `?__profile=1` (or `X-Profile: 1`) to any request to run
+    it under cProfile plus a stack sampler. `<name>.pstats` and
+    `<name>.collapsed` (a flamegraph) are written to `PROFILE_DIR` and
+    named in the `X-Profile` response header; `__profile=text` returns the
+    top functions as plain text instead of the normal response.
+
+    SQL statements are counted by shape for profiled requests, and a
+    warning is logged when one shape runs more than
+    `PROFILE_REPEATED_QUERY_LIMIT` times. `PROFILE_REQUESTS=queries` does
+    that counting on every request, `PROFILE_REQUESTS=1` profiles every
+    request. The default, `0`, leaves a before_request that looks for the
+    trigger and a query hook that returns straight away.
+    """
+
+    def __init__(self, app=None, engine=None, token_auth=None):
+        self.app = None
+        self.token_auth = None
+        if app is not None:
+            self.init_app(app, engine, token_auth)
+
+    def init_app(self, app, engine, token_auth):
+        self.app = app
+        self.token_auth = token_auth
+        cfg = app.config
+        cfg.setdefault('PROFILE_REQUESTS', os.environ.get('PROFILE_REQUESTS', '0'))
+        cfg.setdefault('PROFILE_DIR', os.environ.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles'))
+        cfg.setdefault('PROFILE_REPEATED_QUERY_LIMIT', int(os.environ.get('PROFILE_REPEATED_QUERY_LIMIT', 10)))
+        cfg.setdefault('PROFILE_SAMPLE_INTERVAL', float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.001)))
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            if has_request_context():
+                queries = g.get('profile_queries')
+                if queries is not None:
+                    queries[statement_shape(statement)] += 1
+
+    def _configured_mode(self):
+        configured = str(self.app.config['PROFILE_REQUESTS'])
+        if configured in ('0', 'false', 'False', ''):
+            return None
+        return 'queries' if configured == 'queries' else '1'
+
+    def _is_admin(self):
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not token:
+            return False
+        try:
+            return self.token_auth.verify(token.strip()).get('role') == 'admin'
+        except TokenError:
+            return False
+
+    def _before_request(self):
+        environ = request.environ
+        configured = self._configured_mode()
+        if configured is None and 'HTTP_X_PROFILE' not in environ \
+                and '__profile' not in environ.get('QUERY_STRING', ''):
+            return None  # the common case, kept to a couple of dict lookups
+        mode = request.args.get('__profile') or request.headers.get('X-Profile')
+        if mode and mode != '0':
+            if configured is None and not self._is_admin():
+                return Response('Profiling requires an admin token\n', status=403, mimetype='text/plain')
+        elif configured is None:
+            return None
+        else:
+            mode = configured
+
+        g.profile_queries = Counter()
+        if mode == 'queries':
+            return None
+        import cProfile  # only profiled requests pay for the import
+
+        sampler = _StackSampler(threading.get_ident(), self.app.config['PROFILE_SAMPLE_INTERVAL'])
+        profile = cProfile.Profile()
+        g.profile = (mode, profile, sampler, time.perf_counter())
+        sampler.start()
+        profile.enable()
+        return None
+
+    def _after_request(self, response):
+        queries = g.pop('profile_queries', None)
+        if queries is None:
+            return response
+        state = g.pop('profile', None)
+        if state is not None:
+            mode, profile, sampler, started = state
+            profile.disable()
+            sampler.stop()
+            elapsed = time.perf_counter() - started
+
+        route = request.url_rule.rule if request.url_rule is not None else request.path
+        limit = self.app.config['PROFILE_REPEATED_QUERY_LIMIT']
+        repeated = [(count, shape) for shape, count in queries.most_common() if count > limit]
+        for count, shape in repeated:
+            self.app.logger.warning("Possible N+1 in %s %s: %d x %s", request.method, route, count, shape[:300])
+        if repeated:
+            response.headers['X-Profile-Repeated-Queries'] = str(len(repeated))
+        if state is None:
+            return response
+
+        name = self._save(profile, sampler, route)
+        if name is None:
+            return response
+        if mode == 'text':
+            out = io.StringIO()
+            out.write(f'{request.method} {route} -> {response.status_code} in {elapsed * 1000:.1f}ms, '
+                      f'{sum(queries.values())} queries\n')
+            for count, shape in repeated:
+                out.write(f'repeated {count} x {shape}\n')
+            out.write('\n')
+            import pstats
+
+            pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(30)
+            response = Response(out.getvalue(), mimetype='text/plain')
+        response.headers['X-Profile'] = name
+        return response
+
+    def _save(self, profile, sampler, route):
+        directory = self.app.config['PROFILE_DIR']
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', route).strip('-') or 'root'
+        now = time.time()
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(now)) + f'.{int(now * 1000) % 1000:03d}'
+        name = f'{stamp}-{os.getpid()}-{request.method.lower()}-{slug}'
+        try:
+            os.makedirs(directory, exist_ok=True)
+            profile.dump_stats(os.path.join(directory, name + '.pstats'))
+            with open(os.path.join(directory, name + '.collapsed'), 'w') as f:
+                f.write(sampler.collapsed())
+        except OSError as e:
+            self.app.logger.warning("Could not write profile %s: %s", name, e)
+            return None
+        return name
@@ -0,0 +1,37 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """In-memory token buckets, one per key (client IP, account, ...).
+
+    Each bucket holds up to `burst` tokens and refills at `rate` tokens
+    per second; a request takes one token. Buckets live in the worker
+    process, so with N gunicorn workers a client can get up to N times the
+    configured rate. Only the `max_keys` most recently used keys are kept.
+    """
+
+    def __init__(self, rate, burst, max_keys=100000):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, now=None):
+        """Take a token for `key`; return 0 if allowed, else seconds to wait."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - stamp) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate if self.rate > 0 else math.inf
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
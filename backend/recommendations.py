@@ -0,0 +1,338 @@
+import heapq
+import itertools
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+
+from pagination import PaginationError
+
+log = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 6
+
+
+def normalize_tag(tag):
+    return ' '.join(str(tag).lower().split())
+
+
+def course_tags(tags_json):
+    """The normalized tags in a course's JSON `tags` column."""
+    try:
+        tags = json.loads(tags_json) if tags_json else []
+    except ValueError:
+        return frozenset()
+    if not isinstance(tags, list):
+        return frozenset()
+    return frozenset(t for t in map(normalize_tag, tags) if t)
+
+
+def parse_limit(args, maximum):
+    try:
+        return min(max(int(args.get('limit', DEFAULT_LIMIT)), 1), maximum)
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+
+
+class _Index:
+    """One build of the recommendation data; never changed once built."""
+
+    def __init__(self, version, related, postings, idf, norms, popular):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.build_ms = 0.0
+        # course id -> [(course id, score, shared students)], best first
+        self.related = related
+        # tag -> ids of the courses carrying it (the inverted index)
+        self.postings = postings
+        self.idf = idf
+        # course id -> length of its idf-weighted tag vector
+        self.norms = norms
+        # course ids by enrollment count, for students with nothing to go on
+        self.popular = popular
+
+
+def _tag_weights(courses):
+    postings = defaultdict(list)
+    for course_id, tags in courses:
+        for tag in tags:
+            postings[tag].append(course_id)
+    n = len(courses)
+    idf = {tag: math.log1p(n / len(ids)) for tag, ids in postings.items()}
+    norms = {course_id: math.sqrt(sum(idf[t] ** 2 for t in tags)) for course_id, tags in courses}
+    return {tag: tuple(ids) for tag, ids in postings.items()}, idf, norms
+
+
+def _build_sparse(courses, pairs, cfg, idf):
+    """Top-k related courses for every course with NumPy/SciPy.
+
+    Tag similarity is the cosine of idf-weighted course x tag vectors and
+    co-enrollment the cosine of course columns in the student x course
+    matrix (shared students / sqrt(students_a * students_b)); both come
+    out of one sparse product each. Scores are then combined a block of
+    rows at a time, so the dense worst case stays under
+    RECOMMEND_BLOCK_CELLS whatever the catalog size.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    ids = np.fromiter((course_id for course_id, _ in courses), dtype=np.int64, count=len(courses))
+    n = len(ids)
+    if not n:
+        return {}, []
+    vocab = {tag: j for j, tag in enumerate(idf)}
+    cells = np.array([(i, vocab[t]) for i, (_, tags) in enumerate(courses) for t in tags],
+                     dtype=np.int64).reshape(-1, 2)
+    weights = np.fromiter(idf.values(), dtype=np.float64, count=len(idf))
+    tags = sparse.csr_matrix((weights[cells[:, 1]], (cells[:, 0], cells[:, 1])), shape=(n, len(vocab)))
+    lengths = np.sqrt(np.asarray(tags.multiply(tags).sum(axis=1)).ravel())
+    tags = sparse.diags(np.divide(1.0, lengths, out=np.zeros(n), where=lengths > 0)) @ tags
+
+    flat = np.fromiter(itertools.chain.from_iterable(pairs), dtype=np.int64).reshape(-1, 2)
+    positions = np.searchsorted(ids, flat[:, 1])
+    known = (positions < n) & (ids[np.minimum(positions, n - 1)] == flat[:, 1])
+    student_ids, students = np.unique(flat[known, 0], return_inverse=True)
+    enrolled = sparse.csr_matrix((np.ones(len(students)), (students, positions[known])),
+                                 shape=(len(student_ids), n))
+    enrolled.data[:] = 1.0  # a repeated pair is still one enrollment
+    shared = (enrolled.T @ enrolled).tocsr()
+    counts = shared.diagonal()
+    shared.setdiag(0)
+    shared.data[shared.data < cfg['RECOMMEND_MIN_SHARED']] = 0
+    shared.eliminate_zeros()
+    coo = shared.tocoo()
+    co = sparse.csr_matrix((coo.data / np.sqrt(counts[coo.row] * counts[coo.col]), (coo.row, coo.col)),
+                           shape=(n, n))
+
+    tag_weight = cfg['RECOMMEND_TAG_WEIGHT']
+    k = cfg['RECOMMEND_TOP_K']
+    related = {}
+    shared.sort_indices()
+    block = max(1, cfg['RECOMMEND_BLOCK_CELLS'] // n)
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        scores = (tag_weight * (tags[start:stop] @ tags.T) + (1 - tag_weight) * co[start:stop]).tocsr()
+        scores.setdiag(0, k=start)  # not related to itself
+        scores.eliminate_zeros()
+        for row in range(stop - start):
+            lo, hi = scores.indptr[row], scores.indptr[row + 1]
+            cols, values = scores.indices[lo:hi], scores.data[lo:hi]
+            if hi - lo > k:
+                # Everything tied with the k-th best stays a candidate, so
+                # ties are broken by id as in _build_python.
+                kept = values >= np.partition(values, hi - lo - k)[hi - lo - k]
+                cols, values = cols[kept], values[kept]
+            order = np.lexsort((cols, -values))[:k]
+            cols, values = cols[order], values[order]
+            lo, hi = shared.indptr[start + row], shared.indptr[start + row + 1]
+            together = np.zeros(len(cols), dtype=np.int64)
+            if hi > lo:
+                at = np.minimum(np.searchsorted(shared.indices[lo:hi], cols), hi - lo - 1)
+                hit = shared.indices[lo:hi][at] == cols
+                together[hit] = shared.data[lo:hi][at[hit]]
+            related[int(ids[start + row])] = list(zip(
+                ids[cols].tolist(), np.round(values, 4).tolist(), together.tolist()))
+    popular = ids[np.lexsort((ids, -counts))][:cfg['RECOMMEND_TOP_K']].tolist()
+    return related, popular
+
+
+def _build_python(courses, pairs, cfg, postings, idf, norms):
+    """The same scores as _build_sparse, counted pair by pair; for installs
+    without NumPy/SciPy, where catalogs are small."""
+    known = {course_id for course_id, _ in courses}
+    by_student = defaultdict(set)
+    for student_id, course_id in pairs:
+        if course_id in known:
+            by_student[student_id].add(course_id)
+    counts = defaultdict(int)
+    together = defaultdict(lambda: defaultdict(int))
+    for enrolled in by_student.values():
+        for a in enrolled:
+            counts[a] += 1
+            for b in enrolled:
+                if a != b:
+                    together[a][b] += 1
+    shared = {a: {b: count for b, count in others.items() if count >= cfg['RECOMMEND_MIN_SHARED']}
+              for a, others in together.items()}
+
+    tag_weight = cfg['RECOMMEND_TAG_WEIGHT']
+    related = {}
+    for course_id, tags in courses:
+        scores = defaultdict(float)
+        for tag in tags:
+            for other in postings[tag]:
+                if other != course_id:
+                    scores[other] += tag_weight * idf[tag] ** 2 / (norms[course_id] * norms[other])
+        mine = shared.get(course_id, {})
+        for other, count in mine.items():
+            scores[other] += (1 - tag_weight) * count / math.sqrt(counts[course_id] * counts[other])
+        best = heapq.nsmallest(cfg['RECOMMEND_TOP_K'], ((-s, other) for other, s in scores.items() if s > 0))
+        related[course_id] = [(other, round(-s, 4), mine.get(other, 0)) for s, other in best]
+    popular = sorted(known, key=lambda c: (-counts[c], c))[:cfg['RECOMMEND_TOP_K']]
+    return related, popular
+
+
+class Recommender:
+    """Related courses and per-student suggestions from an in-memory index.
+
+    The index combines two signals: shared tags (idf-weighted, so a rare
+    tag says more than one on half the catalog) and co-enrollment
+    (students who took one course also took the other). It is built from
+    one read of the course tags and the enrollment pairs, with NumPy/SciPy
+    sparse products when they are installed, and keeps the best
+    `RECOMMEND_TOP_K` related courses of every course, so a request is a
+    dictionary lookup instead of a join over the enrollment table.
+
+    Each process builds its index on first use and rebuilds it in a
+    background thread, serving the old one meanwhile, once it is older
+    than `RECOMMEND_REFRESH_INTERVAL` seconds and the catalog or its
+    enrollment counts (see catalog_cache.py) have moved. Courses added
+    since the last build are matched by their tags through the inverted
+    index.
+    """
+
+    def __init__(self, app=None, db=None, course_model=None, enrollment_model=None, cache=None):
+        self.app = None
+        self.db = None
+        self.course_model = None
+        self.enrollment_model = None
+        self.cache = None
+        self._index = None
+        self._build_lock = threading.Lock()
+        self._refreshing = False
+        if app is not None:
+            self.init_app(app, db, course_model, enrollment_model, cache)
+
+    def init_app(self, app, db, course_model, enrollment_model, cache):
+        self.app = app
+        self.db = db
+        self.course_model = course_model
+        self.enrollment_model = enrollment_model
+        self.cache = cache
+        cfg = app.config
+        cfg.setdefault('RECOMMEND_TOP_K', int(os.environ.get('RECOMMEND_TOP_K', 20)))
+        cfg.setdefault('RECOMMEND_TAG_WEIGHT', float(os.environ.get('RECOMMEND_TAG_WEIGHT', 0.5)))
+        cfg.setdefault('RECOMMEND_MIN_SHARED', int(os.environ.get('RECOMMEND_MIN_SHARED', 1)))
+        cfg.setdefault('RECOMMEND_REFRESH_INTERVAL', float(os.environ.get('RECOMMEND_REFRESH_INTERVAL', 60)))
+        cfg.setdefault('RECOMMEND_BLOCK_CELLS', int(os.environ.get('RECOMMEND_BLOCK_CELLS', 4 * 1024 * 1024)))
+        cfg.setdefault('RECOMMEND_SPARSE', os.environ.get('RECOMMEND_SPARSE', '1') not in ('0', 'false', 'False'))
+
+    # Building
+
+    def build(self):
+        """Read the catalog and enrollments and build a fresh index."""
+        started = time.perf_counter()
+        cfg = self.app.config
+        Course, Enrollment = self.course_model, self.enrollment_model
+        # Read first: a change committed while loading makes the index look
+        # older than it is, which only costs an extra rebuild.
+        version = self.cache.versions()
+        session = self.db.session
+        courses = [(course_id, course_tags(tags)) for course_id, tags in
+                   session.query(Course.id, Course.tags).order_by(Course.id)]
+        # Core rather than session.execute: no ORM row processing for what
+        # can be millions of pairs. Core also skips the ORM's deleted-row
+        # filter, hence the where().
+        pairs = session.connection().execute(self.db.select(Enrollment.student_id, Enrollment.course_id)
+                                             .where(Enrollment.deleted_at.is_(None))
+                                             .execution_options(yield_per=10000))
+        postings, idf, norms = _tag_weights(courses)
+        sparse = cfg['RECOMMEND_SPARSE']
+        if sparse:
+            try:
+                import scipy.sparse  # noqa: F401
+            except ImportError:
+                sparse = False
+        if sparse:
+            related, popular = _build_sparse(courses, pairs, cfg, idf)
+        else:
+            related, popular = _build_python(courses, pairs, cfg, postings, idf, norms)
+        index = _Index(version, related, postings, idf, norms, popular)
+        index.build_ms = (time.perf_counter() - started) * 1000
+        return index
+
+    def index(self):
+        """The current index, built on first use in this process."""
+        index = self._index
+        if index is None:
+            with self._build_lock:
+                if self._index is None:
+                    self._index = self.build()
+                return self._index
+        if (time.monotonic() - index.built_at >= self.app.config['RECOMMEND_REFRESH_INTERVAL']
+                and not self._refreshing and self.cache.versions() != index.version):
+            self._refresh_in_background()
+        return index
+
+    def _refresh_in_background(self):
+        with self._build_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name='recommendations', daemon=True).start()
+
+    def _refresh(self):
+        try:
+            with self.app.app_context():
+                index = self.build()
+            self._index = index
+            log.info("Rebuilt the recommendation index in %.0fms", index.build_ms)
+        except Exception:
+            # Keep serving the old index; try again after another interval.
+            log.exception("Could not rebuild the recommendation index")
+            self._index.built_at = time.monotonic()
+        finally:
+            self._refreshing = False
+
+    # Lookups
+
+    def related(self, course_id, tags, limit):
+        """[(course id, score, shared students)] for a course, best first.
+
+        `tags` are the course's current tags, used when the course is newer
+        than the index.
+        """
+        index = self.index()
+        if course_id in index.related:
+            return index.related[course_id][:limit]
+        tags = [t for t in tags if t in index.idf]
+        length = math.sqrt(sum(index.idf[t] ** 2 for t in tags))
+        scores = defaultdict(float)
+        for tag in tags:
+            for other in index.postings[tag]:
+                if other != course_id:
+                    scores[other] += index.idf[tag] ** 2 / (length * index.norms[other])
+        weight = self.app.config['RECOMMEND_TAG_WEIGHT']
+        best = heapq.nsmallest(limit, ((-s, other) for other, s in scores.items()))
+        return [(other, round(-s * weight, 4), 0) for s, other in best]
+
+    def recommended(self, enrolled, limit):
+        """[(course id, score, [enrolled course ids it came from])] for a
+        student taking `enrolled`, topped up with popular courses."""
+        index = self.index()
+        enrolled = set(enrolled)
+        scores = defaultdict(float)
+        because = defaultdict(list)
+        for course_id in sorted(enrolled):
+            for other, score, _ in index.related.get(course_id, ()):
+                if other not in enrolled:
+                    scores[other] += score
+                    because[other].append(course_id)
+        best = heapq.nsmallest(limit, ((-s, other) for other, s in scores.items()))
+        picks = [(other, round(-s, 4), because[other]) for s, other in best]
+        for other in index.popular:
+            if len(picks) >= limit:
+                break
+            if other not in enrolled and other not in scores:
+                picks.append((other, 0.0, []))
+        return picks
+
+    def stats(self):
+        index = self._index
+        if index is None:
+            return None
+        return {"version": index.version, "courses": len(index.related), "tags": len(index.postings),
+                "build_ms": round(index.build_ms, 1), "age_s": round(time.monotonic() - index.built_at, 1)}
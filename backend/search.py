@@ -0,0 +1,112 @@
+import json
+import re
+
+import sqlalchemy as sa
+
+from pagination import PaginationError, decode_cursor, encode_cursor
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+KINDS = ('course', 'faculty')
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+# bm25 column weights: a hit in a title or name counts for more than one in
+# tags or a bio. Lower bm25 scores are better matches.
+_FTS_QUERIES = {
+    'course': (
+        "SELECT 'course' AS kind, c.id AS id, bm25(course_fts, 10.0, 5.0, 2.0) AS score,"
+        " c.title AS title, c.instructor AS detail, c.tags AS tags"
+        " FROM course_fts JOIN course c ON c.id = course_fts.rowid"
+        " WHERE course_fts MATCH :match AND c.deleted_at IS NULL"
+    ),
+    'faculty': (
+        "SELECT 'faculty' AS kind, f.id AS id, bm25(faculty_fts, 10.0, 5.0, 1.0) AS score,"
+        " f.name AS title, f.role AS detail, NULL AS tags"
+        " FROM faculty_fts JOIN faculty_member f ON f.id = faculty_fts.rowid"
+        " WHERE faculty_fts MATCH :match AND f.deleted_at IS NULL"
+    ),
+}
+
+# Deleted rows stay in the FTS index until the purge removes them.
+
+# Unranked substring fallback for databases without FTS5.
+_LIKE_QUERIES = {
+    'course': (
+        "SELECT 'course' AS kind, c.id AS id, CAST(0 AS FLOAT) AS score,"
+        " c.title AS title, c.instructor AS detail, c.tags AS tags"
+        " FROM course c WHERE c.deleted_at IS NULL AND {where}"
+    ),
+    'faculty': (
+        "SELECT 'faculty' AS kind, f.id AS id, CAST(0 AS FLOAT) AS score,"
+        " f.name AS title, f.role AS detail, NULL AS tags"
+        " FROM faculty_member f WHERE f.deleted_at IS NULL AND {where}"
+    ),
+}
+_LIKE_COLUMNS = {'course': ('c.title', 'c.instructor', 'c.tags'), 'faculty': ('f.name', 'f.role', 'f.bio')}
+
+
+def match_expression(q):
+    """Turn free text into an FTS5 query: every word must match, as a prefix.
+
+    Words are quoted so user input can never be parsed as FTS5 syntax.
+    """
+    tokens = _TOKEN.findall(q or '')
+    if not tokens:
+        raise PaginationError("q must contain at least one word")
+    return ' '.join(f'"{token}"*' for token in tokens[:16])
+
+
+def _like_sql(kind, tokens, params):
+    clauses = []
+    for i, token in enumerate(tokens):
+        params[f't{i}'] = f'%{token.lower()}%'
+        clauses.append('(' + ' OR '.join(f'LOWER({col}) LIKE :t{i}' for col in _LIKE_COLUMNS[kind]) + ')')
+    return _LIKE_QUERIES[kind].format(where=' AND '.join(clauses))
+
+
+def search(conn, args):
+    """Ranked search over courses and faculty. Returns (items, next_cursor)."""
+    q = args.get('q', '')
+    match = match_expression(q)
+    kinds = [args['type']] if args.get('type') else list(KINDS)
+    if any(kind not in KINDS for kind in kinds):
+        raise PaginationError(f"type must be one of {', '.join(KINDS)}")
+    try:
+        limit = min(max(int(args.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+
+    params = {'match': match, 'limit': limit + 1}
+    if conn.dialect.name == 'sqlite':
+        parts = [_FTS_QUERIES[kind] for kind in kinds]
+    else:
+        tokens = _TOKEN.findall(q)[:16]
+        parts = [_like_sql(kind, tokens, params) for kind in kinds]
+    sql = 'SELECT * FROM (' + ' UNION ALL '.join(parts) + ') AS hits'
+
+    # Keyset over (score, kind, id), same cursor format as the list endpoints.
+    sort = 'search:' + ','.join(kinds)
+    if args.get('after'):
+        score, kind, row_id = decode_cursor(args['after'], sort)
+        sql += (' WHERE score > :score OR (score = :score AND kind > :kind)'
+                ' OR (score = :score AND kind = :kind AND id > :row_id)')
+        params.update(score=score, kind=kind, row_id=row_id)
+    sql += ' ORDER BY score, kind, id LIMIT :limit'
+
+    rows = conn.execute(sa.text(sql), params).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, [last.score, last.kind, last.id])
+
+    items = []
+    for row in rows:
+        if row.kind == 'course':
+            items.append({"type": "course", "id": row.id, "title": row.title, "instructor": row.detail,
+                          "tags": json.loads(row.tags) if row.tags else [], "score": row.score})
+        else:
+            items.append({"type": "faculty", "id": row.id, "name": row.title, "role": row.detail,
+                          "score": row.score})
+    return items, next_cursor
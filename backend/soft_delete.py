@@ -0,0 +1,234 @@
+import logging
+import os
+import threading
+import time
+
+from flask import g
+from sqlalchemy import delete, event, func, select, text
+from sqlalchemy.orm import with_loader_criteria
+
+from sqlite_profile import write_intent
+
+log = logging.getLogger(__name__)
+
+
+def hide_deleted(session, models):
+    """Leave rows with `deleted_at` set out of every ORM SELECT of `models`,
+    including joins and relationship loads. Pass
+    `execution_options(include_deleted=True)` to see them. Core statements
+    and bulk UPDATE/DELETE are not filtered; they say so themselves."""
+    def active(cls):
+        return cls.deleted_at.is_(None)
+
+    options = [with_loader_criteria(model, active, include_aliases=True) for model in models]
+
+    def add_criteria(state):
+        if state.is_select and not state.execution_options.get('include_deleted', False):
+            state.statement = state.statement.options(*options)
+
+    event.listen(session, 'do_orm_execute', add_criteria)
+
+
+class Purger:
+    """Hard-deletes soft-deleted rows in the background.
+
+    A delete only sets `deleted_at`, which hides the row at once (see
+    hide_deleted), so the request stays short however much depends on the
+    row. A worker thread (one per process) later removes the rows, one
+    small batch per transaction, and only once the process has served no
+    request for `PURGE_QUIET` seconds (or has waited `PURGE_MAX_WAIT`), so
+    a large delete never holds the SQLite write lock for long. On SQLite
+    with incremental auto-vacuum it then hands the freed pages back to the
+    file system in steps of the same kind.
+
+    `models` are purged in order, so list rows before what they refer to.
+    """
+
+    def __init__(self, app=None, db=None, models=()):
+        self.app = None
+        self.db = None
+        self.models = []
+        self._active = 0
+        self._last_request = 0.0
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db, models)
+
+    def init_app(self, app, db, models):
+        self.app = app
+        self.db = db
+        self.models = list(models)
+        cfg = app.config
+        # Seconds a deleted row is kept before it may be purged
+        cfg.setdefault('PURGE_AFTER', float(os.environ.get('PURGE_AFTER', 0)))
+        cfg.setdefault('PURGE_BATCH_SIZE', int(os.environ.get('PURGE_BATCH_SIZE', 500)))
+        cfg.setdefault('PURGE_VACUUM_PAGES', int(os.environ.get('PURGE_VACUUM_PAGES', 1000)))
+        cfg.setdefault('PURGE_PAUSE', float(os.environ.get('PURGE_PAUSE', 0.05)))
+        cfg.setdefault('PURGE_QUIET', float(os.environ.get('PURGE_QUIET', 1.0)))
+        cfg.setdefault('PURGE_MAX_WAIT', float(os.environ.get('PURGE_MAX_WAIT', 60)))
+        cfg.setdefault('PURGE_POLL_INTERVAL', float(os.environ.get('PURGE_POLL_INTERVAL', 300)))
+        # "thread" purges from every web process, "external" leaves it to a
+        # separate `python soft_delete.py` and "off" to `flask purge-deleted`.
+        cfg.setdefault('PURGE_WORKER', os.environ.get('PURGE_WORKER', 'thread'))
+        app.before_request(self._request_started)
+        app.after_request(self._request_finished)
+
+    # Request activity, for finding quiet periods
+
+    def _request_started(self):
+        self.autostart()
+        g.purge_counted = True
+        with self._lock:
+            self._active += 1
+            self._last_request = time.monotonic()
+
+    def _request_finished(self, response):
+        # Streamed bodies (the event stream) count as finished here.
+        if g.pop('purge_counted', False):
+            with self._lock:
+                self._active -= 1
+                self._last_request = time.monotonic()
+        return response
+
+    def _wait_for_quiet(self):
+        cfg = self.app.config
+        give_up_at = time.monotonic() + cfg['PURGE_MAX_WAIT']
+        while not self._stopping.is_set():
+            now = time.monotonic()
+            with self._lock:
+                quiet_for = now - self._last_request if not self._active else 0.0
+            if quiet_for >= cfg['PURGE_QUIET'] or now >= give_up_at:
+                return
+            self._stopping.wait(min(cfg['PURGE_QUIET'] - quiet_for, give_up_at - now))
+
+    # Worker
+
+    def autostart(self):
+        """Start this process's worker if PURGE_WORKER=thread; it also picks
+        up rows left by a process that exited."""
+        if self._pid != os.getpid() and self.app.config['PURGE_WORKER'] == 'thread' \
+                and not self.app.config.get('DATABASE_READ_ONLY'):
+            self.start()
+
+    def wake(self):
+        """Nudge the worker after a delete commits."""
+        self._wakeup.set()
+
+    def start(self):
+        # Threads do not survive fork(); see MailQueue.start.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self.run_forever, name='purge', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_forever(self):
+        cfg = self.app.config
+        while not self._stopping.is_set():
+            self._wakeup.clear()
+            try:
+                done = self.step(wait_for_quiet=True)
+            except Exception:
+                log.exception("Purge step failed")
+                done = None
+            if done:
+                self._stopping.wait(cfg['PURGE_PAUSE'])
+                continue
+            self._wakeup.wait(cfg['PURGE_POLL_INTERVAL'])
+
+    def step(self, wait_for_quiet=False):
+        """Purge one batch, or else vacuum one step. Returns what was done,
+        e.g. ('course', 500) or ('vacuum', 1000 pages), or None."""
+        with self.app.app_context():
+            session = self.db.session
+            for model in self.models:
+                ids = self._due(model)
+                if ids:
+                    if wait_for_quiet:
+                        self._wait_for_quiet()
+                    return model.__tablename__, self._purge(model, ids)
+            pages = self._free_pages()
+            session.rollback()
+            if pages:
+                if wait_for_quiet:
+                    self._wait_for_quiet()
+                return 'vacuum', self._vacuum(min(pages, self.app.config['PURGE_VACUUM_PAGES']))
+            return None
+
+    def drain(self):
+        """Purge and vacuum everything due now, without waiting for quiet
+        periods (`flask purge-deleted`). Returns rows purged per table."""
+        purged = {}
+        while True:
+            done = self.step()
+            if done is None:
+                return purged
+            purged[done[0]] = purged.get(done[0], 0) + done[1]
+
+    def pending(self):
+        with self.app.app_context():
+            counts = {model.__tablename__: self.db.session.execute(
+                select(func.count()).select_from(model.__table__).where(model.__table__.c.deleted_at.isnot(None))).scalar()
+                for model in self.models}
+            self.db.session.rollback()
+            return counts
+
+    def _due(self, model):
+        table = model.__table__
+        cutoff = time.time() - self.app.config['PURGE_AFTER']
+        # Read outside the write transaction; purged rows never come back.
+        ids = [row_id for (row_id,) in self.db.session.execute(
+            select(table.c.id).where(table.c.deleted_at <= cutoff)
+            .order_by(table.c.deleted_at).limit(self.app.config['PURGE_BATCH_SIZE']))]
+        self.db.session.rollback()
+        return ids
+
+    def _purge(self, model, ids):
+        table = model.__table__
+        with write_intent():
+            deleted = self.db.session.execute(
+                delete(table).where(table.c.id.in_(ids), table.c.deleted_at.isnot(None))).rowcount
+            self.db.session.commit()
+        return deleted
+
+    def _vacuum(self, pages):
+        with write_intent():
+            # executescript() steps the pragma to completion; execute() would
+            # free a single page. It commits the empty BEGIN IMMEDIATE first,
+            # which was only there to wait for our turn to write.
+            self.db.session.connection().connection.driver_connection.executescript(
+                f"PRAGMA incremental_vacuum({int(pages)})")
+            self.db.session.commit()
+        return pages
+
+    def _free_pages(self):
+        # Only SQLite files created with (or converted to) incremental
+        # auto-vacuum can shrink a step at a time; see `flask vacuum-db`.
+        session = self.db.session
+        if self.db.engine.dialect.name != 'sqlite':
+            return 0
+        if session.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+            return 0
+        return session.execute(text("PRAGMA freelist_count")).scalar()
+
+
+if __name__ == "__main__":
+    # Dedicated purge process, for PURGE_WORKER=external. It cannot see the
+    # web processes' requests, so it only keeps to small batches.
+    logging.basicConfig(level=logging.INFO)
+    from app import purger
+    purger.run_forever()
@@ -0,0 +1,160 @@
+import contextlib
+import contextvars
+import os
+import threading
+
+from flask import current_app, has_request_context, jsonify, request
+from sqlalchemy import event
+
+try:
+    import fcntl
+except ImportError:  # Windows: the single-writer lock is per process only
+    fcntl = None
+
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+_write_intent = contextvars.ContextVar('sqlite_write_intent', default=False)
+
+
+@contextlib.contextmanager
+def write_intent():
+    """Mark transactions started in this block as writes (BEGIN IMMEDIATE).
+
+    Requests get this automatically from their HTTP method; background
+    jobs that write should wrap their work in it.
+    """
+    token = _write_intent.set(True)
+    try:
+        yield
+    finally:
+        _write_intent.reset(token)
+
+
+def read_only(view):
+    """Mark a non-GET view that never writes (e.g. login) so it does not
+    take the write lock."""
+    view.sqlite_read_only = True
+    return view
+
+
+def _is_write():
+    if _write_intent.get():
+        return True
+    if not has_request_context() or request.method in READ_METHODS:
+        return False
+    view = current_app.view_functions.get(request.endpoint)
+    return not getattr(view, 'sqlite_read_only', False)
+
+
+class _WriterLock:
+    """Hands out the write slot one transaction at a time, across threads
+    and (via flock on a side file) across gunicorn worker processes.
+
+    Waiters block in the kernel instead of spinning in SQLite's busy
+    handler, which is what produces the multi-second "database is locked"
+    tail under concurrent writes.
+    """
+
+    def __init__(self, path):
+        self._thread_lock = threading.Lock()
+        self._path = path
+        self._fd = None
+        self._pid = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if fcntl is None:
+            return
+        try:
+            if self._fd is None or self._pid != os.getpid():
+                self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+                self._pid = os.getpid()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except Exception:
+            self._thread_lock.release()
+            raise
+
+    def release(self):
+        if fcntl is not None and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+
+def init_app(app, engine):
+    """Apply the SQLite performance profile to `engine`.
+
+    SQLITE_PROFILE=wal (default) switches to WAL with synchronous=NORMAL,
+    memory-mapped reads and a larger page cache, and starts write
+    transactions with BEGIN IMMEDIATE so they queue for the write lock up
+    front instead of failing to upgrade a read lock mid-transaction.
+    New files get incremental auto-vacuum (SQLITE_AUTO_VACUUM).
+    SQLITE_PROFILE=legacy keeps the driver defaults.
+
+    With DATABASE_READ_ONLY (a snapshot opened in place) the journal
+    pragmas are left alone, every transaction is a plain BEGIN and
+    requests that would write are refused with a 503.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    cfg = app.config
+    read_only_db = cfg.get('DATABASE_READ_ONLY', False)
+    if read_only_db:
+        @app.before_request
+        def refuse_writes():
+            if _is_write():
+                return jsonify({"message": "This server is serving a read-only snapshot"}), 503
+
+    cfg.setdefault('SQLITE_PROFILE', os.environ.get('SQLITE_PROFILE', 'wal'))
+    cfg.setdefault('SQLITE_SYNCHRONOUS', os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'))
+    cfg.setdefault('SQLITE_MMAP_SIZE', int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)))
+    cfg.setdefault('SQLITE_CACHE_SIZE', int(os.environ.get('SQLITE_CACHE_SIZE', -64000)))  # KiB when negative
+    cfg.setdefault('SQLITE_TEMP_STORE', os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'))
+    # Takes effect only on a new, empty file (or after `flask vacuum-db`);
+    # lets soft_delete.Purger shrink the file a few pages at a time.
+    cfg.setdefault('SQLITE_AUTO_VACUUM', os.environ.get('SQLITE_AUTO_VACUUM', 'INCREMENTAL'))
+    cfg.setdefault('SQLITE_SINGLE_WRITER', os.environ.get('SQLITE_SINGLE_WRITER', '0') not in ('0', 'false', 'False'))
+    if cfg['SQLITE_PROFILE'] == 'legacy':
+        return
+
+    pragmas = [
+        f"PRAGMA mmap_size={int(cfg['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size={int(cfg['SQLITE_CACHE_SIZE'])}",
+        f"PRAGMA temp_store={cfg['SQLITE_TEMP_STORE']}",
+    ]
+    if not read_only_db:
+        # auto_vacuum before journal_mode: switching to WAL initialises the file
+        pragmas[:0] = [f"PRAGMA auto_vacuum={cfg['SQLITE_AUTO_VACUUM']}", "PRAGMA journal_mode=WAL",
+                       f"PRAGMA synchronous={cfg['SQLITE_SYNCHRONOUS']}"]
+    writer_lock = None
+    if cfg['SQLITE_SINGLE_WRITER'] and not read_only_db and engine.url.database not in (None, '', ':memory:'):
+        writer_lock = _WriterLock(engine.url.database + '.write-lock')
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        # Let SQLAlchemy's begin event below issue BEGIN itself; pysqlite's
+        # implicit BEGIN is always DEFERRED.
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def on_begin(conn):
+        if read_only_db or not _is_write():
+            conn.exec_driver_sql("BEGIN")
+            return
+        if writer_lock is not None and not conn.info.get('holds_writer_lock'):
+            writer_lock.acquire()
+            conn.info['holds_writer_lock'] = True
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    if writer_lock is None:
+        return
+
+    # Released only once the connection is back in the pool, i.e. after the
+    # COMMIT or ROLLBACK has actually finished.
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        if connection_record.info.pop('holds_writer_lock', False):
+            writer_lock.release()
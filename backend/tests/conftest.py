@@ -0,0 +1,121 @@
+"""Fixtures that run every test against SQLite and PostgreSQL.
+
+The `dialect` fixture is parameterized, so each test runs once per
+database. PostgreSQL comes from TEST_POSTGRES_URL (any database on the
+server; tests create and drop their own), or else from a throwaway
+server started with the `pgserver` package. Without either, the
+PostgreSQL runs are skipped. TEST_DIALECTS=sqlite limits the run to one.
+"""
+import importlib
+import os
+import sys
+import uuid
+
+import pytest
+import sqlalchemy as sa
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# No background threads, metrics files or generated secrets during tests.
+os.environ.update({"MAIL_WORKER": "external", "PURGE_WORKER": "off", "METRICS_ENABLED": "0",
+                   "SECRET_KEY": "test-secret", "LOGIN_IP_BURST": "1000", "LOGIN_ACCOUNT_BURST": "1000"})
+
+DIALECTS = [d for d in os.environ.get("TEST_DIALECTS", "sqlite,postgresql").split(",") if d]
+
+
+@pytest.fixture(scope="session")
+def postgres_server(tmp_path_factory):
+    """SQLAlchemy URL of a database on a PostgreSQL server we may create
+    databases on."""
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if url:
+        return sa.make_url(url.replace("postgres://", "postgresql://", 1)).set(drivername="postgresql+psycopg")
+    try:
+        import pgserver
+    except ImportError:
+        pytest.skip("PostgreSQL unavailable: set TEST_POSTGRES_URL or pip install pgserver")
+    server = pgserver.get_server(tmp_path_factory.mktemp("pgdata"), cleanup_mode="stop")
+    return sa.make_url(server.get_uri("postgres")).set(drivername="postgresql+psycopg")
+
+
+@pytest.fixture(scope="session", params=DIALECTS)
+def dialect(request):
+    return request.param
+
+
+@pytest.fixture(scope="session")
+def new_database(dialect, request, tmp_path_factory):
+    """Factory for empty databases of the current dialect; returns a URL."""
+    if dialect == "sqlite":
+        def create():
+            return "sqlite:///" + str(tmp_path_factory.mktemp("db") / "portal.db")
+        return create
+
+    server = request.getfixturevalue("postgres_server")
+    admin = sa.create_engine(server, isolation_level="AUTOCOMMIT")
+    created = []
+
+    def create():
+        name = "portal_test_" + uuid.uuid4().hex[:12]
+        with admin.connect() as conn:
+            conn.execute(sa.text(f'CREATE DATABASE "{name}"'))
+        created.append(name)
+        return server.set(database=name).render_as_string(hide_password=False)
+
+    def drop_all():
+        with admin.connect() as conn:
+            for name in created:
+                conn.execute(sa.text(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)'))
+        admin.dispose()
+
+    request.addfinalizer(drop_all)
+    return create
+
+
+@pytest.fixture
+def engine(new_database):
+    """An engine on a new, empty database."""
+    engine = sa.create_engine(new_database())
+    yield engine
+    engine.dispose()
+
+
+def load_app(database_url):
+    """Import a fresh copy of the app against `database_url`. app.py reads
+    its configuration at import, so every backend module is re-imported."""
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if path and os.path.dirname(os.path.abspath(path)) == BACKEND_DIR:
+            del sys.modules[name]
+    os.environ["DATABASE_URL"] = database_url
+    return importlib.import_module("app")
+
+
+@pytest.fixture(scope="session")
+def portal(new_database, tmp_path_factory):
+    """The app module, migrated and seeded, shared by a session's tests."""
+    os.environ["MEDIA_DIR"] = str(tmp_path_factory.mktemp("media"))
+    module = load_app(new_database())
+    module.init_db()
+    yield module
+    with module.app.app_context():
+        module.db.engine.dispose()
+
+
+@pytest.fixture
+def client(portal):
+    return portal.app.test_client()
+
+
+@pytest.fixture
+def admin(portal):
+    # The first seeded user is the admin
+    with portal.app.app_context():
+        return {"Authorization": "Bearer " + portal.token_auth.issue(1, "admin")}
+
+
+@pytest.fixture
+def unique():
+    """A short suffix for names that must not clash across tests."""
+    return uuid.uuid4().hex[:8]
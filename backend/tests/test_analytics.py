@@ -0,0 +1,22 @@
+def analytics(client, **params):
+    return client.get("/api/faculty/analytics", query_string=params).get_json()
+
+
+def test_instructors_without_courses_are_not_ranked(client, admin, unique):
+    instructor = f"Leaving {unique}"
+    resp = client.post("/api/courses", json={"title": f"Last {unique}", "instructor": instructor}, headers=admin)
+    course_id = resp.get_json()["course"]["id"]
+    assert analytics(client, instructor=instructor)["weekly_ranking"] >= 1
+    assert client.delete(f"/api/courses/{course_id}", headers=admin).status_code == 200
+    mine = analytics(client, instructor=instructor)
+    assert mine["weekly_ranking"] is None and mine["total_courses"] == 0
+    assert instructor not in [p["name"] for p in analytics(client)["peer_ratings"]]
+
+
+def test_zeroed_instructors_do_not_fill_the_peer_list(client, portal, unique):
+    with portal.app.app_context():
+        portal.db.session.add(portal.InstructorStats(instructor=f"Ghost {unique}", course_count=0,
+                                                     student_count=10 ** 6, rating_sum=0.0, avg_rating=10.0))
+        portal.db.session.commit()
+    everyone = analytics(client)
+    assert f"Ghost {unique}" not in [p["name"] for p in everyone["peer_ratings"]]
@@ -0,0 +1,118 @@
+import base64
+import json
+
+import pytest
+from flask import Flask
+
+from auth import load_secret
+
+# Needs faculty or admin; a missing course is 404 once the role check passed
+FACULTY_ONLY = "/api/courses/999999999"
+
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def signup(client, unique, name="Tester"):
+    resp = client.post("/api/signup", json={"name": name, "email": f"{name.lower()}.{unique}@example.com",
+                                            "password": "correct horse"})
+    assert resp.status_code == 201
+    return resp.get_json()["token"]
+
+
+def login(client, unique, name="Tester"):
+    resp = client.post("/api/login", json={"email": f"{name.lower()}.{unique}@example.com",
+                                           "password": "correct horse"})
+    assert resp.status_code == 200
+    return resp.get_json()["token"]
+
+
+def claims(portal, token):
+    with portal.app.app_context():
+        return portal.token_auth.verify(token)
+
+
+def test_valid_token_passes(client, admin):
+    assert client.delete(FACULTY_ONLY, headers=admin).status_code == 404
+
+
+def test_missing_token_is_401(client):
+    resp = client.delete(FACULTY_ONLY)
+    assert resp.status_code == 401 and resp.headers["WWW-Authenticate"] == "Bearer"
+
+
+def test_expired_token_is_401(client, portal, monkeypatch):
+    monkeypatch.setitem(portal.app.config, "AUTH_TOKEN_TTL", -1)
+    with portal.app.app_context():
+        token = portal.token_auth.issue(1, "admin")
+    resp = client.delete(FACULTY_ONLY, headers=bearer(token))
+    assert resp.status_code == 401 and resp.get_json()["message"] == "Token has expired"
+
+
+@pytest.mark.parametrize("part", ["payload", "signature"])
+def test_tampered_token_is_401(client, unique, part):
+    header, payload, signature = signup(client, unique).split(".")
+    if part == "payload":
+        forged = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        forged["role"] = "admin"
+        payload = base64.urlsafe_b64encode(json.dumps(forged).encode()).rstrip(b"=").decode()
+    else:
+        signature = ("A" if signature[0] != "A" else "B") + signature[1:]
+    resp = client.delete(FACULTY_ONLY, headers=bearer(f"{header}.{payload}.{signature}"))
+    assert resp.status_code == 401 and resp.get_json()["message"] == "Invalid token"
+
+
+def test_wrong_role_is_403(client, unique):
+    # A faculty-looking address no longer grants anything at signup
+    resp = client.post("/api/signup", json={"name": "Eve", "email": f"eve.faculty@{unique}.example.com",
+                                            "password": "correct horse"})
+    assert resp.get_json()["user"]["role"] == "student"
+    assert client.delete(FACULTY_ONLY, headers=bearer(resp.get_json()["token"])).status_code == 403
+
+
+def test_logout_revokes_that_token_only(client, unique):
+    first, second = signup(client, unique), login(client, unique)
+    assert client.post("/api/logout", headers=bearer(first)).status_code == 200
+    resp = client.post("/api/logout", headers=bearer(first))
+    assert resp.status_code == 401 and resp.get_json()["message"] == "Token has been revoked"
+    assert client.post("/api/logout", headers=bearer(second)).status_code == 200
+
+
+def test_role_change_revokes_older_tokens(client, portal, admin, unique):
+    old = signup(client, unique)
+    user_id = claims(portal, old)["sub"]
+    resp = client.put(f"/api/users/{user_id}/role", json={"role": "faculty"}, headers=admin)
+    assert resp.status_code == 200 and resp.get_json()["role"] == "faculty"
+    assert client.delete(FACULTY_ONLY, headers=bearer(old)).status_code == 401
+
+    new = login(client, unique)
+    assert claims(portal, new)["role"] == "faculty"
+    assert client.delete(FACULTY_ONLY, headers=bearer(new)).status_code == 404
+
+
+def test_delete_revokes_older_tokens(client, portal, admin, unique):
+    token = signup(client, unique)
+    user_id = claims(portal, token)["sub"]
+    assert client.delete(f"/api/users/{user_id}", headers=admin).status_code == 200
+    assert client.post("/api/logout", headers=bearer(token)).status_code == 401
+    # Tokens issued afterwards to the same id are not affected
+    with portal.app.app_context():
+        later = portal.token_auth.issue(user_id, "student")
+    assert client.post("/api/logout", headers=bearer(later)).status_code == 200
+
+
+def test_unwritable_instance_folder_logs_and_uses_a_process_key(monkeypatch, tmp_path, caplog):
+    monkeypatch.delenv("SECRET_KEY")
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    app = Flask("secret_test", instance_path=str(blocker / "instance"))
+    assert len(load_secret(app)) == 64
+    assert "SECRET_KEY is not set" in caplog.text
+
+
+@pytest.mark.parametrize("path", ["/api/students", "/api/students/1", "/api/contact-messages"])
+def test_personal_data_needs_an_admin(client, admin, unique, path):
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers=bearer(signup(client, unique))).status_code == 403
+    assert client.get(path, headers=admin).status_code in (200, 404)
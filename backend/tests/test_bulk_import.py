@@ -0,0 +1,125 @@
+import functools
+import json
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+
+@pytest.fixture
+def course(client, admin, unique):
+    resp = client.post("/api/courses", json={"title": f"Bulk {unique}", "instructor": "B"}, headers=admin)
+    return resp.get_json()["course"]
+
+
+def bulk(client, admin, kind, rows, fmt="json"):
+    if fmt == "json":
+        return client.post(f"/api/bulk/{kind}", json=rows, headers=admin)
+    if fmt == "ndjson":
+        body = "".join(json.dumps(row) + "\n" for row in rows)
+        return client.post(f"/api/bulk/{kind}", data=body, content_type="application/x-ndjson", headers=admin)
+    return client.post(f"/api/bulk/{kind}", data=rows, content_type="text/csv", headers=admin)
+
+
+def enrolled(portal, course_id):
+    """Emails enrolled in a course, and its stored student count."""
+    with portal.app.app_context():
+        emails = [email for (email,) in portal.db.session.query(portal.Student.email)
+                  .join(portal.Enrollment).filter(portal.Enrollment.course_id == course_id)
+                  .order_by(portal.Student.email)]
+        return emails, portal.db.session.get(portal.Course, course_id).students
+
+
+def student_exists(portal, email):
+    with portal.app.app_context():
+        return portal.Student.query.filter_by(email=email).first() is not None
+
+
+@pytest.mark.parametrize("fmt", ["json", "ndjson"])
+def test_successful_batch(client, admin, portal, course, unique, fmt):
+    rows = [{"name": f"S{n}", "email": f"s{n}.{unique}@example.com", "course_id": course["id"], "progress": "40%"}
+            for n in range(3)]
+    report = bulk(client, admin, "students", rows, fmt).get_json()
+    assert report == {"received": 3, "inserted": 3, "failed": 0, "errors": []}
+    assert enrolled(portal, course["id"]) == ([f"s{n}.{unique}@example.com" for n in range(3)], 3)
+
+
+def test_csv_rows_by_course_title(client, admin, portal, course, unique):
+    body = f"name,email,course,progress\nAda,ada.{unique}@example.com,{course['title']},85\n"
+    assert bulk(client, admin, "students", body, "csv").get_json()["inserted"] == 1
+    assert enrolled(portal, course["id"])[0] == [f"ada.{unique}@example.com"]
+
+
+def test_rejected_rows_are_reported_by_number_and_leave_nothing_behind(client, admin, portal, course, unique):
+    rows = [
+        {"name": "Good", "email": f"good.{unique}@example.com", "course_id": course["id"]},
+        {"name": "Lost", "email": f"lost.{unique}@example.com", "course_id": 10 ** 9},
+        {"name": "No email"},
+        "not an object",
+        {"name": "Bad", "email": f"bad.{unique}@example.com", "course_id": course["id"], "progress": 101},
+    ]
+    report = bulk(client, admin, "students", rows).get_json()
+    assert (report["received"], report["inserted"], report["failed"]) == (5, 1, 4)
+    assert report["errors"] == [
+        {"row": 2, "error": "Course not found"},
+        {"row": 3, "error": "email is required"},
+        {"row": 4, "error": "Expected an object"},
+        {"row": 5, "error": "progress is out of range"},
+    ]
+    assert enrolled(portal, course["id"]) == ([f"good.{unique}@example.com"], 1)
+    assert not student_exists(portal, f"lost.{unique}@example.com")
+    assert not student_exists(portal, f"bad.{unique}@example.com")
+
+
+def test_duplicate_emails(client, admin, portal, course, unique):
+    email = f"dup.{unique}@example.com"
+    assert bulk(client, admin, "students", [{"name": "D", "email": email, "course_id": course["id"]}]).get_json()["inserted"] == 1
+    rows = [
+        {"name": "D", "email": email.upper(), "course_id": course["id"]},  # emails match case-insensitively
+        {"name": "D", "email": email},  # no course: registering again
+        {"name": "E", "email": f"e.{unique}@example.com", "course_id": course["id"]},
+        {"name": "E", "email": f"e.{unique}@example.com", "course_id": course["id"]},  # twice in one batch
+    ]
+    report = bulk(client, admin, "students", rows).get_json()
+    assert report["errors"] == [
+        {"row": 1, "error": "Student is already enrolled in this course"},
+        {"row": 2, "error": "Student already exists"},
+        {"row": 4, "error": "Student is already enrolled in this course"},
+    ]
+    assert enrolled(portal, course["id"]) == ([email, f"e.{unique}@example.com"], 2)
+
+
+def test_duplicate_course_titles_and_faculty_names(client, admin, course, unique):
+    report = bulk(client, admin, "courses", [{"title": course["title"], "instructor": "X"},
+                                             {"title": f"New {unique}", "instructor": "X"},
+                                             {"title": f"New {unique}", "instructor": "Y"}]).get_json()
+    assert report["inserted"] == 1 and [e["row"] for e in report["errors"]] == [1, 3]
+    report = bulk(client, admin, "faculty", [{"name": f"Prof {unique}"}, {"name": f"Prof {unique}"}]).get_json()
+    assert report["inserted"] == 1 and report["errors"] == [{"row": 2, "error": "Faculty member already exists"}]
+
+
+def test_rows_are_committed_one_chunk_at_a_time(client, admin, portal, course, unique, monkeypatch):
+    monkeypatch.setattr(portal, "run_import", functools.partial(portal.run_import, chunk_size=2))
+    real_import = portal.import_students
+    calls = []
+
+    def second_chunk_conflicts(chunk):
+        calls.append([number for number, _ in chunk])
+        errors = real_import(chunk)
+        if len(calls) == 2:
+            raise IntegrityError("INSERT", {}, Exception("concurrent insert"))
+        return errors
+
+    monkeypatch.setattr(portal, "import_students", second_chunk_conflicts)
+    rows = [{"name": f"C{n}", "email": f"c{n}.{unique}@example.com", "course_id": course["id"]} for n in range(5)]
+    report = bulk(client, admin, "students", rows).get_json()
+    assert calls == [[1, 2], [3, 4], [5]]
+    assert (report["inserted"], report["failed"]) == (3, 2)
+    assert [e["row"] for e in report["errors"]] == [3, 4]
+    assert enrolled(portal, course["id"]) == ([f"c{n}.{unique}@example.com" for n in (0, 1, 4)], 3)
+    assert not student_exists(portal, f"c2.{unique}@example.com")
+
+
+def test_whole_upload_errors(client, admin):
+    assert client.post("/api/bulk/students", data="x", content_type="text/plain", headers=admin).status_code == 400
+    assert client.post("/api/bulk/students", json={"name": "not a list"}, headers=admin).status_code == 400
+    assert client.post("/api/bulk/students", json=[]).status_code == 401
@@ -0,0 +1,44 @@
+import pytest
+
+
+@pytest.fixture
+def course(client, admin, unique):
+    resp = client.post("/api/courses", json={"title": f"Cached {unique}", "instructor": "C"}, headers=admin)
+    return resp.get_json()["course"]
+
+
+def enroll(client, course, email):
+    assert client.post("/api/enroll", json={"name": "S", "email": email, "course_id": course["id"]}).status_code == 201
+
+
+def test_matching_etag_gets_304(client, course):
+    resp = client.get(f"/api/courses/{course['id']}")
+    assert resp.status_code == 200 and resp.headers["ETag"]
+    again = client.get(f"/api/courses/{course['id']}", headers={"If-None-Match": resp.headers["ETag"]})
+    assert again.status_code == 304 and again.headers["ETag"] == resp.headers["ETag"]
+
+
+def test_course_changes_invalidate_at_once(client, admin, course, unique):
+    before = client.get("/api/courses").headers["ETag"]
+    client.post("/api/courses", json={"title": f"Another {unique}", "instructor": "C"}, headers=admin)
+    after = client.get("/api/courses")
+    assert after.headers["ETag"] != before
+    assert f"Another {unique}" in [c["title"] for c in after.get_json()]
+
+
+def test_enrollments_do_not_invalidate_the_catalog(client, course, unique):
+    first = client.get(f"/api/courses/{course['id']}")
+    enroll(client, course, f"a.{unique}@example.com")
+    resp = client.get(f"/api/courses/{course['id']}", headers={"If-None-Match": first.headers["ETag"]})
+    assert resp.status_code == 304
+
+
+def test_counts_catch_up_after_max_age(client, portal, monkeypatch, course, unique):
+    first = client.get(f"/api/courses/{course['id']}")
+    enroll(client, course, f"b.{unique}@example.com")
+    monkeypatch.setitem(portal.app.config, "CATALOG_COUNTS_MAX_AGE", 0)
+    resp = client.get(f"/api/courses/{course['id']}")
+    assert resp.get_json()["students"] == first.get_json()["students"] + 1
+    assert resp.headers["ETag"] != first.headers["ETag"]
+    # Rebuilt with the same counts: same body, same ETag
+    assert client.get(f"/api/courses/{course['id']}").headers["ETag"] == resp.headers["ETag"]
@@ -0,0 +1,81 @@
+import pytest
+
+
+@pytest.fixture
+def course(client, admin, unique):
+    resp = client.post("/api/courses", json={"title": f"Enrolling {unique}", "instructor": f"Teacher {unique}"},
+                       headers=admin)
+    return resp.get_json()["course"]
+
+
+def enroll(client, course, email, name="Student"):
+    return client.post("/api/enroll", json={"name": name, "email": email, "course_id": course["id"]})
+
+
+def entry(client, admin, course, email):
+    entries = client.get("/api/students", query_string={"course_id": course["id"], "email": email},
+                         headers=admin).get_json()
+    return entries[0] if entries else None
+
+
+def student_count(portal, course):
+    # The stored count; the cached catalog may show it up to CATALOG_COUNTS_MAX_AGE late
+    with portal.app.app_context():
+        return portal.db.session.get(portal.Course, course["id"]).students
+
+
+def test_enroll_by_id_and_by_title(client, portal, admin, course, unique):
+    assert enroll(client, course, f"a.{unique}@example.com").status_code == 201
+    resp = client.post("/api/enroll", json={"name": "B", "email": f"b.{unique}@example.com",
+                                            "course_title": course["title"]})
+    assert resp.status_code == 201
+    assert student_count(portal, course) == 2
+    assert entry(client, admin, course, f"a.{unique}@example.com")["progress"] == 0
+
+
+def test_enrolling_twice_is_refused(client, portal, course, unique):
+    assert enroll(client, course, f"twice.{unique}@example.com").status_code == 201
+    assert enroll(client, course, f"TWICE.{unique}@example.com").status_code == 400
+    assert student_count(portal, course) == 1
+
+
+@pytest.mark.parametrize("body, status", [
+    ({"name": "X", "email": "x@example.com"}, 400),
+    ({"name": "X", "email": "x@example.com", "course_id": 10 ** 6}, 404),
+    ({"name": "X", "email": "x@example.com", "course_title": "No such course"}, 404),
+])
+def test_bad_enrollments(client, body, status):
+    assert client.post("/api/enroll", json=body).status_code == status
+
+
+def test_progress_updates_the_histogram(client, admin, course, unique):
+    for n, progress in enumerate((30, 100)):
+        email = f"p{n}.{unique}@example.com"
+        enroll(client, course, email)
+        record = entry(client, admin, course, email)
+        resp = client.patch(f"/api/students/{record['id']}", json={"progress": progress},
+                            headers={**admin, "If-Match": f'"{record["version"]}"'})
+        assert resp.status_code == 200, resp.get_json()
+    stats = client.get(f"/api/courses/{course['id']}/progress-stats").get_json()
+    assert stats["enrolled"] == 2 and stats["completed"] == 1 and stats["average_progress"] == 65
+
+
+def test_delete_and_enroll_again(client, portal, admin, course, unique):
+    email = f"again.{unique}@example.com"
+    enroll(client, course, email)
+    record = entry(client, admin, course, email)
+    assert client.delete(f"/api/students/{record['id']}", headers=admin).status_code == 200
+    assert entry(client, admin, course, email) is None
+    assert client.get(f"/api/students/{record['id']}", headers=admin).status_code == 404
+    assert student_count(portal, course) == 0
+    assert enroll(client, course, email).status_code == 201
+    assert student_count(portal, course) == 1
+
+
+def test_course_delete_takes_its_enrollments(client, admin, portal, course, unique):
+    enroll(client, course, f"gone.{unique}@example.com")
+    assert client.delete(f"/api/courses/{course['id']}", headers=admin).status_code == 200
+    assert client.get("/api/students", query_string={"course_id": course["id"]}, headers=admin).get_json() == []
+    assert enroll(client, course, f"late.{unique}@example.com").status_code == 404
+    purged = portal.purger.drain()
+    assert purged.get("enrollment", 0) >= 1 and purged.get("course", 0) >= 1
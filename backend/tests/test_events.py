@@ -0,0 +1,35 @@
+import json
+
+
+def events_since(portal, last_id):
+    with portal.app.app_context():
+        rows = portal.ChangeEvent.query.filter(portal.ChangeEvent.id > last_id).order_by(portal.ChangeEvent.id)
+        return [(row.kind, json.loads(row.data)) for row in rows]
+
+
+def head(portal):
+    with portal.app.app_context():
+        return portal.db.session.query(portal.db.func.max(portal.ChangeEvent.id)).scalar() or 0
+
+
+def test_enrollment_events_carry_no_personal_data(client, admin, portal, unique):
+    course_id = client.post("/api/courses", json={"title": f"Feed {unique}", "instructor": "F"},
+                            headers=admin).get_json()["course"]["id"]
+    email = f"private.{unique}@example.com"
+    start = head(portal)
+    assert client.post("/api/enroll", json={"name": f"Private {unique}", "email": email,
+                                            "course_id": course_id}).status_code == 201
+    entry = client.get("/api/students", query_string={"email": email}, headers=admin).get_json()[0]
+    resp = client.patch(f"/api/students/{entry['id']}", json={"progress": 50},
+                        headers={**admin, "If-Match": f'"{entry["version"]}"'})
+    assert resp.status_code == 200
+    resp = client.patch("/api/students", json=[{"id": entry["id"], "version": entry["version"] + 1, "progress": 60}],
+                        headers=admin)
+    assert resp.get_json()["updated"] == 1
+
+    events = [(kind, data) for kind, data in events_since(portal, start) if kind.startswith("enrollment.")]
+    assert [kind for kind, _ in events] == ["enrollment.created", "enrollment.updated", "enrollment.updated"]
+    for _, data in events:
+        assert set(data) == {"id", "student_id", "course_id", "version"}
+        assert data["id"] == entry["id"] and data["course_id"] == course_id
+    assert [data["version"] for _, data in events] == [1, 2, 3]
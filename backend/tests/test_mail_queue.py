@@ -0,0 +1,118 @@
+import socket
+import time
+
+import pytest
+
+from benchmarks.smtp_standin import SMTPStandIn
+
+
+@pytest.fixture
+def smtp():
+    with SMTPStandIn() as server:
+        yield server
+
+
+@pytest.fixture
+def mail(portal, smtp):
+    """The app's mail queue, pointed at the SMTP stand-in."""
+    queue, config = portal.mail_queue, portal.app.config
+    saved = {key: config[key] for key in config if key.startswith("MAIL_")}
+    config.update(MAIL_SERVER="127.0.0.1", MAIL_PORT=smtp.port, MAIL_USE_TLS=False, MAIL_REQUIRE_AUTH=False,
+                  MAIL_SENDER="portal@localhost", MAIL_RECIPIENT="admin@localhost", MAIL_RETRY_BASE=60)
+    yield queue
+    queue._close_connection()
+    config.update(saved)
+
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def contact(client, unique):
+    resp = client.post("/api/contact", json={"name": "Tester", "email": f"t.{unique}@example.com",
+                                             "message": "Hello"})
+    assert resp.status_code == 201
+
+
+def outbound(portal, unique):
+    with portal.app.app_context():
+        message = portal.ContactMessage.query.filter_by(email=f"t.{unique}@example.com").one()
+        row = portal.OutboundEmail.query.filter_by(contact_message_id=message.id).one()
+        portal.db.session.expunge(row)
+        return row
+
+
+def drain(queue):
+    while queue.process_batch():
+        pass
+
+
+def test_queued_mail_is_claimed_sent_and_marked(client, portal, mail, smtp, unique):
+    contact(client, unique)
+    assert outbound(portal, unique).status == "pending"
+    drain(mail)
+    row = outbound(portal, unique)
+    assert (row.status, row.attempts, row.claim_token) == ("sent", 0, None)
+    assert row.sent_at is not None and smtp.messages >= 1
+
+
+def test_failed_delivery_is_retried_with_backoff(client, portal, mail, unique):
+    good_port = portal.app.config["MAIL_PORT"]
+    portal.app.config["MAIL_PORT"] = closed_port()
+    contact(client, unique)
+    drain(mail)
+    row = outbound(portal, unique)
+    assert (row.status, row.attempts) == ("pending", 1)
+    assert row.last_error and row.next_attempt_at > time.time() + 30
+
+    # Not due yet: the next batch leaves it alone
+    portal.app.config["MAIL_PORT"] = good_port
+    drain(mail)
+    assert outbound(portal, unique).status == "pending"
+
+    with portal.app.app_context():
+        portal.OutboundEmail.query.filter_by(id=row.id).update({"next_attempt_at": 0})
+        portal.db.session.commit()
+    drain(mail)
+    row = outbound(portal, unique)
+    assert (row.status, row.attempts, row.last_error) == ("sent", 1, None)
+
+
+def test_gives_up_after_max_attempts(client, portal, mail, unique):
+    portal.app.config.update(MAIL_PORT=closed_port(), MAIL_MAX_ATTEMPTS=1)
+    contact(client, unique)
+    drain(mail)
+    assert outbound(portal, unique).status == "failed"
+
+
+def test_stale_claims_are_requeued(client, portal, mail, unique):
+    contact(client, unique)
+    row = outbound(portal, unique)
+    with portal.app.app_context():
+        portal.OutboundEmail.query.filter_by(id=row.id).update(
+            {"status": "sending", "claim_token": "dead", "claimed_at": time.time() - 3600})
+        portal.db.session.commit()
+    assert mail.reclaim_stale() >= 1
+    assert outbound(portal, unique).status == "pending"
+    drain(mail)
+    assert outbound(portal, unique).status == "sent"
+
+
+def test_worker_starts_on_the_first_request(client, portal, mail):
+    portal.app.config["MAIL_WORKER"] = "thread"
+    try:
+        client.get("/")
+        assert mail._thread is not None and mail._thread.is_alive()
+    finally:
+        portal.app.config["MAIL_WORKER"] = "external"
+        mail.stop(timeout=5)
+        mail._pid = None
+
+
+def test_nothing_is_sent_without_credentials(portal, mail):
+    portal.app.config.update(MAIL_REQUIRE_AUTH=True, MAIL_USERNAME="", MAIL_PASSWORD="")
+    assert not mail.configured()
+    mail.start()
+    assert mail._thread is None or not mail._thread.is_alive()
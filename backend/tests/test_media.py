@@ -0,0 +1,127 @@
+import io
+
+import pytest
+
+from media import sniff, youtube_id
+from thumbnails import Image, make_thumbnails
+
+needs_pillow = pytest.mark.skipif(Image is None, reason="Pillow is not installed")
+
+
+def png(color, size=(800, 400)):
+    out = io.BytesIO()
+    Image.new("RGB", size, color).save(out, "PNG")
+    return out.getvalue()
+
+
+def unique_color(unique):
+    return tuple(int(unique[i:i + 2], 16) for i in (0, 2, 4))
+
+
+@pytest.mark.parametrize("url, video", [
+    ("https://www.youtube.com/watch?v=dQw4w9WgXcQ", "dQw4w9WgXcQ"),
+    ("https://youtube.com/watch?feature=share&v=dQw4w9WgXcQ&t=42", "dQw4w9WgXcQ"),
+    ("https://m.youtube.com/watch?v=dQw4w9WgXcQ", "dQw4w9WgXcQ"),
+    ("https://youtu.be/dQw4w9WgXcQ?si=abc", "dQw4w9WgXcQ"),
+    ("https://www.youtube.com/embed/dQw4w9WgXcQ", "dQw4w9WgXcQ"),
+    ("https://www.youtube.com/shorts/dQw4w9WgXcQ", "dQw4w9WgXcQ"),
+    ("https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ", "dQw4w9WgXcQ"),
+    ("https://WWW.YOUTUBE.COM/watch?v=dQw4w9WgXcQ", "dQw4w9WgXcQ"),
+    ("https://www.youtube.com/watch?v=short", None),
+    ("https://www.youtube.com/watch?v=dQw4w9WgXcQ&v=", "dQw4w9WgXcQ"),
+    ("https://www.youtube.com/channel/dQw4w9WgXcQ", None),
+    ("https://youtube.com.evil.example/watch?v=dQw4w9WgXcQ", None),
+    ("https://vimeo.com/123456789", None),
+    ("not a url", None),
+])
+def test_youtube_id(url, video):
+    assert youtube_id(url) == video
+
+
+def test_sniff_goes_by_magic_number():
+    assert sniff(b"\xff\xd8\xff\xe0rest") == "jpg"
+    assert sniff(b"\x89PNG\r\n\x1a\nrest") == "png"
+    assert sniff(b"GIF89a...") == "gif"
+    assert sniff(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "webp"
+    assert sniff(b"<svg xmlns='http://www.w3.org/2000/svg'/>") is None
+
+
+@needs_pillow
+def test_thumbnails_are_written_without_upscaling(tmp_path):
+    (tmp_path / "original.png").write_bytes(png("red"))
+    assert make_thumbnails(str(tmp_path), "original.png", "abc", (320, 1000), 80) == {"width": 800, "height": 400}
+    with Image.open(tmp_path / "abc-320.webp") as small, Image.open(tmp_path / "abc-1000.webp") as large:
+        assert (small.format, small.size) == ("WEBP", (320, 160))
+        assert large.size == (800, 400)
+
+
+def test_upload_needs_faculty_or_admin(client):
+    assert client.post("/api/media", data=b"\x89PNG\r\n\x1a\n", content_type="image/png").status_code == 401
+
+
+@pytest.mark.parametrize("body, message", [
+    (b"", "Only JPEG, PNG, GIF and WebP images are accepted"),
+    (b"<svg/>", "Only JPEG, PNG, GIF and WebP images are accepted"),
+    (b"\x89PNG\r\n\x1a\n" + b"\0" * 2048, "Images are limited to"),
+])
+def test_upload_rejects_other_content_and_large_files(client, portal, admin, monkeypatch, body, message):
+    monkeypatch.setitem(portal.app.config, "MEDIA_MAX_BYTES", 1024)
+    # Claimed content types are not trusted
+    resp = client.post("/api/media", data=body, content_type="image/png", headers=admin)
+    assert resp.status_code == 400 and resp.get_json()["message"].startswith(message)
+
+
+def test_upload_over_the_request_limit_is_413(client, portal, admin, monkeypatch):
+    monkeypatch.setitem(portal.app.config, "MEDIA_MAX_BYTES", 1024)
+    resp = client.post("/api/media", data=b"\x89PNG\r\n\x1a\n" + b"\0" * 70 * 1024, content_type="image/png",
+                       headers=admin)
+    assert resp.status_code == 413
+
+
+@needs_pillow
+def test_upload_stores_once_and_makes_thumbnails(client, portal, admin, unique):
+    data = png(unique_color(unique))
+    resp = client.post("/api/media", data={"file": (io.BytesIO(data), "photo.png")}, headers=admin)
+    assert resp.status_code == 201
+    asset = resp.get_json()
+    assert asset["content_type"] == "image/png" and asset["bytes"] == len(data)
+    assert asset["url"] == f"/api/media/files/{asset['hash']}.png"
+    assert client.post("/api/media", data=data, content_type="image/png", headers=admin).status_code == 200
+
+    original = client.get(asset["url"])
+    assert original.get_data() == data and "immutable" in original.headers["Cache-Control"]
+
+    portal.media_store.join()
+    stored = client.get(f"/api/media/{asset['hash']}").get_json()
+    assert (stored["status"], stored["width"], stored["height"]) == ("ready", 800, 400)
+    thumbnail = client.get(stored["thumbnails"]["320"])
+    assert thumbnail.status_code == 200 and thumbnail.mimetype == "image/webp"
+
+
+def test_missing_thumbnail_redirects_to_the_original(client, portal, admin, unique, monkeypatch):
+    # A GIF header is enough to be stored; no thumbnail will be made from it
+    monkeypatch.setattr(portal.media_store, "submit", lambda digest, name: None)
+    data = b"GIF89a" + unique.encode()
+    asset = client.post("/api/media", data=data, content_type="image/gif", headers=admin).get_json()
+    resp = client.get(f"/api/media/files/{asset['hash']}-320.webp")
+    assert resp.status_code == 302 and resp.location.endswith(asset["url"])
+    assert resp.headers["Cache-Control"] == "no-store"
+    assert client.get(f"/api/media/files/{'0' * 64}.png").status_code == 404
+
+
+def test_course_media_is_derived_at_write_time(client, admin, unique):
+    resp = client.post("/api/courses", json={"title": f"Video {unique}", "instructor": "V",
+                                             "video_url": "https://youtu.be/dQw4w9WgXcQ"}, headers=admin)
+    course = client.get(f"/api/courses/{resp.get_json()['course']['id']}").get_json()
+    assert course["video_id"] == "dQw4w9WgXcQ"
+    assert course["video_embed_url"] == "https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ"
+
+
+@pytest.mark.parametrize("fields, message", [
+    ({"image": "javascript:alert(1)"}, "image must be an http(s) URL or an uploaded image from /api/media"),
+    ({"image": f"/api/media/files/{'0' * 64}.png"}, "image is not a stored upload"),
+    ({"video_url": "ftp://example.com/video"}, "video_url must be an http(s) URL"),
+])
+def test_course_media_is_checked(client, admin, unique, fields, message):
+    resp = client.post("/api/courses", json={"title": f"Bad {unique}", "instructor": "V", **fields}, headers=admin)
+    assert resp.status_code == 400 and resp.get_json()["message"] == message
@@ -0,0 +1,85 @@
+import json
+import os
+import subprocess
+
+import pytest
+import sqlalchemy as sa
+from flask import Flask
+
+from metrics import RequestMetrics
+
+
+@pytest.fixture
+def setup(tmp_path):
+    app = Flask("metrics_test")
+    app.config.update(METRICS_ENABLED=True, METRICS_DIR=str(tmp_path), METRICS_FLUSH_INTERVAL=3600,
+                      METRICS_SLOW_REQUEST_MS=10 ** 6, METRICS_TOKEN=None)
+    engine = sa.create_engine("sqlite://")
+    metrics = RequestMetrics(app, engine)
+
+    @app.route("/query/<sql>")
+    def query(sql):
+        with engine.connect() as conn:
+            try:
+                conn.exec_driver_sql(sql)
+            except sa.exc.OperationalError:
+                return "failed"
+            return str(len(conn.info))
+
+    return app, engine, metrics
+
+
+def requests_total(metrics):
+    return sum(metrics.collect()["requests"].values())
+
+
+def test_failed_statements_leave_nothing_on_the_connection(setup):
+    app, engine, _ = setup
+    client = app.test_client()
+    for _ in range(5):
+        assert client.get("/query/SELECT nothing FROM nowhere").text == "failed"
+    assert client.get("/query/SELECT 1").text == "0"
+
+
+def test_exited_workers_are_folded_into_one_file(setup, tmp_path):
+    app, _, metrics = setup
+    app.test_client().get("/query/SELECT 1")
+    dead = subprocess.Popen(["true"])
+    dead.wait()
+    snapshot = {"process": f"{dead.pid}:0", "requests": {"GET\x1f/query/<sql>\x1f200": 4}, "latency": {},
+                "bytes": {}, "sql": {}}
+    (tmp_path / f"{dead.pid}.json").write_text(json.dumps(snapshot))
+
+    assert requests_total(metrics) == 5
+    assert sorted(os.listdir(tmp_path)) == sorted([f"{os.getpid()}.json", "retired.json", "retired.lock"])
+    assert requests_total(metrics) == 5
+
+
+def test_a_stale_file_already_retired_is_not_counted_twice(setup, tmp_path):
+    _, _, metrics = setup
+    snapshot = {"process": "1:0", "requests": {"k": 3}, "latency": {}, "bytes": {}, "sql": {}}
+    (tmp_path / "retired.json").write_text(json.dumps({**snapshot, "processes": ["1:0"]}))
+    # pid 1 is alive, as a worker that reused a retired pid would be; only its process id tells them apart
+    (tmp_path / "1.json").write_text(json.dumps(snapshot))
+    assert requests_total(metrics) == 3
+    (tmp_path / "1.json").write_text(json.dumps({**snapshot, "process": "1:99"}))
+    assert requests_total(metrics) == 6
+
+
+def test_scrapes_need_the_token_or_loopback(setup):
+    app, _, _ = setup
+    client = app.test_client()
+    assert client.get("/metrics").status_code == 200
+    assert client.get("/metrics", environ_base={"REMOTE_ADDR": "10.1.2.3"}).status_code == 403
+    app.config["METRICS_TOKEN"] = "s3cret"
+    assert client.get("/metrics").status_code == 401
+    resp = client.get("/metrics", headers={"Authorization": "Bearer s3cret"},
+                      environ_base={"REMOTE_ADDR": "10.1.2.3"})
+    assert resp.status_code == 200 and "portal_http_requests_total" in resp.text
+
+
+def test_slow_requests_go_to_the_app_log(setup, caplog):
+    app, _, _ = setup
+    app.config["METRICS_SLOW_REQUEST_MS"] = 0
+    app.test_client().get("/query/SELECT 1")
+    assert "Slow request: GET /query/<sql> -> 200" in caplog.text and "SELECT 1" in caplog.text
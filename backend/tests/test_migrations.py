@@ -0,0 +1,103 @@
+import pytest
+import sqlalchemy as sa
+
+from migrations import MIGRATIONS, applied_migrations, pending_migrations, run_migrations
+
+
+def index(engine, table, name):
+    return next((ix for ix in sa.inspect(engine).get_indexes(table) if ix["name"] == name), None)
+
+
+def test_new_database_gets_every_migration(engine):
+    assert pending_migrations(engine) == [migration_id for migration_id, _ in MIGRATIONS]
+    run_migrations(engine)
+    assert pending_migrations(engine) == []
+    assert applied_migrations(engine) == {migration_id for migration_id, _ in MIGRATIONS}
+    tables = set(sa.inspect(engine).get_table_names())
+    assert {"user", "course", "faculty_member", "student", "enrollment", "contact_message", "outbound_email",
+            "revoked_token", "inbox_stats", "change_event", "progress_event", "course_progress_stats",
+            "media_asset"} <= tables
+    columns = {c["name"] for c in sa.inspect(engine).get_columns("enrollment")}
+    assert {"progress", "version", "deleted_at"} <= columns
+    assert index(engine, "enrollment", "ux_enrollment_student_course")["unique"]
+    assert index(engine, "course", "ix_course_deleted_at") is not None
+
+
+def test_rerun_changes_nothing(engine, capsys):
+    run_migrations(engine)
+    capsys.readouterr()
+    run_migrations(engine)
+    assert capsys.readouterr().out == ""
+
+
+def test_unique_enrollment_ignores_deleted_rows(engine):
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(sa.text("INSERT INTO course (id, title, instructor) VALUES (1, 'C', 'I')"))
+        conn.execute(sa.text("INSERT INTO student (id, name, email) VALUES (1, 'S', 's@example.com')"))
+        conn.execute(sa.text("INSERT INTO enrollment (student_id, course_id, deleted_at) VALUES (1, 1, 1.0)"))
+        conn.execute(sa.text("INSERT INTO enrollment (student_id, course_id) VALUES (1, 1)"))
+    with pytest.raises(sa.exc.IntegrityError):
+        with engine.begin() as conn:
+            conn.execute(sa.text("INSERT INTO enrollment (student_id, course_id) VALUES (1, 1)"))
+
+
+def test_upgrade_from_the_original_schema(engine):
+    # The tables as the app created them before migrations existed
+    legacy = sa.MetaData()
+    user = sa.Table("user", legacy, sa.Column("id", sa.Integer, primary_key=True),
+                    sa.Column("email", sa.String(120), unique=True, nullable=False),
+                    sa.Column("password", sa.String(120), nullable=False),
+                    sa.Column("name", sa.String(120), nullable=False),
+                    sa.Column("role", sa.String(20), nullable=False))
+    course = sa.Table("course", legacy, sa.Column("id", sa.Integer, primary_key=True),
+                      sa.Column("title", sa.String(200), nullable=False),
+                      sa.Column("instructor", sa.String(120), nullable=False),
+                      sa.Column("duration", sa.String(50)), sa.Column("rating", sa.String(10)),
+                      sa.Column("students", sa.String(20)), sa.Column("image", sa.String(500)),
+                      sa.Column("tags", sa.Text), sa.Column("video_url", sa.String(500)))
+    sa.Table("faculty_member", legacy, sa.Column("id", sa.Integer, primary_key=True),
+             sa.Column("name", sa.String(120), nullable=False), sa.Column("role", sa.String(120)),
+             sa.Column("bio", sa.Text))
+    registry = sa.Table("student_registry", legacy, sa.Column("id", sa.Integer, primary_key=True),
+                        sa.Column("name", sa.String(120), nullable=False),
+                        sa.Column("email", sa.String(120), nullable=False),
+                        sa.Column("course", sa.String(200)), sa.Column("progress", sa.String(20)))
+    sa.Table("contact_message", legacy, sa.Column("id", sa.Integer, primary_key=True),
+             sa.Column("name", sa.String(120), nullable=False), sa.Column("email", sa.String(120), nullable=False),
+             sa.Column("message", sa.Text, nullable=False), sa.Column("timestamp", sa.String(50)),
+             sa.Column("is_read", sa.Boolean))
+    legacy.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(user.insert(), [{"email": "Admin@Example.com", "password": "password123", "name": "A",
+                                      "role": "admin"}])
+        conn.execute(course.insert(), [
+            {"id": 1, "title": "Systems", "instructor": "Jane", "rating": "4.9", "students": "1.2k",
+             "tags": '["Backend"]', "video_url": "https://www.youtube.com/watch?v=i53Gi_K397I"},
+            {"id": 2, "title": "Data", "instructor": "Bob", "rating": "n/a", "students": "850", "tags": "[]", "video_url": None},
+        ])
+        conn.execute(registry.insert(), [
+            {"name": "Alice", "email": "alice@example.com", "course": "Systems", "progress": "85%"},
+            {"name": "Alice", "email": "ALICE@example.com", "course": "Data", "progress": "40"},
+            {"name": "Bob", "email": "bob@example.com", "course": "Not Enrolled", "progress": "0%"},
+        ])
+
+    run_migrations(engine)
+
+    assert pending_migrations(engine) == []
+    with engine.connect() as conn:
+        courses = conn.execute(sa.text("SELECT id, rating, students, video_id FROM course ORDER BY id")).fetchall()
+        assert [tuple(c) for c in courses] == [(1, 4.9, 1200, "i53Gi_K397I"), (2, 5.0, 850, None)]
+        assert conn.execute(sa.text("SELECT email FROM student ORDER BY email")).scalars().all() == \
+            ["alice@example.com", "bob@example.com"]
+        enrollments = conn.execute(sa.text(
+            "SELECT c.title, e.progress, e.version, e.deleted_at FROM enrollment e"
+            " JOIN course c ON c.id = e.course_id ORDER BY c.title")).fetchall()
+        assert [tuple(e) for e in enrollments] == [("Data", 40, 1, None), ("Systems", 85, 1, None)]
+        histogram = conn.execute(sa.text(
+            "SELECT course_id, bucket, students, progress_sum FROM course_progress_stats ORDER BY course_id")).fetchall()
+        assert [tuple(h) for h in histogram] == [(1, 8, 1, 85), (2, 4, 1, 40)]
+        assert conn.execute(sa.text('SELECT email FROM "user"')).scalar() == "admin@example.com"
+        if engine.dialect.name == "sqlite":
+            hits = conn.execute(sa.text("SELECT rowid FROM course_fts WHERE course_fts MATCH 'backend'")).scalars()
+            assert list(hits) == [1]
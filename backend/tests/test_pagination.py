@@ -0,0 +1,68 @@
+import pytest
+
+
+def walk(client, path, headers=None, **params):
+    """Every item of a paginated list, following next_cursor."""
+    items, after = [], None
+    while True:
+        body = client.get(path, query_string={**params, **({"after": after} if after else {})},
+                          headers=headers).get_json()
+        items += body["items"]
+        after = body["next_cursor"]
+        if not after:
+            return items
+
+
+@pytest.fixture
+def courses(client, admin, unique):
+    """Seven courses by one instructor; three share a title."""
+    instructor = f"Paginator {unique}"
+    for title in ["Same"] * 3 + ["Alpha", "Beta", "Gamma", "Delta"]:
+        resp = client.post("/api/courses", json={"title": f"{title} {unique}", "instructor": instructor},
+                           headers=admin)
+        assert resp.status_code == 201
+    return instructor
+
+
+def test_without_limit_returns_a_plain_list(client):
+    assert isinstance(client.get("/api/courses").get_json(), list)
+
+
+@pytest.mark.parametrize("sort", ["id", "-id", "title", "-title"])
+def test_cursor_walks_every_row_once_in_order(client, courses, sort):
+    everything = client.get("/api/courses", query_string={"instructor": courses, "sort": sort}).get_json()
+    assert len(everything) == 7
+    paged = walk(client, "/api/courses", instructor=courses, sort=sort, limit=2)
+    assert [c["id"] for c in paged] == [c["id"] for c in everything]
+    field = sort.lstrip("-")
+    keys = [(c[field], c["id"]) for c in paged]
+    assert keys == sorted(keys, reverse=sort.startswith("-"))
+
+
+def test_registry_pages_and_filters(client, admin, unique):
+    course_id = client.post("/api/courses", json={"title": f"Roster {unique}", "instructor": "R"},
+                            headers=admin).get_json()["course"]["id"]
+    for n in range(5):
+        resp = client.post("/api/enroll", json={"name": f"S{n}", "email": f"s{n}.{unique}@example.com",
+                                                "course_id": course_id})
+        assert resp.status_code == 201
+    entries = walk(client, "/api/students", admin, course_id=course_id, limit=2)
+    assert sorted(e["email"] for e in entries) == [f"s{n}.{unique}@example.com" for n in range(5)]
+    assert walk(client, "/api/students", admin, email=f"S3.{unique}@EXAMPLE.com", limit=10)[0]["name"] == "S3"
+
+
+def test_sparse_fields(client, courses):
+    body = client.get("/api/courses", query_string={"instructor": courses, "limit": 1, "fields": "title,id"})
+    assert list(body.get_json()["items"][0]) == ["id", "title"]
+
+
+@pytest.mark.parametrize("params", [
+    {"limit": "x"}, {"limit": 0}, {"sort": "rating"}, {"after": "not-a-cursor"}, {"fields": "password"},
+])
+def test_bad_arguments_get_400(client, params):
+    assert client.get("/api/courses", query_string=params).status_code == 400
+
+
+def test_cursor_is_tied_to_its_sort(client, courses):
+    cursor = client.get("/api/courses", query_string={"sort": "title", "limit": 1}).get_json()["next_cursor"]
+    assert client.get("/api/courses", query_string={"sort": "id", "after": cursor}).status_code == 400
@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+from flask import Flask
+
+from passwords import HasherBusy, PasswordHasher
+from rate_limit import TokenBucket
+
+
+@pytest.fixture
+def hasher():
+    app = Flask("passwords_test")
+    # Cheap parameters; the format and checks are the same
+    app.config.update(PASSWORD_SCRYPT_N=2 ** 8, PASSWORD_PBKDF2_ITERATIONS=1000,
+                      PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE=0, PASSWORD_HASH_WAIT=0.05)
+    return PasswordHasher(app)
+
+
+@pytest.fixture
+def occupied(hasher):
+    """Holds the hasher's only slot until the test ends."""
+    release, started = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait(10)
+
+    thread = threading.Thread(target=hasher._run, args=(block,))
+    thread.start()
+    started.wait(5)
+    yield
+    release.set()
+    thread.join()
+
+
+def test_scrypt_hash_and_verify(hasher):
+    stored = hasher.hash("hunter2")
+    scheme, n, r, p, salt, digest = stored.split("$")
+    assert (scheme, n, r, p) == ("scrypt", "256", "8", "1")
+    assert hasher.hash("hunter2") != stored  # salted
+    assert hasher.verify(stored, "hunter2") == (True, False)
+    assert hasher.verify(stored, "hunter3") == (False, False)
+
+
+def test_other_parameters_need_a_rehash(hasher):
+    hasher.app.config["PASSWORD_SCHEME"] = "pbkdf2_sha256"
+    stored = hasher.hash("hunter2")
+    assert stored.startswith("pbkdf2_sha256$1000$")
+    hasher.app.config["PASSWORD_SCHEME"] = "scrypt"
+    assert hasher.verify(stored, "hunter2") == (True, True)
+
+
+def test_legacy_and_corrupt_hashes(hasher):
+    assert hasher.verify("plaintext", "plaintext") == (True, True)
+    assert hasher.verify("plaintext", "other")[0] is False
+    assert hasher.verify("scrypt$256$8$1$!!$??", "x") == (False, False)
+
+
+def test_unknown_accounts_hash_on_the_pool(hasher, monkeypatch):
+    threads = []
+    real_hash = hasher._hash
+    monkeypatch.setattr(hasher, "_hash", lambda password: threads.append(threading.current_thread().name)
+                        or real_hash(password))
+    assert hasher.verify(None, "guess") == (False, False)
+    assert threads and all(name.startswith("password-hash") for name in threads)
+
+
+def test_saturated_pool_raises_busy(hasher, occupied):
+    with pytest.raises(HasherBusy):
+        hasher.hash("hunter2")
+    with pytest.raises(HasherBusy):
+        hasher.verify(None, "guess")
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=1, burst=2)
+    assert bucket.take("ip", now=0) == 0 and bucket.take("ip", now=0) == 0
+    assert bucket.take("ip", now=0) == pytest.approx(1.0)
+    assert bucket.take("other", now=0) == 0
+    assert bucket.take("ip", now=1.5) == 0
+
+
+def test_plaintext_password_is_rehashed_on_login(client, portal, unique):
+    email = f"legacy.{unique}@example.com"
+    with portal.app.app_context():
+        portal.db.session.add(portal.User(email=email, password="old-plaintext", name="Legacy", role="student"))
+        portal.db.session.commit()
+    assert client.post("/api/login", json={"email": email, "password": "old-plaintext"}).status_code == 200
+    with portal.app.app_context():
+        stored = portal.User.query.filter_by(email=email).one().password
+    assert stored.startswith("scrypt$")
+    assert client.post("/api/login", json={"email": email, "password": "old-plaintext"}).status_code == 200
+    assert client.post("/api/login", json={"email": email, "password": "wrong"}).status_code == 401
+
+
+def test_login_is_throttled_per_account(client, portal, monkeypatch, unique):
+    monkeypatch.setattr(portal, "login_account_limiter", TokenBucket(rate=1 / 60, burst=2))
+    body = {"email": f"nobody.{unique}@example.com", "password": "guess"}
+    assert [client.post("/api/login", json=body).status_code for _ in range(2)] == [401, 401]
+    resp = client.post("/api/login", json=body)
+    assert resp.status_code == 429 and 1 <= int(resp.headers["Retry-After"]) <= 60
+
+
+def test_busy_hasher_is_503(client, portal, monkeypatch, unique):
+    def busy(stored, password):
+        raise portal.HasherBusy("Password hashing is saturated")
+    monkeypatch.setattr(portal.password_hasher, "verify", busy)
+    resp = client.post("/api/login", json={"email": f"busy.{unique}@example.com", "password": "x"})
+    assert resp.status_code == 503 and resp.headers["Retry-After"] == "1"
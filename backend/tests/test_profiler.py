@@ -0,0 +1,16 @@
+import os
+
+
+def test_profiled_request_writes_files_and_logs_repeated_queries(client, portal, admin, monkeypatch, tmp_path, caplog):
+    monkeypatch.setitem(portal.app.config, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setitem(portal.app.config, "PROFILE_REPEATED_QUERY_LIMIT", 0)
+    resp = client.get("/api/students", query_string={"__profile": "1"}, headers=admin)
+    assert resp.status_code == 200
+    name = resp.headers["X-Profile"]
+    assert sorted(os.listdir(tmp_path)) == [name + ".collapsed", name + ".pstats"]
+    assert int(resp.headers["X-Profile-Repeated-Queries"]) >= 1
+    assert "Possible N+1 in GET /api/students" in caplog.text
+
+
+def test_profiling_needs_an_admin(client):
+    assert client.get("/api/courses", query_string={"__profile": "1"}).status_code == 403
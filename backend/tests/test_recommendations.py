@@ -0,0 +1,97 @@
+import pytest
+
+from recommendations import _build_python, _build_sparse, _Index, _tag_weights
+
+CONFIG = {"RECOMMEND_TOP_K": 5, "RECOMMEND_TAG_WEIGHT": 0.5, "RECOMMEND_MIN_SHARED": 1,
+          "RECOMMEND_BLOCK_CELLS": 1024}
+
+
+@pytest.fixture(params=[True, False], ids=["sparse", "python"])
+def fresh_index(request, portal, monkeypatch):
+    """Builds the next index from the current data, with either builder."""
+    monkeypatch.setitem(portal.app.config, "RECOMMEND_SPARSE", request.param)
+    monkeypatch.setattr(portal.recommender, "_index", None)
+
+
+@pytest.fixture
+def catalog(client, portal, admin, unique):
+    """Courses A-D: B shares a tag and two students with A, C only a tag,
+    D nothing. Returns ({letter: id}, id of a student taking A and B)."""
+    tags = {"A": [f"ac {unique}", f"ab {unique}"], "B": [f"AB  {unique}"], "C": [f"ac {unique}"],
+            "D": [f"d {unique}"]}
+    ids = {}
+    for letter, course_tags in tags.items():
+        resp = client.post("/api/courses", json={"title": f"{letter} {unique}", "instructor": "R",
+                                                 "tags": course_tags}, headers=admin)
+        ids[letter] = resp.get_json()["course"]["id"]
+    for n, letters in enumerate(["AB", "AB", "D"]):
+        for letter in letters:
+            resp = client.post("/api/enroll", json={"name": f"R{n}", "email": f"r{n}.{unique}@example.com",
+                                                    "course_id": ids[letter]})
+            assert resp.status_code == 201
+    with portal.app.app_context():
+        student_id = portal.Student.query.filter_by(email=f"r0.{unique}@example.com").one().id
+    return ids, student_id
+
+
+def test_related_courses(client, catalog, unique, fresh_index):
+    ids, _ = catalog
+    body = client.get(f"/api/courses/{ids['A']}/related").get_json()
+    assert [item["id"] for item in body["items"]] == [ids["B"], ids["C"]]
+    b, c = body["items"]
+    # Tags match however they are cased and spaced; B's are shown as stored
+    assert b["shared_students"] == 2 and b["shared_tags"] == [f"AB  {unique}"]
+    assert c["shared_students"] == 0 and c["shared_tags"] == [f"ac {unique}"]
+    assert b["score"] > c["score"] > 0
+
+
+def test_related_limit_and_missing_course(client, catalog, fresh_index):
+    ids, _ = catalog
+    assert len(client.get(f"/api/courses/{ids['A']}/related", query_string={"limit": 1}).get_json()["items"]) == 1
+    assert client.get("/api/courses/999999999/related").status_code == 404
+    assert client.get(f"/api/courses/{ids['A']}/related", query_string={"limit": "x"}).status_code == 400
+
+
+def test_recommended_for_a_student(client, catalog, fresh_index):
+    ids, student_id = catalog
+    body = client.get(f"/api/students/{student_id}/recommended", query_string={"limit": 3}).get_json()
+    assert body["enrolled"] == sorted([ids["A"], ids["B"]])
+    assert body["items"][0]["id"] == ids["C"] and body["items"][0]["because"] == [ids["A"]]
+    assert len(body["items"]) == 3
+    assert not {ids["A"], ids["B"]} & {item["id"] for item in body["items"]}
+
+
+def test_new_student_gets_popular_courses(client, portal, admin, unique, fresh_index):
+    email = f"new.{unique}@example.com"
+    assert client.post("/api/bulk/students", json=[{"name": "New", "email": email}], headers=admin).status_code == 200
+    with portal.app.app_context():
+        student_id = portal.Student.query.filter_by(email=email).one().id
+        popular = portal.recommender.index().popular
+    body = client.get(f"/api/students/{student_id}/recommended", query_string={"limit": 3}).get_json()
+    assert body["enrolled"] == []
+    assert [item["id"] for item in body["items"]] == popular[:3]
+    assert all(item["score"] == 0 and item["because"] == [] for item in body["items"])
+
+
+def test_unknown_student_is_404(client):
+    assert client.get("/api/students/999999999/recommended").status_code == 404
+
+
+def test_empty_index(client, portal, catalog, monkeypatch):
+    # As built from an empty catalog: nothing is related and nothing is popular
+    monkeypatch.setattr(portal.recommender, "_index", _Index(None, {}, {}, {}, {}, []))
+    ids, student_id = catalog
+    assert client.get(f"/api/courses/{ids['A']}/related").get_json()["items"] == []
+    assert client.get(f"/api/students/{student_id}/recommended").get_json()["items"] == []
+
+
+def test_builders_agree():
+    courses = [(1, frozenset({"a", "b"})), (2, frozenset({"b"})), (3, frozenset({"c"})), (4, frozenset())]
+    pairs = [(10, 1), (10, 2), (11, 1), (11, 3), (12, 3), (12, 99)]
+    postings, idf, norms = _tag_weights(courses)
+    sparse = _build_sparse(courses, pairs, CONFIG, idf)
+    python = _build_python(courses, pairs, CONFIG, postings, idf, norms)
+    assert sparse == python
+    assert [other for other, _, _ in python[0][1]] == [2, 3]
+    assert python[1] == [1, 3, 2, 4]
+    assert _build_sparse([], [], CONFIG, {}) == _build_python([], [], CONFIG, {}, {}, {}) == ({}, [])
@@ -0,0 +1,120 @@
+import gzip
+import json
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from compression import brotli
+from json_provider import FastJSONProvider, orjson
+
+needs_brotli = pytest.mark.skipif(brotli is None, reason="brotli is not installed")
+
+
+@pytest.fixture
+def providers():
+    app = Flask("json_test")
+    return app, FastJSONProvider(app), DefaultJSONProvider(app)
+
+
+SAMPLE = {
+    "title": "Café Ünïcode – 日本語 ✓",
+    "when": datetime(2024, 5, 17, 9, 30, tzinfo=timezone.utc),
+    "day": date(2024, 5, 17),
+    "price": Decimal("9.50"),
+    "rating": 4.5,
+    "tags": ["a", None, True],
+    "nested": {"b": 1, "a": [1.0, -2]},
+}
+
+
+@pytest.mark.skipif(orjson is None, reason="orjson is not installed")
+def test_orjson_output_matches_the_stdlib_encoder(providers):
+    app, fast, stdlib = providers
+    with app.app_context():
+        body = fast.response(SAMPLE).get_data()
+        previous = stdlib.response(SAMPLE).get_data()
+    assert json.loads(body) == json.loads(previous)
+    assert json.loads(body)["when"] == "Fri, 17 May 2024 09:30:00 GMT"
+    # Non-ASCII goes out as UTF-8 rather than \u escapes
+    assert "Café Ünïcode – 日本語 ✓".encode() in body
+    assert list(json.loads(body)) == sorted(SAMPLE)
+    assert fast.loads(body) == json.loads(previous)
+
+
+def test_values_orjson_refuses_use_the_stdlib_encoder(providers):
+    app, fast, stdlib = providers
+    for value in ({1: "int key"}, {"big": 2 ** 70}):
+        with app.app_context():
+            assert json.loads(fast.response(value).get_data()) == json.loads(stdlib.response(value).get_data())
+
+
+def test_stdlib_provider_can_be_selected(providers):
+    app = Flask("json_stdlib_test")
+    app.config["JSON_PROVIDER"] = "stdlib"
+    assert not FastJSONProvider(app).use_orjson
+
+
+@pytest.fixture
+def catalog(client, admin, unique):
+    """A course list well over the default minimum size."""
+    for n in range(12):
+        resp = client.post("/api/courses", json={"title": f"Squeeze {n} {unique}", "instructor": f"Zip {unique}",
+                                                 "duration": "4 weeks"}, headers=admin)
+        assert resp.status_code == 201
+    return {"instructor": f"Zip {unique}"}
+
+
+@pytest.mark.parametrize("accept, encoding", [
+    ("gzip", "gzip"), ("identity", None), (None, None),
+    pytest.param("br", "br", marks=needs_brotli),
+    pytest.param("gzip, br", "br", marks=needs_brotli),
+    pytest.param("br;q=0.5, gzip", "gzip", marks=needs_brotli),
+])
+def test_encoding_is_negotiated(client, catalog, accept, encoding):
+    plain = client.get("/api/courses", query_string=catalog)
+    resp = client.get("/api/courses", query_string=catalog, headers={"Accept-Encoding": accept} if accept else {})
+    assert "Accept-Encoding" in resp.vary
+    assert resp.headers.get("Content-Encoding") == encoding
+    body = resp.get_data()
+    if encoding == "gzip":
+        body = gzip.decompress(body)
+    elif encoding == "br":
+        body = brotli.decompress(body)
+    assert body == plain.get_data()
+
+
+def test_compressed_copies_get_a_weak_etag(client, catalog):
+    plain = client.get("/api/courses", query_string=catalog)
+    resp = client.get("/api/courses", query_string=catalog, headers={"Accept-Encoding": "gzip"})
+    assert resp.get_etag() == (plain.get_etag()[0], True)
+    assert plain.get_etag()[1] is False
+
+
+def test_small_bodies_are_sent_as_they_are(client, portal, catalog, monkeypatch):
+    size = len(client.get("/api/courses", query_string=catalog).get_data())
+    monkeypatch.setitem(portal.app.config, "COMPRESS_MIN_SIZE", size + 1)
+    resp = client.get("/api/courses", query_string=catalog, headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in resp.headers and "Accept-Encoding" in resp.vary
+    monkeypatch.setitem(portal.app.config, "COMPRESS_MIN_SIZE", size)
+    resp = client.get("/api/courses", query_string=catalog, headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+
+
+def test_sparse_fieldset(client, catalog):
+    items = client.get("/api/courses", query_string={**catalog, "fields": "duration, title,id"}).get_json()
+    assert len(items) == 12
+    assert all(set(item) == {"id", "title", "duration"} for item in items)
+
+
+def test_sparse_fieldset_applies_to_exports_in_spec_order(client, catalog):
+    resp = client.get("/api/courses", query_string={**catalog, "fields": "duration,title,id", "format": "csv"})
+    assert resp.get_data(as_text=True).splitlines()[0] == "id,title,duration"
+
+
+@pytest.mark.parametrize("fields", ["password", "title,nope", "id,instructor_email"])
+def test_unknown_fields_are_rejected(client, fields):
+    resp = client.get("/api/courses", query_string={"fields": fields})
+    assert resp.status_code == 400 and resp.get_json()["message"].startswith("Unknown field")
@@ -0,0 +1,53 @@
+def add_course(client, admin, title, instructor="Test Instructor", tags=()):
+    resp = client.post("/api/courses", json={"title": title, "instructor": instructor, "duration": "4 weeks",
+                                             "tags": list(tags)}, headers=admin)
+    assert resp.status_code == 201, resp.get_json()
+    return resp.get_json()["course"]["id"]
+
+
+def test_finds_courses_by_title_instructor_and_tag(client, admin, unique):
+    course_id = add_course(client, admin, f"Quantum {unique} Basics", instructor=f"Ada {unique}", tags=["Physics"])
+    for q in (f"quantum {unique}", f"ada {unique}", f"{unique} physics"):
+        items = client.get("/api/search", query_string={"q": q, "type": "course"}).get_json()["items"]
+        assert [item["id"] for item in items] == [course_id], q
+    item = items[0]
+    assert item["type"] == "course" and item["title"] == f"Quantum {unique} Basics" and item["tags"] == ["Physics"]
+
+
+def test_matches_word_prefixes_and_ignores_query_syntax(client, admin, unique):
+    course_id = add_course(client, admin, f"Prefix{unique} Course")
+    items = client.get("/api/search", query_string={"q": f'"prefix{unique[:4]}*" ('}).get_json()["items"]
+    assert course_id in [item["id"] for item in items]
+
+
+def test_finds_faculty(client, admin, unique):
+    resp = client.post("/api/bulk/faculty", json=[{"name": f"Grace {unique}", "role": "Compilers", "bio": ""}],
+                       headers=admin)
+    assert resp.status_code == 200, resp.get_json()
+    items = client.get("/api/search", query_string={"q": f"grace {unique}"}).get_json()["items"]
+    assert [(item["type"], item["name"], item["role"]) for item in items] == [("faculty", f"Grace {unique}", "Compilers")]
+
+
+def test_pages_through_results_with_a_cursor(client, admin, unique):
+    ids = {add_course(client, admin, f"Paged {unique} {n}") for n in range(5)}
+    seen, after = [], None
+    while True:
+        params = {"q": f"paged {unique}", "limit": 2, **({"after": after} if after else {})}
+        body = client.get("/api/search", query_string=params).get_json()
+        seen += [item["id"] for item in body["items"]]
+        after = body["next_cursor"]
+        if not after:
+            break
+    assert sorted(seen) == sorted(ids)
+
+
+def test_leaves_out_deleted_courses(client, admin, unique):
+    course_id = add_course(client, admin, f"Doomed {unique}")
+    assert client.delete(f"/api/courses/{course_id}", headers=admin).status_code == 200
+    assert client.get("/api/search", query_string={"q": f"doomed {unique}"}).get_json()["items"] == []
+
+
+def test_rejects_empty_and_bad_queries(client):
+    assert client.get("/api/search", query_string={"q": "  ?! "}).status_code == 400
+    assert client.get("/api/search", query_string={"q": "x", "type": "user"}).status_code == 400
+    assert client.get("/api/search", query_string={"q": "x", "after": "garbage"}).status_code == 400
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+
+@pytest.fixture
+def course(client, portal, admin, unique):
+    """A course with two registry entries: {"id", "entries"}."""
+    course_id = client.post("/api/courses", json={"title": f"Doomed {unique}", "instructor": f"D {unique}"},
+                            headers=admin).get_json()["course"]["id"]
+    for n in range(2):
+        resp = client.post("/api/enroll", json={"name": f"D{n}", "email": f"d{n}.{unique}@example.com",
+                                                "course_id": course_id})
+        assert resp.status_code == 201
+    with portal.app.app_context():
+        entries = sorted(e.id for e in portal.Enrollment.query.filter_by(course_id=course_id))
+    return {"id": course_id, "entries": entries}
+
+
+def stored(portal, model, row_id, **options):
+    """The row as the ORM sees it, with `execution_options(**options)`."""
+    with portal.app.app_context():
+        return portal.db.session.execute(
+            portal.db.select(model).where(model.id == row_id).execution_options(**options)).scalar()
+
+
+def listed(client, admin, course_id):
+    return [e["id"] for e in client.get("/api/students", query_string={"course_id": course_id},
+                                        headers=admin).get_json()]
+
+
+def test_deleted_entry_disappears_from_list_and_detail(client, portal, admin, course):
+    gone, kept = course["entries"]
+    assert client.delete(f"/api/students/{gone}", headers=admin).status_code == 200
+    assert listed(client, admin, course["id"]) == [kept]
+    assert client.get(f"/api/students/{gone}", headers=admin).status_code == 404
+    assert client.delete(f"/api/students/{gone}", headers=admin).status_code == 404
+    assert client.get(f"/api/courses/{course['id']}").get_json()["students"] == 1
+
+    assert stored(portal, portal.Enrollment, gone) is None
+    assert stored(portal, portal.Enrollment, gone, include_deleted=True).deleted_at is not None
+
+
+def test_deleted_course_is_hidden_in_joins(client, portal, admin, course):
+    # Only the course is marked, so its entries are left out by the join alone
+    with portal.app.app_context():
+        portal.Course.query.filter_by(id=course["id"]).update({"deleted_at": time.time()})
+        portal.db.session.commit()
+        assert portal.enrollment_query().filter(portal.Enrollment.course_id == course["id"]).all() == []
+        assert portal.Enrollment.query.filter_by(course_id=course["id"]).count() == 2
+        # A lazy load of the relationship does not bring it back either
+        entry = portal.db.session.get(portal.Enrollment, course["entries"][0])
+        assert entry.course is None
+    assert listed(client, admin, course["id"]) == []
+    assert client.get(f"/api/courses/{course['id']}").status_code == 404
+
+
+def test_delete_course_marks_its_entries(client, portal, admin, course):
+    assert client.delete(f"/api/courses/{course['id']}", headers=admin).status_code == 200
+    for entry in course["entries"]:
+        assert stored(portal, portal.Enrollment, entry) is None
+        assert stored(portal, portal.Enrollment, entry, include_deleted=True).deleted_at is not None
+    assert stored(portal, portal.Course, course["id"], include_deleted=True) is not None
+
+
+def test_drain_purges_dependents_before_parents(client, portal, admin, course, unique):
+    assert client.delete(f"/api/courses/{course['id']}", headers=admin).status_code == 200
+    assert client.post("/api/bulk/faculty", json=[{"name": f"Gone {unique}"}], headers=admin).status_code == 200
+    with portal.app.app_context():
+        faculty_id = portal.FacultyMember.query.filter_by(name=f"Gone {unique}").one().id
+    assert client.delete(f"/api/faculty/{faculty_id}", headers=admin).status_code == 200
+    assert portal.purger.pending()["course"] >= 1
+
+    order = [model.__tablename__ for model in portal.purger.models]
+    assert order == ["enrollment", "course", "faculty_member", "user"]
+    tables = []
+    while True:
+        done = portal.purger.step()
+        if done is None:
+            break
+        if done[0] != "vacuum":
+            tables.append(done[0])
+    assert "enrollment" in tables and "course" in tables and "faculty_member" in tables
+    assert tables == sorted(tables, key=order.index)
+
+    for model, row_id in [(portal.Enrollment, course["entries"][0]), (portal.Course, course["id"]),
+                          (portal.FacultyMember, faculty_id)]:
+        assert stored(portal, model, row_id, include_deleted=True) is None
+    assert portal.purger.pending() == dict.fromkeys(order, 0)
+
+
+def test_purge_after_keeps_recent_deletes(client, portal, admin, course, monkeypatch):
+    monkeypatch.setitem(portal.app.config, "PURGE_AFTER", 3600)
+    gone = course["entries"][0]
+    assert client.delete(f"/api/students/{gone}", headers=admin).status_code == 200
+    assert "enrollment" not in portal.purger.drain()
+    assert stored(portal, portal.Enrollment, gone, include_deleted=True) is not None
+
+    with portal.app.app_context():
+        portal.Enrollment.query.filter_by(id=gone).update({"deleted_at": time.time() - 3601})
+        portal.db.session.commit()
+    assert portal.purger.drain()["enrollment"] >= 1
+    assert stored(portal, portal.Enrollment, gone, include_deleted=True) is None
@@ -0,0 +1,100 @@
+import pytest
+
+
+def if_match(admin, *versions):
+    return {**admin, "If-Match": ", ".join(f'"{v}"' for v in versions)}
+
+
+@pytest.fixture
+def faculty(client, portal, admin, unique):
+    """The id of a new faculty member, at version 1."""
+    name = f"Prof {unique}"
+    assert client.post("/api/bulk/faculty", json=[{"name": name, "role": "Lecturer"}], headers=admin).status_code == 200
+    with portal.app.app_context():
+        return portal.FacultyMember.query.filter_by(name=name).one().id
+
+
+@pytest.fixture
+def entries(client, portal, admin, unique):
+    """The ids of one student's registry entries in two new courses."""
+    ids = []
+    for n in range(2):
+        course = client.post("/api/courses", json={"title": f"Versioned {n} {unique}", "instructor": "V"},
+                             headers=admin).get_json()["course"]
+        resp = client.post("/api/enroll", json={"name": "Vera", "email": f"vera.{unique}@example.com",
+                                                "course_id": course["id"]})
+        assert resp.status_code == 201
+        with portal.app.app_context():
+            ids.append(portal.Enrollment.query.filter_by(course_id=course["id"]).one().id)
+    return ids
+
+
+def version(client, admin, path):
+    resp = client.get(path, headers=admin)
+    assert resp.status_code == 200
+    return resp.get_etag()
+
+
+@pytest.mark.parametrize("kind", ["faculty", "students"])
+def test_get_sends_the_version_as_etag(client, admin, faculty, entries, kind):
+    path = f"/api/faculty/{faculty}" if kind == "faculty" else f"/api/students/{entries[0]}"
+    resp = client.get(path, headers=admin)
+    assert resp.get_etag() == (str(resp.get_json()["version"]), False) == ("1", False)
+    assert client.get(path, headers={**admin, "If-None-Match": '"1"'}).status_code == 304
+
+
+@pytest.mark.parametrize("method", ["PUT", "PATCH"])
+@pytest.mark.parametrize("kind, body", [("faculty", {"bio": "Changed"}), ("students", {"progress": 50})])
+def test_stale_if_match_is_412_and_changes_nothing(client, admin, faculty, entries, method, kind, body):
+    path = f"/api/faculty/{faculty}" if kind == "faculty" else f"/api/students/{entries[0]}"
+    resp = client.open(path, method=method, json=body, headers=if_match(admin, 1))
+    assert resp.status_code == 200 and resp.get_etag() == ("2", False)
+
+    resp = client.open(path, method=method, json={**body, "name": "Lost"}, headers=if_match(admin, 1))
+    assert resp.status_code == 412
+    assert resp.get_json()["version"] == 2 and resp.get_etag() == ("2", False)
+    assert client.get(path, headers=admin).get_json()["name"] != "Lost"
+
+    # Any of several ETags, `*`, and a matching version all apply
+    assert client.open(path, method=method, json=body, headers=if_match(admin, 1, 2)).status_code == 200
+    assert client.open(path, method=method, json=body, headers={**admin, "If-Match": "*"}).status_code == 200
+    assert version(client, admin, path) == ("4", False)
+
+
+@pytest.mark.parametrize("method", ["PUT", "PATCH"])
+def test_without_if_match_the_last_write_wins(client, admin, faculty, method):
+    path = f"/api/faculty/{faculty}"
+    for bio in ("First", "Second"):
+        assert client.open(path, method=method, json={"bio": bio}, headers=admin).status_code == 200
+    assert client.get(path, headers=admin).get_json()["bio"] == "Second"
+    assert version(client, admin, path) == ("3", False)
+
+
+def test_if_match_without_a_version_never_matches(client, admin, faculty):
+    resp = client.patch(f"/api/faculty/{faculty}", json={"bio": "x"}, headers={**admin, "If-Match": '"abc"'})
+    assert resp.status_code == 412
+
+
+@pytest.mark.parametrize("method", ["PUT", "PATCH"])
+def test_student_changes_move_sibling_entries(client, admin, entries, unique, method):
+    first, second = (f"/api/students/{entry}" for entry in entries)
+    # Progress is per entry: the sibling keeps its version
+    assert client.open(first, method=method, json={"progress": 30}, headers=admin).status_code == 200
+    assert version(client, admin, second) == ("1", False)
+
+    assert client.open(first, method=method, json={"name": "Vera Renamed"}, headers=admin).status_code == 200
+    assert version(client, admin, second) == ("2", False)
+    assert client.get(second, headers=admin).get_json()["name"] == "Vera Renamed"
+    # An edit based on the sibling's old copy is refused
+    resp = client.open(second, method=method, json={"name": "Vera"}, headers=if_match(admin, 1))
+    assert resp.status_code == 412 and resp.get_json()["version"] == 2
+
+
+def test_batch_reports_412_per_entry(client, admin, entries):
+    first, second = entries
+    resp = client.patch("/api/students", json=[{"id": first, "version": 7, "progress": 10},
+                                               {"id": second, "version": 1, "progress": 20}], headers=admin)
+    assert resp.get_json() == {"updated": 1, "results": [
+        {"id": first, "status": 412, "message": "Changed by someone else", "version": 1},
+        {"id": second, "status": 200, "version": 2},
+    ]}
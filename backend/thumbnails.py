@@ -0,0 +1,54 @@
+import io
+import os
+import tempfile
+
+# The work done on media.py's process pool, in a module of its own so that
+# pool processes import Pillow and not Flask, SQLAlchemy and the app.
+
+try:
+    from PIL import Image
+except ImportError:  # optional; originals are served without thumbnails
+    Image = None
+
+
+def write_atomic(path, data):
+    # Readers never see a partial file: write beside it, then rename.
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp, 0o644)  # mkstemp makes it private
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def lower_priority():
+    # Pool processes yield the CPU to request threads.
+    if hasattr(os, 'nice'):
+        os.nice(10)
+
+
+def make_thumbnails(directory, name, digest, widths, quality):
+    """Write `<digest>-<width>.webp` for each width and return the original's
+    size. Runs on the process pool. Narrower images are not upscaled, so a
+    thumbnail is at most `width` pixels wide."""
+    with Image.open(os.path.join(directory, name)) as original:
+        width, height = original.size
+        # Let the JPEG decoder scale down by a power of two while decoding.
+        original.draft('RGB', (max(widths), max(widths) * height // width))
+        image = original.convert('RGBA' if original.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    # Largest first, each from the one before: cheaper than resizing the
+    # original every time.
+    for target in sorted(widths, reverse=True):
+        if target < image.width:
+            image = image.resize((target, max(1, round(image.height * target / image.width))),
+                                 Image.LANCZOS, reducing_gap=3.0)
+        out = io.BytesIO()
+        image.save(out, 'WEBP', quality=quality, method=4)
+        write_atomic(os.path.join(directory, f'{digest}-{target}.webp'), out.getvalue())
+    return {'width': width, 'height': height}
@@ -1,8 +1,19 @@
 const BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:5000/api';
+const API_ORIGIN = new URL(BASE_URL, window.location.origin).origin;
+
+// Stored images and thumbnails come back as /api/media/files/... paths
+export const mediaUrl = (url) => (url && url.startsWith('/') ? `${API_ORIGIN}${url}` : url);
+
+// Bearer token from login/signup, required by the admin and faculty endpoints
+const authHeaders = () => {
+    const token = localStorage.getItem('token');
+    return token ? { 'Authorization': `Bearer ${token}` } : {};
+};
 
 export const fetchCourses = async () => {
     try {
-        const response = await fetch(`${BASE_URL}/courses`);
+        // Only the columns CourseCard shows; skips video_url
+        const response = await fetch(`${BASE_URL}/courses?fields=id,title,instructor,duration,rating,students,image,thumbnails,tags`);
         if (!response.ok) throw new Error('Failed to fetch courses');
         return await response.json();
     } catch (error) {
@@ -22,6 +33,18 @@ export const fetchCourseById = async (id) => {
     }
 };
 
+export const fetchRelatedCourses = async (id, limit = 4) => {
+    try {
+        const response = await fetch(`${BASE_URL}/courses/${id}/related?limit=${limit}`);
+        if (!response.ok) throw new Error('Failed to fetch related courses');
+        const data = await response.json();
+        return data.items;
+    } catch (error) {
+        console.error('Error fetching related courses:', error);
+        return [];
+    }
+};
+
 export const fetchFaculty = async () => {
     try {
         const response = await fetch(`${BASE_URL}/faculty`);
@@ -39,17 +62,39 @@ export const addCourse = async (courseData) => {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                ...authHeaders(),
             },
             body: JSON.stringify(courseData),
         });
-        if (!response.ok) throw new Error('Failed to add course');
-        return await response.json();
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.message || 'Failed to add course');
+        return data;
     } catch (error) {
         console.error('Error adding course:', error);
         throw error;
     }
 };
 
+// Stores an image file; the returned `url` can be used as a course image
+export const uploadMedia = async (file) => {
+    try {
+        const response = await fetch(`${BASE_URL}/media`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': file.type || 'application/octet-stream',
+                ...authHeaders(),
+            },
+            body: file,
+        });
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.message || 'Failed to upload image');
+        return data;
+    } catch (error) {
+        console.error('Error uploading image:', error);
+        throw error;
+    }
+};
+
 export const login = async (email, password, required_role = null) => {
     try {
         const response = await fetch(`${BASE_URL}/login`, {
@@ -73,6 +118,7 @@ export const deleteCourse = async (courseId) => {
     try {
         const response = await fetch(`${BASE_URL}/courses/${courseId}`, {
             method: 'DELETE',
+            headers: authHeaders(),
         });
         if (!response.ok) throw new Error('Failed to delete course');
         return await response.json();
@@ -82,6 +128,17 @@ export const deleteCourse = async (courseId) => {
     }
 };
 
+export const logout = async () => {
+    try {
+        // Revokes the token server-side; the caller clears localStorage either way
+        await fetch(`${BASE_URL}/logout`, {
+            method: 'POST',
+            headers: authHeaders(),
+        });
+    } catch (error) {
+        console.error('Error logging out:', error);
+    }
+};
 
 export const signup = async (userData) => {
     try {
@@ -103,9 +160,10 @@ export const signup = async (userData) => {
 };
 
 // Faculty Analytics & Records
-export const fetchFacultyAnalytics = async () => {
+export const fetchFacultyAnalytics = async (instructor = null) => {
     try {
-        const response = await fetch(`${BASE_URL}/faculty/analytics`);
+        const query = instructor ? `?instructor=${encodeURIComponent(instructor)}` : '';
+        const response = await fetch(`${BASE_URL}/faculty/analytics${query}`);
         if (!response.ok) throw new Error('Failed to fetch analytics');
         return await response.json();
     } catch (error) {
@@ -116,7 +174,7 @@ export const fetchFacultyAnalytics = async () => {
 
 export const fetchStudentsRegistry = async () => {
     try {
-        const response = await fetch(`${BASE_URL}/students`);
+        const response = await fetch(`${BASE_URL}/students`, { headers: authHeaders() });
         if (!response.ok) throw new Error('Failed to fetch students');
         return await response.json();
     } catch (error) {
@@ -125,6 +183,17 @@ export const fetchStudentsRegistry = async () => {
     }
 };
 
+export const fetchStudent = async (id) => {
+    try {
+        const response = await fetch(`${BASE_URL}/students/${id}`, { headers: authHeaders() });
+        if (!response.ok) throw new Error('Failed to fetch student');
+        return await response.json();
+    } catch (error) {
+        console.error('Error fetching student:', error);
+        return null;
+    }
+};
+
 export const enrollCourse = async (enrollmentData) => {
     try {
         console.log('Enrolling with data:', enrollmentData);
@@ -169,13 +238,24 @@ export const enrollCourse = async (enrollmentData) => {
 };
 
 // Admin Functions
-export const updateStudent = async (id, data) => {
+export class StaleRecordError extends Error {
+    constructor(version) {
+        super('This record was changed by someone else');
+        this.version = version;
+    }
+}
+
+const versionHeaders = (version) => (version == null ? {} : { 'If-Match': `"${version}"` });
+
+export const updateStudent = async (id, changes, version) => {
     try {
+        // Only the changed fields; If-Match makes a concurrent edit a 412
         const response = await fetch(`${BASE_URL}/students/${id}`, {
-            method: 'PUT',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(data),
+            method: 'PATCH',
+            headers: { 'Content-Type': 'application/json', ...versionHeaders(version), ...authHeaders() },
+            body: JSON.stringify(changes),
         });
+        if (response.status === 412) throw new StaleRecordError((await response.json()).version);
         if (!response.ok) throw new Error('Failed to update student');
         return await response.json();
     } catch (error) {
@@ -188,6 +268,7 @@ export const deleteStudent = async (id) => {
     try {
         const response = await fetch(`${BASE_URL}/students/${id}`, {
             method: 'DELETE',
+            headers: authHeaders(),
         });
         if (!response.ok) throw new Error('Failed to delete student');
         return await response.json();
@@ -197,13 +278,15 @@ export const deleteStudent = async (id) => {
     }
 };
 
-export const updateFaculty = async (id, data) => {
+export const updateFaculty = async (id, changes, version) => {
     try {
+        // Only the changed fields; If-Match makes a concurrent edit a 412
         const response = await fetch(`${BASE_URL}/faculty/${id}`, {
-            method: 'PUT',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(data),
+            method: 'PATCH',
+            headers: { 'Content-Type': 'application/json', ...versionHeaders(version), ...authHeaders() },
+            body: JSON.stringify(changes),
         });
+        if (response.status === 412) throw new StaleRecordError((await response.json()).version);
         if (!response.ok) throw new Error('Failed to update faculty');
         return await response.json();
     } catch (error) {
@@ -216,6 +299,7 @@ export const deleteFaculty = async (id) => {
     try {
         const response = await fetch(`${BASE_URL}/faculty/${id}`, {
             method: 'DELETE',
+            headers: authHeaders(),
         });
         if (!response.ok) throw new Error('Failed to delete faculty');
         return await response.json();
@@ -226,3 +310,15 @@ export const deleteFaculty = async (id) => {
 };
 
 
+
+// Live change feed (Server-Sent Events). `onEvent(kind, data)` is called for
+// each change; EventSource reconnects by itself and resumes from the last
+// event id. A "reset" event means some changes were missed: reload the lists.
+// Returns a function that closes the stream.
+export const subscribeToEvents = (kinds, onEvent) => {
+    const source = new EventSource(`${BASE_URL}/events`);
+    ['reset', ...kinds].forEach((kind) => {
+        source.addEventListener(kind, (event) => onEvent(kind, JSON.parse(event.data)));
+    });
+    return () => source.close();
+};
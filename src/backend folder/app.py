@@ -1,3 +1,5 @@
+import os
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import smtplib
@@ -11,9 +13,9 @@ courses = []
 contact_messages = []
 
 # Email Configuration
-# WARNING: Replace these with real credentials and use Environment Variables in production!
-SENDER_EMAIL = "gokuldeepamoorthy0712@gmail.com" 
-SENDER_PASSWORD = "cvlq wlsg pgfq ojhu" 
+# Credentials come from the environment only
+SENDER_EMAIL = os.environ.get("MAIL_USERNAME", "")
+SENDER_PASSWORD = os.environ.get("MAIL_PASSWORD", "")
 
 @app.route("/", methods=["GET"])
 def home():
@@ -1,13 +1,22 @@
 import Button from './Button';
 import { Clock, Star, Users, Trash2 } from 'lucide-react';
 import { Link } from 'react-router-dom';
+import { mediaUrl } from '../api/apiClient';
 
-const CourseCard = ({ id, title, instructor, duration, rating, students, image, tags, video_url, showDelete, onDelete, isFaculty }) => {
+const CourseCard = ({ id, title, instructor, duration, rating, students, image, thumbnails, tags, video_url, showDelete, onDelete, isFaculty }) => {
+    // Stored images come with pre-sized WebP thumbnails; let the browser pick one
+    const srcSet = thumbnails
+        ? Object.entries(thumbnails).map(([width, url]) => `${mediaUrl(url)} ${width}w`).join(', ')
+        : undefined;
     return (
         <div className="glass-panel hover-zoom" style={{ overflow: 'hidden', display: 'flex', flexDirection: 'column', height: '100%', position: 'relative' }}>
             <div style={{ position: 'relative', height: '180px', overflow: 'hidden' }}>
                 <img
-                    src={image}
+                    src={mediaUrl(image)}
+                    srcSet={srcSet}
+                    sizes="(max-width: 700px) 100vw, 400px"
+                    loading="lazy"
+                    decoding="async"
                     alt={title}
                     style={{ width: '100%', height: '100%', objectFit: 'cover', transition: 'transform 0.5s ease' }}
                 />
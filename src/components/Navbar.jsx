@@ -1,6 +1,7 @@
 import { Link, useNavigate } from 'react-router-dom';
 import { Menu, X, ChevronDown, User, LogOut } from 'lucide-react';
 import { useState, useEffect } from 'react';
+import { logout } from '../api/apiClient';
 
 const Navbar = () => {
     const [isOpen, setIsOpen] = useState(false);
@@ -16,6 +17,7 @@ const Navbar = () => {
     }, []);
 
     const handleLogout = () => {
+        logout();
         localStorage.removeItem('user');
         localStorage.removeItem('token');
         setUser(null);
@@ -1,12 +1,13 @@
 import { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { addCourse } from '../api/apiClient';
+import { addCourse, mediaUrl, uploadMedia } from '../api/apiClient';
 import Button from '../components/Button';
 import { Plus, X, Image as ImageIcon, Video, Tag, Clock, User } from 'lucide-react';
 
 const AddCourse = () => {
     const navigate = useNavigate();
     const [loading, setLoading] = useState(false);
+    const [uploading, setUploading] = useState(false);
     const [formData, setFormData] = useState({
         title: '',
         instructor: '',
@@ -37,6 +38,22 @@ const AddCourse = () => {
         }
     };
 
+    const handleImageUpload = async (e) => {
+        const file = e.target.files[0];
+        if (!file) return;
+        setUploading(true);
+        try {
+            const media = await uploadMedia(file);
+            setFormData(prev => ({ ...prev, image: media.url }));
+            setErrors(prev => ({ ...prev, image: '' }));
+        } catch (error) {
+            setErrors(prev => ({ ...prev, image: error.message }));
+        } finally {
+            setUploading(false);
+            e.target.value = '';
+        }
+    };
+
     const handleAddTag = () => {
         if (currentTag.trim() && !formData.tags.includes(currentTag.trim())) {
             setFormData(prev => ({
@@ -226,10 +243,23 @@ const AddCourse = () => {
                                 transition: 'all var(--transition-fast)'
                             }}
                         />
+                        <input
+                            type="file"
+                            accept="image/jpeg,image/png,image/gif,image/webp"
+                            onChange={handleImageUpload}
+                            disabled={uploading}
+                            style={{ marginTop: '0.75rem' }}
+                        />
+                        {uploading && <p style={{ color: 'var(--text-secondary)', marginTop: '0.5rem' }}>Uploading...</p>}
+                        {errors.image && (
+                            <p style={{ color: '#ef4444', fontSize: '0.875rem', marginTop: '0.5rem' }}>
+                                {errors.image}
+                            </p>
+                        )}
                         {formData.image && (
                             <div style={{ marginTop: '1rem', borderRadius: 'var(--radius-md)', overflow: 'hidden' }}>
                                 <img
-                                    src={formData.image}
+                                    src={mediaUrl(formData.image)}
                                     alt="Preview"
                                     style={{ width: '100%', height: '200px', objectFit: 'cover' }}
                                     onError={(e) => { e.target.style.display = 'none'; }}
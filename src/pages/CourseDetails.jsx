@@ -2,7 +2,7 @@ import { useParams, Link } from 'react-router-dom';
 import { useState, useEffect } from 'react';
 import Button from '../components/Button';
 import { Clock, Star, Users, CheckCircle, PlayCircle, Award, Loader2 } from 'lucide-react';
-import { fetchCourseById, enrollCourse, fetchStudentsRegistry } from '../api/apiClient';
+import { fetchCourseById, fetchRelatedCourses, enrollCourse } from '../api/apiClient';
 import { useNavigate } from 'react-router-dom';
 
 const CourseDetails = () => {
@@ -11,6 +11,7 @@ const CourseDetails = () => {
     const [loading, setLoading] = useState(true);
     const [enrolling, setEnrolling] = useState(false);
     const [isEnrolled, setIsEnrolled] = useState(false);
+    const [related, setRelated] = useState([]);
     const navigate = useNavigate();
 
     useEffect(() => {
@@ -21,24 +22,9 @@ const CourseDetails = () => {
             setLoading(false);
         };
         getCourse();
+        fetchRelatedCourses(id).then(setRelated);
     }, [id]);
 
-    useEffect(() => {
-        const checkEnrollment = async () => {
-            const user = JSON.parse(localStorage.getItem('user'));
-            if (user && course) {
-                try {
-                    const students = await fetchStudentsRegistry();
-                    const enrolled = students.some(s => s.email === user.email && s.course === course.title);
-                    if (enrolled) setIsEnrolled(true);
-                } catch (error) {
-                    console.error("Failed to check enrollment", error);
-                }
-            }
-        };
-        checkEnrollment();
-    }, [course]);
-
     const handleEnroll = async () => {
         const user = JSON.parse(localStorage.getItem('user'));
         if (!user) {
@@ -206,6 +192,19 @@ const CourseDetails = () => {
                                 </li>
                             ))}
                         </ul>
+                        {related.length > 0 && (
+                            <>
+                                <h3 style={{ margin: '2rem 0 1rem' }}>Related courses</h3>
+                                <ul style={{ listStyle: 'none', display: 'flex', flexDirection: 'column', gap: '0.75rem' }}>
+                                    {related.map(r => (
+                                        <li key={r.id}>
+                                            <Link to={`/courses/${r.id}`} style={{ color: 'var(--primary)', fontWeight: 500 }}>{r.title}</Link>
+                                            <div style={{ color: 'var(--text-secondary)', fontSize: '0.875rem' }}>{r.instructor}</div>
+                                        </li>
+                                    ))}
+                                </ul>
+                            </>
+                        )}
                     </div>
                 </div>
             </div>
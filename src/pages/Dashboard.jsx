@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import CourseCard from '../components/CourseCard';
-import { fetchFacultyAnalytics, fetchStudentsRegistry, fetchFaculty, updateStudent, deleteStudent, updateFaculty, deleteFaculty } from '../api/apiClient';
+import { fetchFacultyAnalytics, fetchStudentsRegistry, fetchStudent, fetchFaculty, updateStudent, deleteStudent, updateFaculty, deleteFaculty, subscribeToEvents, StaleRecordError } from '../api/apiClient';
 import { TrendingUp, Users, Award, Star, Loader2, Edit2, Trash2, Save, X } from 'lucide-react';
 
 const enrolledCourses = [
@@ -17,6 +17,11 @@ const enrolledCourses = [
     }
 ];
 
+const ADMIN_EVENTS = [
+    'enrollment.created', 'enrollment.updated', 'enrollment.deleted', 'enrollment.imported', 'course.deleted',
+    'faculty.created', 'faculty.updated', 'faculty.deleted', 'faculty.imported',
+];
+
 const Dashboard = () => {
     const [user, setUser] = useState(null);
     const [analytics, setAnalytics] = useState(null);
@@ -33,24 +38,20 @@ const Dashboard = () => {
             setUser(parsedUser);
 
             if (parsedUser.role === 'faculty') {
-                loadFacultyData();
+                loadFacultyData(parsedUser.name);
             } else if (parsedUser.role === 'admin') {
                 loadAdminData();
+                return subscribeToEvents(ADMIN_EVENTS, applyAdminEvent);
             } else {
                 setLoading(false);
             }
         }
     }, []);
 
-    const loadFacultyData = async () => {
+    const loadFacultyData = async (instructor) => {
         setLoading(true);
         try {
-            const [analyticsData, studentsData] = await Promise.all([
-                fetchFacultyAnalytics(),
-                fetchStudentsRegistry()
-            ]);
-            setAnalytics(analyticsData);
-            setStudents(studentsData);
+            setAnalytics(await fetchFacultyAnalytics(instructor));
         } catch (error) {
             console.error('Failed to load faculty data:', error);
         } finally {
@@ -74,6 +75,43 @@ const Dashboard = () => {
         }
     };
 
+    // Enrollment events carry ids only (the stream is public), so fetch the row
+    const refreshStudent = async (id) => {
+        const entry = await fetchStudent(id);
+        if (!entry) return;
+        setStudents((prev) => (prev.some((s) => s.id === id)
+            ? prev.map((s) => (s.id === id ? entry : s))
+            : [...prev, entry]));
+    };
+
+    // Keep the registry and faculty tables current without refetching them
+    const applyAdminEvent = (kind, data) => {
+        switch (kind) {
+            case 'enrollment.created':
+            case 'enrollment.updated':
+                refreshStudent(data.id);
+                break;
+            case 'enrollment.deleted':
+                setStudents((prev) => prev.filter((s) => s.id !== data.id));
+                break;
+            case 'course.deleted':
+                setStudents((prev) => prev.filter((s) => s.course_id !== data.id));
+                break;
+            case 'faculty.created':
+                setFaculty((prev) => [...prev.filter((f) => f.id !== data.id), data]);
+                break;
+            case 'faculty.updated':
+                setFaculty((prev) => prev.map((f) => (f.id === data.id ? data : f)));
+                break;
+            case 'faculty.deleted':
+                setFaculty((prev) => prev.filter((f) => f.id !== data.id));
+                break;
+            default:
+                // reset, or a bulk import: refetch
+                loadAdminData();
+        }
+    };
+
     const handleEditClick = (item, type) => {
         setEditingId(`${type}-${item.id}`);
         setEditForm({ ...item, type });
@@ -87,16 +125,21 @@ const Dashboard = () => {
     const handleSave = async () => {
         try {
             if (editForm.type === 'student') {
-                await updateStudent(editForm.id, editForm);
+                await updateStudent(editForm.id, { name: editForm.name, course: editForm.course }, editForm.version);
                 alert('Student updated');
             } else {
-                await updateFaculty(editForm.id, editForm);
+                await updateFaculty(editForm.id, { name: editForm.name, role: editForm.role }, editForm.version);
                 alert('Faculty updated');
             }
-            // Reload data
-            loadAdminData();
+            // The change comes back through the event stream
             setEditingId(null);
         } catch (error) {
+            if (error instanceof StaleRecordError) {
+                alert('Someone else changed this record while you were editing it. Reloaded the latest version.');
+                setEditingId(null);
+                loadAdminData();
+                return;
+            }
             alert('Failed to update: ' + error.message);
         }
     };
@@ -109,7 +152,6 @@ const Dashboard = () => {
             } else {
                 await deleteFaculty(id);
             }
-            loadAdminData();
         } catch (error) {
             alert('Failed to delete: ' + error.message);
         }
@@ -176,55 +218,8 @@ const Dashboard = () => {
                         </div>
                     </div>
 
-                    <div style={{ display: 'grid', gridTemplateColumns: '2fr 1fr', gap: '2rem' }}>
-                        {/* Student Registry Table */}
-                        <div className="glass-panel" style={{ padding: '2rem' }}>
-                            <h2 style={{ marginBottom: '1.5rem', fontSize: '1.25rem', display: 'flex', alignItems: 'center', gap: '0.5rem' }}>
-                                <Users size={20} /> Students Registry
-                            </h2>
-                            <div style={{ overflowX: 'auto' }}>
-                                <table style={{ width: '100%', borderCollapse: 'collapse', textAlign: 'left' }}>
-                                    <thead style={{ borderBottom: '1px solid var(--border-subtle)' }}>
-                                        <tr>
-                                            <th style={{ padding: '1rem 0', color: 'var(--text-secondary)', fontWeight: 500, fontSize: '0.9rem' }}>Name</th>
-                                            <th style={{ padding: '1rem 0', color: 'var(--text-secondary)', fontWeight: 500, fontSize: '0.9rem' }}>Course</th>
-                                            <th style={{ padding: '1rem 0', color: 'var(--text-secondary)', fontWeight: 500, fontSize: '0.9rem' }}>Progress</th>
-                                            <th style={{ padding: '1rem 0', color: 'var(--text-secondary)', fontWeight: 500, fontSize: '0.9rem' }}>Status</th>
-                                        </tr>
-                                    </thead>
-                                    <tbody>
-                                        {students.map((student) => (
-                                            <tr key={student.id} style={{ borderBottom: '1px solid rgba(255,255,255,0.05)' }}>
-                                                <td style={{ padding: '1rem 0' }}>
-                                                    <p style={{ fontWeight: 500 }}>{student.name}</p>
-                                                    <p style={{ fontSize: '0.75rem', color: 'var(--text-secondary)' }}>{student.email}</p>
-                                                </td>
-                                                <td style={{ padding: '1rem 0', fontSize: '0.9rem' }}>{student.course}</td>
-                                                <td style={{ padding: '1rem 0' }}>
-                                                    <div style={{ width: '100px', height: '6px', background: 'rgba(255,255,255,0.1)', borderRadius: '3px', position: 'relative', overflow: 'hidden' }}>
-                                                        <div style={{ position: 'absolute', top: 0, left: 0, height: '100%', background: 'var(--primary)', width: student.progress }} />
-                                                    </div>
-                                                    <span style={{ fontSize: '0.75rem', color: 'var(--text-secondary)', marginTop: '0.25rem', display: 'block' }}>{student.progress}</span>
-                                                </td>
-                                                <td style={{ padding: '1rem 0' }}>
-                                                    <span style={{
-                                                        fontSize: '0.7rem',
-                                                        padding: '0.2rem 0.6rem',
-                                                        borderRadius: 'var(--radius-full)',
-                                                        background: 'rgba(16, 185, 129, 0.1)',
-                                                        color: '#10b981',
-                                                        border: '1px solid rgba(16, 185, 129, 0.2)'
-                                                    }}>
-                                                        Active
-                                                    </span>
-                                                </td>
-                                            </tr>
-                                        ))}
-                                    </tbody>
-                                </table>
-                            </div>
-                        </div>
-
+                    {/* The student registry holds every student's email, so it is on the admin view only */}
+                    <div style={{ display: 'grid', gridTemplateColumns: '1fr', gap: '2rem' }}>
                         {/* Peer Ratings Comparison */}
                         <div className="glass-panel" style={{ padding: '2rem' }}>
                             <h2 style={{ marginBottom: '1.5rem', fontSize: '1.25rem', display: 'flex', alignItems: 'center', gap: '0.5rem' }}>
@@ -10,7 +10,6 @@ const Signup = () => {
         email: '',
         password: '',
         confirmPassword: '',
-        facultyRole: '',
         bio: '',
         location: ''
     });
@@ -18,9 +17,6 @@ const Signup = () => {
     const [loading, setLoading] = useState(false);
     const navigate = useNavigate();
 
-    // Detect if email is a faculty email
-    const isFacultyEmail = formData.email.toLowerCase().includes('.faculty@');
-
     const handleChange = (e) => {
         setFormData({
             ...formData,
@@ -37,12 +33,6 @@ const Signup = () => {
             return;
         }
 
-        // Validate faculty role if faculty email
-        if (isFacultyEmail && !formData.facultyRole.trim()) {
-            setError('Please provide your role/specialization as a faculty member');
-            return;
-        }
-
         setLoading(true);
 
         try {
@@ -52,12 +42,6 @@ const Signup = () => {
                 password: formData.password
             };
 
-            // Add faculty-specific data if faculty email
-            if (isFacultyEmail) {
-                signupData.facultyRole = formData.facultyRole;
-                signupData.bio = formData.bio;
-            }
-
             const data = await signup(signupData);
 
             // Store user info and token
@@ -156,9 +140,6 @@ const Signup = () => {
                                 outline: 'none'
                             }}
                         />
-                        <p style={{ fontSize: '0.75rem', color: 'var(--text-secondary)', marginTop: '-0.25rem' }}>
-                            Tip: Use an email with <strong>.faculty@</strong> to register as faculty.
-                        </p>
                     </div>
 
 
@@ -202,42 +183,6 @@ const Signup = () => {
                         />
                     </div>
 
-                    {/* Faculty Role Field - Only shown for faculty emails */}
-                    {isFacultyEmail && (
-                        <div style={{
-                            background: 'rgba(59, 130, 246, 0.1)',
-                            border: '1px solid rgba(59, 130, 246, 0.3)',
-                            padding: '1rem',
-                            borderRadius: 'var(--radius-sm)',
-                            marginTop: '0.5rem'
-                        }}>
-                            <p style={{ fontSize: '0.85rem', color: '#60a5fa', marginBottom: '1rem', fontWeight: 500 }}>
-                                ✨ Faculty email detected! Please provide your specialization.
-                            </p>
-                            <div style={{ display: 'flex', flexDirection: 'column', gap: '0.5rem' }}>
-                                <label style={{ fontSize: '0.9rem', fontWeight: 500 }}>
-                                    Role/Specialization *
-                                </label>
-                                <input
-                                    type="text"
-                                    name="facultyRole"
-                                    required={isFacultyEmail}
-                                    value={formData.facultyRole}
-                                    onChange={handleChange}
-                                    placeholder="e.g., AI & ML Expert, Cloud Architect, Full Stack Developer"
-                                    style={{
-                                        background: 'rgba(0,0,0,0.2)',
-                                        border: '1px solid var(--border-subtle)',
-                                        padding: '0.75rem',
-                                        borderRadius: 'var(--radius-sm)',
-                                        color: 'white',
-                                        outline: 'none'
-                                    }}
-                                />
-                            </div>
-                        </div>
-                    )}
-
                     {/* Optional Profile Fields */}
                     <div style={{
                         borderTop: '1px solid var(--border-subtle)',